@@ -1,20 +1,90 @@
+import os
+import threading
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from dash import Dash, dcc, html, dash_table, Input, Output
+from dash import Dash, dcc, html, dash_table, callback_context, no_update, Input, Output, State
+
+from dash_app.background import create_background_manager
+from dash_app.metrics import CallbackMetrics, filters_label, phase, scanned
+from dash_app.payload import compact_figure, enable_compression
+from dash_app.table_query import apply_filter_query, page_records, sorted_page
+from scripts.clinical_rules import anemia_status
+from scripts.filter_index import FilterIndex
+from scripts.live_dataset import LiveDataset, concat_reports, rows_match
+from scripts.moments import MomentStats
+from scripts.partitioned_store import query_reports
+from scripts.rollup import AGE_BINS, AGE_LABELS, RollupCube
+
+# Month-partitioned layout to read filtered views from (optional)
+PARTITIONS_ROOT = os.environ.get('DASHBOARD_PARTITIONS_DIR')
+
+# Seconds between checks for appended reports (0 disables), and an optional batch drop directory
+REFRESH_SECONDS = int(os.environ.get('DASHBOARD_REFRESH_SECONDS', '60'))
+INCOMING_DIR = os.environ.get('DASHBOARD_INCOMING_DIR')
+
+# Callbacks slower than this many seconds are logged; a sample of calls is profiled
+SLOW_CALLBACK_SECONDS = float(os.environ.get('DASHBOARD_SLOW_CALLBACK_SECONDS', '1.0'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('DASHBOARD_PROFILE_SAMPLE_RATE', '0'))
+
+# Typed-array figures and Brotli/gzip responses (set to 0 for plain payloads)
+COMPACT_PAYLOADS = os.environ.get('DASHBOARD_COMPACT_PAYLOADS', '1') == '1'
+
+def add_derived_columns(frame):
+    frame['Month'] = frame['Date'].dt.to_period('M').astype(str)
+    # Derive anemia flag (vectorized, gender-specific Hb thresholds from the shared rule table)
+    frame['Anemia_Status'] = anemia_status(frame)
+    return frame
 
-# Load dataset
-df = pd.read_csv("blood_reports_dataset.csv", parse_dates=['Date'])
-df['Month'] = df['Date'].dt.to_period('M').astype(str)
+# Load dataset; live.frame grows as reports are appended
+live = LiveDataset(incoming_dir=INCOMING_DIR, derive=add_derived_columns)
+df = live.frame
 
-# Derive anemia flag
-def anemia_flag(row):
-    if row['Gender']=='M' and row['Haemoglobin_g_dl'] < 13: return 'Anemic'
-    if row['Gender']=='F' and row['Haemoglobin_g_dl'] < 12: return 'Anemic'
-    return 'Normal'
-df['Anemia_Status'] = df.apply(anemia_flag, axis=1)
+# Pre-aggregated cells that the charts are served from
+cube = RollupCube.from_frame(df)
 
-app = Dash(__name__)
+# Row bitmaps per Gender/Diagnosis value and a date ordering, extended as rows arrive
+index = FilterIndex(df)
+
+# Per Gender x Diagnosis x Date sums and cross-products of the numeric columns
+moments = MomentStats.from_frame(df)
+
+_refresh_lock = threading.Lock()
+
+def refresh():
+    # Fold reports appended since the last check into the cube, index and moments
+    global df, cube, index, moments
+    with _refresh_lock:
+        new_rows, reloaded = live.poll()
+        if reloaded:
+            df = live.frame
+            cube, index, moments = RollupCube.from_frame(df), FilterIndex(df), MomentStats.from_frame(df)
+        elif new_rows is not None:
+            df = live.frame
+            cube.append(new_rows)
+            moments.update(new_rows)
+            index = index.extended(new_rows)
+
+def is_stale(data_version, gender_val, diagnosis_val, start_date, end_date):
+    # Whether reports added since the browser's last data version fall inside its filters
+    since = (data_version or {}).get('since')
+    if since is None or since > len(df):
+        return True
+    return rows_match(df.iloc[since:], gender=None if gender_val == 'All' else gender_val,
+                      diagnosis=None if diagnosis_val == 'All' else diagnosis_val,
+                      start_date=start_date, end_date=end_date)
+
+# Heavy callbacks run as background jobs; cached results are keyed on the dataset version too
+background_manager = create_background_manager(cache_by=[lambda: len(df)])
+
+app = Dash(__name__, background_callback_manager=background_manager)
 app.title = "Corporate Blood Report Analytics Dashboard"
+payload_stats = enable_compression(app.server) if COMPACT_PAYLOADS else None
+
+# Per-callback timings on /metrics (hooked after compression, so sizes are uncompressed)
+metrics = CallbackMetrics('app', slow_seconds=SLOW_CALLBACK_SECONDS, profile_sample_rate=PROFILE_SAMPLE_RATE)
+metrics.instrument_server(app)
 
 app.layout = html.Div([
     html.H1("Palkhade Diagnostics – Corporate Analytics", style={'textAlign':'center'}),
@@ -29,70 +99,189 @@ app.layout = html.Div([
         dcc.Dropdown(
             ['All'] + sorted(df['Diagnosis'].unique().tolist()), 'All',
             id='diagnosis-filter', clearable=False, style={'width':'250px'}
+        ),
+        html.Label("Date Range:"),
+        dcc.DatePickerRange(
+            id='date-range', min_date_allowed=df['Date'].min(), max_date_allowed=df['Date'].max(),
+            clearable=True
         )
     ], style={'display':'flex','justifyContent':'center','gap':'20px'}),
 
+    # Periodic check for appended reports; the store holds the row count seen by this browser
+    dcc.Interval(id='refresh-interval', interval=max(REFRESH_SECONDS, 1) * 1000, disabled=not REFRESH_SECONDS),
+    dcc.Store(id='data-version', data={'rows': len(df), 'since': len(df)}),
+
+    # Progress of the background chart job
+    html.Div([
+        html.Progress(id='dashboard-progress', value='0', max='4'),
+        html.Span(id='dashboard-status', style={'marginLeft':'10px'})
+    ], style={'textAlign':'center'}),
+
     dcc.Graph(id='crp-trend'),
     dcc.Graph(id='anemia-bar'),
     dcc.Graph(id='diagnosis-pie'),
     dcc.Graph(id='corr-heatmap'),
 
     html.H3("Filtered Data Table"),
+    # Paging, sorting and filtering are evaluated server-side; only the visible page is sent
     dash_table.DataTable(
         id='data-table',
+        columns=[{"name": i, "id": i} for i in df.columns],
+        page_current=0,
         page_size=15,
         style_table={'overflowX': 'auto'},
-        filter_action="native",
-        sort_action="native"
+        page_action="custom",
+        filter_action="custom",
+        filter_query="",
+        sort_action="custom",
+        sort_mode="multi",
+        sort_by=[]
     )
 ])
 
+def filter_reports(gender_val, diagnosis_val, start_date=None, end_date=None):
+    gender = None if gender_val == 'All' else gender_val
+    diagnosis = None if diagnosis_val == 'All' else diagnosis_val
+    if PARTITIONS_ROOT:
+        # Only the months overlapping the range are read from disk
+        stored = query_reports(start_date, end_date, gender=gender, diagnosis=diagnosis, root=PARTITIONS_ROOT)
+        # Same columns as the in-memory rows (without the partition key)
+        stored = add_derived_columns(stored[[col for col in stored.columns if col in df.columns]])
+        # Reports appended since the CSV was loaded are only in memory
+        positions = index.positions(start_date, end_date, Gender=gender, Diagnosis=diagnosis)
+        appended = positions[np.searchsorted(positions, live.loaded_rows):]
+        if not len(appended):
+            return stored
+        return concat_reports([stored, live.take(appended, columns=list(stored.columns))])
+    return index.select(df, start_date=start_date, end_date=end_date, Gender=gender, Diagnosis=diagnosis)
+
+@app.callback(
+    [Output('data-version','data'),
+     Output('date-range','max_date_allowed')],
+    [Input('refresh-interval','n_intervals')],
+    [State('data-version','data')]
+)
+def refresh_data(_, data_version):
+    # Only the server process refreshes; forked background jobs must not (a lock held at fork stays held)
+    refresh()
+    seen = (data_version or {}).get('rows')
+    if seen == len(df):
+        return no_update, no_update
+    return {'rows': len(df), 'since': seen}, df['Date'].max()
+
 @app.callback(
     [Output('crp-trend','figure'),
      Output('anemia-bar','figure'),
      Output('diagnosis-pie','figure'),
-     Output('corr-heatmap','figure'),
-     Output('data-table','data'),
-     Output('data-table','columns')],
+     Output('corr-heatmap','figure')],
     [Input('gender-filter','value'),
-     Input('diagnosis-filter','value')]
+     Input('diagnosis-filter','value'),
+     Input('date-range','start_date'),
+     Input('date-range','end_date'),
+     Input('data-version','data')],
+    background=True,
+    interval=250,
+    progress=[Output('dashboard-progress','value'), Output('dashboard-progress','max')],
+    running=[(Output('dashboard-status','children'), "Updating charts…", "")],
+    cache_ignore_triggered=False
 )
-def update_dashboard(gender_val, diagnosis_val):
-    dff = df.copy()
-    if gender_val != 'All':
-        dff = dff[dff['Gender']==gender_val]
-    if diagnosis_val != 'All':
-        dff = dff[dff['Diagnosis']==diagnosis_val]
+@metrics.instrument('update_dashboard', filters=lambda _, *args: filters_label(*args[:4]))
+def update_dashboard(set_progress, gender_val, diagnosis_val, start_date=None, end_date=None, data_version=None):
+    if callback_context.triggered_id == 'data-version' and not is_stale(
+            data_version, gender_val, diagnosis_val, start_date, end_date):
+        return no_update, no_update, no_update, no_update
+    with phase('filter'):
+        cells = cube.select(gender=None if gender_val == 'All' else gender_val,
+                            diagnosis=None if diagnosis_val == 'All' else diagnosis_val,
+                            start_date=start_date, end_date=end_date)
+    scanned(len(cube.cells))
 
     # CRP trend
-    crp_ts = dff.groupby('Date')['CRP_mg_L'].mean().reset_index()
-    fig1 = px.line(crp_ts, x='Date', y='CRP_mg_L',
-                   title="Average Daily CRP (mg/L) Trend")
-
-    # Anemia prevalence
-    anemia = dff.groupby(['Gender','Age']).Anemia_Status.value_counts(normalize=True).rename('prop').reset_index()
-    anemia = anemia[anemia['Anemia_Status']=='Anemic']
-    anemia['Age_Group'] = pd.cut(anemia['Age'], bins=[0,12,18,30,45,60,120],
-                                 labels=['0-12','13-18','19-30','31-45','46-60','60+'])
-    anemia_sum = anemia.groupby(['Age_Group','Gender'])['prop'].mean().reset_index()
-    fig2 = px.bar(anemia_sum, x='Age_Group', y='prop', color='Gender', barmode='group',
-                  title="Anemia Prevalence by Age Group & Gender", labels={'prop':'Proportion'})
+    with phase('aggregate'):
+        crp_ts = cube.summarize(['Date'], cells=cells)[['Date','CRP_mg_L_mean']].rename(columns={'CRP_mg_L_mean':'CRP_mg_L'})
+    with phase('figure'):
+        fig1 = px.line(crp_ts, x='Date', y='CRP_mg_L',
+                       title="Average Daily CRP (mg/L) Trend")
+    set_progress(('1', '4'))
+
+    # Anemia prevalence (share of anemic reports per gender and age, averaged per age group)
+    with phase('aggregate'):
+        anemia = cube.summarize(['Gender','Age','Anemia_Status'], cells=cells)[['Gender','Age','Anemia_Status','count']]
+        anemia['prop'] = anemia['count'] / anemia.groupby(['Gender','Age'])['count'].transform('sum')
+        anemia = anemia[anemia['Anemia_Status']=='Anemic']
+        anemia['Age_Group'] = pd.cut(anemia['Age'], bins=AGE_BINS, labels=AGE_LABELS)
+        anemia_sum = anemia.groupby(['Age_Group','Gender'], observed=True)['prop'].mean().reset_index()
+    with phase('figure'):
+        fig2 = px.bar(anemia_sum, x='Age_Group', y='prop', color='Gender', barmode='group',
+                      title="Anemia Prevalence by Age Group & Gender", labels={'prop':'Proportion'})
+    set_progress(('2', '4'))
 
     # Diagnosis distribution
-    diag_counts = dff['Diagnosis'].value_counts().reset_index()
-    diag_counts.columns = ['Diagnosis','Count']
-    fig3 = px.pie(diag_counts, names='Diagnosis', values='Count', title="Diagnosis Distribution")
+    with phase('aggregate'):
+        diag_counts = cube.summarize(['Diagnosis'], cells=cells)[['Diagnosis','count']]
+        diag_counts = diag_counts.rename(columns={'count':'Count'}).sort_values('Count', ascending=False)
+    with phase('figure'):
+        fig3 = px.pie(diag_counts, names='Diagnosis', values='Count', title="Diagnosis Distribution")
+    set_progress(('3', '4'))
+
+    # Correlation heatmap (merged from the selected segments' moment statistics)
+    with phase('aggregate'):
+        corr = moments.correlation(start_date, end_date,
+                                   Gender=None if gender_val == 'All' else gender_val,
+                                   Diagnosis=None if diagnosis_val == 'All' else diagnosis_val)
+    scanned(len(moments.count))
+    with phase('figure'):
+        fig4 = px.imshow(corr, text_auto=False, aspect='auto', title="Correlation Heatmap (Numeric Fields)")
+    set_progress(('4', '4'))
 
-    # Correlation heatmap
-    numeric_cols = dff.select_dtypes(include='number').columns
-    corr = dff[numeric_cols].corr()
-    fig4 = px.imshow(corr, text_auto=False, aspect='auto', title="Correlation Heatmap (Numeric Fields)")
+    if COMPACT_PAYLOADS:
+        with phase('figure'):
+            fig1, fig2, fig3, fig4 = (compact_figure(fig) for fig in (fig1, fig2, fig3, fig4))
+    return fig1, fig2, fig3, fig4
 
-    # Data table
-    columns=[{"name": i, "id": i} for i in dff.columns]
-    data=dff.to_dict('records')
+@app.callback(
+    [Output('data-table','data'),
+     Output('data-table','page_count')],
+    [Input('gender-filter','value'),
+     Input('diagnosis-filter','value'),
+     Input('date-range','start_date'),
+     Input('date-range','end_date'),
+     Input('data-table','page_current'),
+     Input('data-table','page_size'),
+     Input('data-table','sort_by'),
+     Input('data-table','filter_query'),
+     Input('data-version','data')],
+    background=True,
+    interval=250,
+    cache_ignore_triggered=False
+)
+@metrics.instrument('update_table', filters=lambda *args: filters_label(*args[:4]))
+def update_table(gender_val, diagnosis_val, start_date, end_date, page_current, page_size, sort_by, filter_query,
+                 data_version=None):
+    if callback_context.triggered_id == 'data-version' and not is_stale(
+            data_version, gender_val, diagnosis_val, start_date, end_date):
+        return no_update, no_update
+    page_current = page_current or 0
+    if not PARTITIONS_ROOT and not sort_by and not filter_query:
+        # Unsorted, unfiltered pages are taken straight from the index positions
+        with phase('filter'):
+            positions = index.positions(start_date, end_date,
+                                        Gender=None if gender_val == 'All' else gender_val,
+                                        Diagnosis=None if diagnosis_val == 'All' else diagnosis_val)
+            page = df.take(positions[page_current * page_size:(page_current + 1) * page_size])
+        scanned(len(positions))
+        with phase('figure'):
+            return page_records(page), max(1, -(-len(positions) // page_size))
 
-    return fig1, fig2, fig3, fig4, data, columns
+    with phase('filter'):
+        filtered = filter_reports(gender_val, diagnosis_val, start_date, end_date)
+        dff = apply_filter_query(filtered, filter_query)
+    scanned(len(filtered))
+    with phase('aggregate'):
+        page = sorted_page(dff, sort_by, page_current, page_size)
+    page_count = max(1, -(-len(dff) // page_size))
+    with phase('figure'):
+        return page_records(page), page_count
 
 if __name__ == "__main__":
     app.run(debug=True)
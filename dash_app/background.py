@@ -0,0 +1,84 @@
+"""Module for running heavy dashboard callbacks as background jobs.
+
+Callbacks declared with `background=True` run in a child process started by a
+disk-backed job manager, so the web server's request threads only start jobs and
+poll for results. On top of Dash's `DiskcacheManager` this adds:
+
+- Deduplication: a request whose inputs match a job that is still running attaches
+  to that job instead of starting another, and finished results are cached on
+  disk (keyed by the inputs, the trigger and the `cache_by` values) until they expire.
+- Shared cancellation: when a browser supersedes a request (the filter changed
+  again), Dash terminates the old job. A job shared by several requests is only
+  killed once every one of them has been superseded or has received its result.
+"""
+
+import os
+
+import diskcache
+from dash import DiskcacheManager
+
+from scripts.data_loader import DATA_DIR
+
+CALLBACK_CACHE_DIR = os.path.join(DATA_DIR, '.cache', 'callbacks')
+
+# Seconds a finished result stays cached after its last use
+RESULT_EXPIRE_SECONDS = 600
+
+class DedupDiskcacheManager(DiskcacheManager):
+    """A `DiskcacheManager` that shares running jobs between identical requests."""
+
+    def _job_key(self, key: str) -> str:
+        return f'{key}-job'
+
+    def _waiters_key(self, job) -> str:
+        return f'job-{int(job)}-waiters'
+
+    def call_job_fn(self, key, job_fn, args, context):
+        """Attaches to the running job for `key` if there is one, otherwise starts a new job.
+
+        Args:
+            key (str): The cache key of the request (a hash of its inputs).
+            job_fn (callable): The job function registered for the callback.
+            args (list | dict): The callback arguments.
+            context (dict): The callback context passed to the job.
+
+        Returns:
+            int: The PID of the job process.
+        """
+        with self.handle.transact():
+            job = self.handle.get(self._job_key(key))
+            if job is not None and self.job_running(job):
+                self.handle.incr(self._waiters_key(job))
+                return job
+
+            job = super().call_job_fn(key, job_fn, args, context)
+            self.handle.set(self._job_key(key), job, expire=self.expire)
+            self.handle.set(self._waiters_key(job), 1, expire=self.expire)
+            return job
+
+    def terminate_job(self, job):
+        """Releases one request's claim on a job, killing the process when none remain."""
+        if job is None:
+            return
+        with self.handle.transact():
+            if self.handle.decr(self._waiters_key(job), default=1) > 0:
+                return
+            self.handle.delete(self._waiters_key(job))
+            super().terminate_job(job)
+
+def create_background_manager(cache_by: list = None, cache_dir: str = CALLBACK_CACHE_DIR,
+                              expire: int = RESULT_EXPIRE_SECONDS) -> DedupDiskcacheManager:
+    """Creates the job manager for an app's background callbacks.
+
+    Args:
+        cache_by (list): Zero-argument functions whose values are part of every result's
+            cache key, e.g. the dataset version, so cached figures are not reused after new
+            reports arrive.
+        cache_dir (str): Directory of the on-disk job results and cache.
+        expire (int): Seconds a finished result stays cached after its last use.
+
+    Returns:
+        DedupDiskcacheManager: The manager to pass as `background_callback_manager`.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    return DedupDiskcacheManager(diskcache.Cache(cache_dir), cache_by=cache_by, expire=expire)
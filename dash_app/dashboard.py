@@ -2,29 +2,175 @@
 
 This module creates a Dash web application that visualizes key insights
 from the blood reports dataset, including infection trends, anemia distribution,
-and CRP levels over time.
+and CRP levels over time. With `refresh_seconds` set, reports appended to the CSV
+(or dropped into an incoming directory) are picked up while the app runs; only the
+cached views and charts whose filters the new reports fall into are recomputed.
+A streaming surge detector follows the same reports and lists recent surges of
+infections, abnormal reports and CRP; its full state is served on `/surge-state`.
 """
 
+import os
+import threading
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from flask import jsonify
+
+from dash_app.background import create_background_manager
+from dash_app.downsample import lttb
+from dash_app.frame_cache import FilteredFrameCache
+from dash_app.metrics import CallbackMetrics, cache_result, filters_label, phase, scanned
+from dash_app.payload import compact_figure, enable_compression
+from scripts.clinical_rules import INFECTION_DIAGNOSES
+from scripts.data_loader import DATASET_PATH
+from scripts.filter_index import FilterIndex
+from scripts.live_dataset import LiveDataset, concat_reports, rows_match
+from scripts.partitioned_store import query_reports
+from scripts.rollup import RollupCube
+from scripts.surge_detector import SurgeDetector, daily_counts
+
+# Columns needed by the dashboard charts
+CHART_COLUMNS = ['Date', 'Gender', 'Age', 'Diagnosis', 'CRP_mg_L']
+
+# Recent surge events listed on the dashboard
+SURGE_ROWS = 10
+
+# Points drawn per CRP trace, about two per horizontal pixel of a full-width chart
+CRP_MAX_POINTS = 2000
+
+def visible_x_range(relayout_data: dict):
+    """Extracts the x-axis window from a graph's `relayoutData`.
 
-def create_dashboard(file_path: str = "data/blood_reports_dataset.csv") -> dash.Dash:
+    Args:
+        relayout_data (dict): The `relayoutData` property of a `dcc.Graph`.
+
+    Returns:
+        tuple | str | None: (start, end) after a zoom/pan, 'autorange' after a reset,
+            or None when the event did not change the x-axis.
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get('xaxis.autorange'):
+        return 'autorange'
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'])
+    return None
+
+def create_dashboard(file_path: str = DATASET_PATH, shared_memory: bool = False,
+                     partitions_root: str = None, filter_cache_size: int = 32,
+                     refresh_seconds: int = 60, incoming_dir: str = None,
+                     compact_payloads: bool = True, slow_callback_seconds: float = 1.0,
+                     profile_sample_rate: float = 0.0) -> dash.Dash:
     """Creates and configures the Dash dashboard for blood report analytics.
 
     Args:
         file_path (str): The path to the blood reports CSV file.
+        shared_memory (bool): Serve the dataset from a read-only memory-mapped Arrow
+            file shared by all worker processes instead of a private in-memory copy.
+        partitions_root (str): Root of the month-partitioned layout. When given, filtered
+            views are read from the matching partitions instead of scanning the full frame.
+        filter_cache_size (int): Maximum number of filtered views kept in the server-side cache.
+        refresh_seconds (int): How often browsers ask the server to check for appended
+            reports; 0 disables live refresh.
+        incoming_dir (str): Optional drop directory of batch CSV files to ingest as they appear.
+        compact_payloads (bool): Send figure data as compact typed arrays and compress
+            responses with Brotli/gzip; per-output sizes are served on `/payload-stats`.
+        slow_callback_seconds (float): Callbacks slower than this are logged; None disables.
+        profile_sample_rate (float): Fraction of callback calls profiled with cProfile
+            (profiles of slow calls are kept).
 
     Returns:
         dash.Dash: The configured Dash application instance.
     """
-    # Load the dataset
-    df = pd.read_csv(file_path)
+    # Load the dataset; `live` grows as reports are appended, without copying its history
+    live = LiveDataset(file_path, incoming_dir=incoming_dir, shared_memory=shared_memory)
+    df = live.frame
+
+    # Aggregate charts are served from the rollup cube instead of raw rows
+    cube = RollupCube.from_frame(df)
+
+    # Row bitmaps per Gender/Diagnosis value and a date ordering, extended as rows arrive
+    index = FilterIndex(df)
+
+    # Daily per-segment baselines; the last day stays open for reports still arriving
+    surges = SurgeDetector()
+    surges.observe_daily(daily_counts(df))
+
+    refresh_lock = threading.Lock()
+
+    def refresh():
+        """Folds reports appended since the last check into the cube, index and caches."""
+        nonlocal cube, index, surges
+        with refresh_lock:
+            new_rows, reloaded = live.poll()
+            if reloaded:
+                cube, index = RollupCube.from_frame(live.frame), FilterIndex(live.frame)
+                surges = SurgeDetector()
+                surges.observe_daily(daily_counts(live.frame))
+                filtered_frames.clear()
+                crp_series.clear()
+            elif new_rows is not None:
+                cube.append(new_rows)
+                surges.observe_batch(new_rows)
+                # live already holds the new rows, so positions from the new index stay valid
+                index = index.extended(new_rows)
+
+                def stale(key):
+                    return rows_match(new_rows, **cube_filters(*key))
+
+                filtered_frames.invalidate(stale)
+                crp_series.invalidate(stale)
+
+    def is_stale(data_version, selected_gender, selected_diagnosis, start_date, end_date):
+        """Checks whether reports added since a browser's data version fall inside its filters."""
+        since = (data_version or {}).get('since')
+        if since is None or since > live.num_rows:
+            return True
+        return rows_match(live.rows_since(since), **cube_filters(selected_gender, selected_diagnosis, start_date, end_date))
+
+    def cube_filters(selected_gender, selected_diagnosis, start_date, end_date):
+        return {
+            'gender': None if selected_gender == 'All' else selected_gender,
+            'diagnosis': None if selected_diagnosis == 'All' else selected_diagnosis,
+            'start_date': start_date,
+            'end_date': end_date,
+        }
+
+    # Heavy callbacks run as background jobs; cached results are keyed on the dataset version too
+    background_manager = create_background_manager(cache_by=[lambda: live.num_rows])
 
     # Initialize the Dash app
-    app = dash.Dash(__name__, assets_folder='dash_app/assets')
+    app = dash.Dash(__name__, assets_folder='dash_app/assets', background_callback_manager=background_manager)
+    if compact_payloads:
+        enable_compression(app.server)
+
+    # Per-callback timings on /metrics (hooked after compression, so sizes are uncompressed)
+    metrics = CallbackMetrics('dashboard', slow_seconds=slow_callback_seconds, profile_sample_rate=profile_sample_rate)
+    metrics.instrument_server(app)
+
+    def surge_state():
+        """Serves the surge detector's baselines and events as JSON."""
+        # Snapshot under the lock, so a concurrent refresh cannot change the state mid-read
+        with refresh_lock:
+            day, reports, late_reports = surges.day, surges.reports, surges.late_reports
+            series, events = surges.state_frame(), surges.events_frame()
+        return jsonify({
+            'day': None if day is None else day.isoformat(),
+            'reports': reports,
+            'late_reports': late_reports,
+            'series': series.replace({np.nan: None}).to_dict('records'),
+            'events': events.assign(date=lambda e: e['date'].astype(str)).to_dict('records'),
+        })
+
+    app.server.add_url_rule('/surge-state', 'surge_state', surge_state)
+    finish_figure = compact_figure if compact_payloads else (lambda fig: fig)
 
     # Layout of the dashboard
     app.layout = html.Div([
@@ -49,10 +195,23 @@ def create_dashboard(file_path: str = "data/blood_reports_dataset.csv") -> dash.
                     clearable=False
                 ),
             ], style={'width': '48%', 'float': 'right', 'display': 'inline-block'}),
+            html.Div([
+                html.Label("Select Date Range:"),
+                dcc.DatePickerRange(
+                    id='date-range',
+                    min_date_allowed=df['Date'].min(),
+                    max_date_allowed=df['Date'].max(),
+                    clearable=True
+                ),
+            ], style={'paddingTop': '10px'}),
         ], style={'padding': '20px'}),
 
         dcc.Store(id='filtered-data'), # Hidden component to store filtered data
 
+        # Periodic check for appended reports; the store holds the row count seen by this browser
+        dcc.Interval(id='refresh-interval', interval=max(refresh_seconds, 1) * 1000, disabled=not refresh_seconds),
+        dcc.Store(id='data-version', data={'rows': len(df), 'since': len(df)}),
+
         # Infection Trends over Time
         html.H2("Infection Trends Over Time"),
         dcc.Graph(id='infection-trends'),
@@ -63,92 +222,251 @@ def create_dashboard(file_path: str = "data/blood_reports_dataset.csv") -> dash.
 
         # CRP Trends to monitor inflammation spikes
         html.H2("CRP Trends (Inflammation Spikes)"),
-        dcc.Graph(id='crp-trends'),
+        dcc.Graph(id='crp-trends'),  # Downsampled; zooming re-fetches detail for the visible window
+        html.Div(id='crp-status'),
+
+        # Recent surges found by the streaming detector
+        html.H2("Abnormal Surge Alerts"),
+        html.Div(id='surge-alerts'),
 
         # Branch Performance (Placeholder for now)
         html.H2("Branch Performance (Data Not Available in Current Dataset)"),
         html.Div("This section requires 'Lab_ID' or similar branch-specific data.")
     ])
 
-    # Callback to filter data and store it
+    def filter_frame(selected_gender, selected_diagnosis, start_date, end_date):
+        """Builds the filtered view for one filter combination (read-only, shared by callbacks)."""
+        gender = None if selected_gender == 'All' else selected_gender
+        diagnosis = None if selected_diagnosis == 'All' else selected_diagnosis
+        if partitions_root:
+            # Only the months overlapping the range are read from disk
+            stored = query_reports(start_date, end_date, gender=gender, diagnosis=diagnosis,
+                                   columns=CHART_COLUMNS, root=partitions_root)
+            # Reports appended since the CSV was loaded are only in memory
+            positions = index.positions(start_date, end_date, Gender=gender, Diagnosis=diagnosis)
+            appended = positions[np.searchsorted(positions, live.loaded_rows):]
+            if not len(appended):
+                return stored
+            return concat_reports([stored, live.take(appended, columns=CHART_COLUMNS)])
+
+        return live.select(index, columns=CHART_COLUMNS, start_date=start_date, end_date=end_date,
+                           Gender=gender, Diagnosis=diagnosis)
+
+    filtered_frames = FilteredFrameCache(filter_frame, max_entries=filter_cache_size)
+
+    def sorted_crp_series(*key):
+        """Returns the CRP series of a filtered view sorted by date, as int64 ns and float arrays."""
+        crp_df = filtered_frames.get(key)[['Date', 'CRP_mg_L']].sort_values('Date', kind='stable')
+        return crp_df['Date'].to_numpy().astype('datetime64[ns]').view(np.int64), crp_df['CRP_mg_L'].to_numpy()
+
+    # Sorted once per filter combination, then sliced per zoom window
+    crp_series = FilteredFrameCache(sorted_crp_series, max_entries=filter_cache_size)
+    metrics.register_cache('filtered_frames', filtered_frames)
+    metrics.register_cache('crp_series', crp_series)
+
+    # Callback to pick up appended reports and tell the charts how far this browser had seen
+    @app.callback(
+        Output('data-version', 'data'),
+        Output('date-range', 'max_date_allowed'),
+        Input('refresh-interval', 'n_intervals'),
+        State('data-version', 'data')
+    )
+    def refresh_data(_, data_version):
+        # Only the server process refreshes; forked background jobs must not (a lock held at fork stays held)
+        refresh()
+        seen = (data_version or {}).get('rows')
+        if seen == live.num_rows:
+            return dash.no_update, dash.no_update
+        return {'rows': live.num_rows, 'since': seen}, live.column_max('Date')
+
+    # Callback to filter data and store only its cache key
     @app.callback(
         Output('filtered-data', 'data'),
         Input('gender-filter', 'value'),
-        Input('diagnosis-filter', 'value')
+        Input('diagnosis-filter', 'value'),
+        Input('date-range', 'start_date'),
+        Input('date-range', 'end_date'),
+        Input('data-version', 'data')
     )
-    def filter_data(selected_gender, selected_diagnosis):
-        filtered_df = df.copy()
-        if selected_gender != 'All':
-            filtered_df = filtered_df[filtered_df['Gender'] == selected_gender]
-        if selected_diagnosis != 'All':
-            filtered_df = filtered_df[filtered_df['Diagnosis'] == selected_diagnosis]
-        return filtered_df.to_json(date_format='iso', orient='split')
+    @metrics.instrument('filter_data', filters=lambda *args: filters_label(*args[:4]))
+    def filter_data(selected_gender, selected_diagnosis, start_date, end_date, data_version):
+        if dash.callback_context.triggered_id == 'data-version' and not is_stale(
+                data_version, selected_gender, selected_diagnosis, start_date, end_date):
+            return dash.no_update
+        key = FilteredFrameCache.make_key(selected_gender, selected_diagnosis, start_date, end_date)
+        # Warm the caches before the chart callbacks fire; background jobs inherit them
+        with phase('filter'):
+            frame, hit = filtered_frames.lookup(key)
+        cache_result(hit)
+        if not hit:
+            scanned(live.num_rows if partitions_root is None else len(frame))
+        with phase('aggregate'):
+            cache_result(crp_series.lookup(key)[1])
+        return list(key)
 
     # Callback for Infection Trends
     @app.callback(
         Output('infection-trends', 'figure'),
-        Input('filtered-data', 'data')
+        Input('gender-filter', 'value'),
+        Input('diagnosis-filter', 'value'),
+        Input('date-range', 'start_date'),
+        Input('date-range', 'end_date'),
+        Input('data-version', 'data')
     )
-    def update_infection_trends(jsonified_filtered_data):
+    @metrics.instrument('update_infection_trends', filters=lambda *args: filters_label(*args[:4]))
+    def update_infection_trends(selected_gender, selected_diagnosis, start_date, end_date, data_version):
         """Updates the infection trends graph based on the dataset and filters.
 
         Args:
-            jsonified_filtered_data (str): JSON string of the filtered dataframe.
+            selected_gender (str): The selected gender, or 'All'.
+            selected_diagnosis (str): The selected diagnosis, or 'All'.
+            start_date (str): Inclusive start of the selected date range, or None.
+            end_date (str): Inclusive end of the selected date range, or None.
+            data_version (dict): Row counts before and after the last refresh seen by the browser.
 
         Returns:
             plotly.graph_objects.Figure: The updated infection trends line plot.
         """
-        filtered_df = pd.read_json(jsonified_filtered_data, orient='split')
-        filtered_df['Date'] = pd.to_datetime(filtered_df['Date'])
-
-        infection_df = filtered_df[filtered_df['Diagnosis'].isin(['Bacterial infection', 'Viral infection'])]
-        infection_counts = infection_df.groupby('Date').size().reset_index(name='count')
-        fig = px.line(infection_counts, x='Date', y='count', title='Daily Infection Cases')
-        return fig
+        if dash.callback_context.triggered_id == 'data-version' and not is_stale(
+                data_version, selected_gender, selected_diagnosis, start_date, end_date):
+            return dash.no_update
+        with phase('filter'):
+            cells = cube.select(**cube_filters(selected_gender, selected_diagnosis, start_date, end_date))
+            infection_cells = cells[cells['Diagnosis'].isin(INFECTION_DIAGNOSES)]
+        scanned(len(cube.cells))
+        with phase('aggregate'):
+            infection_counts = cube.summarize(['Date'], cells=infection_cells)[['Date', 'count']]
+        with phase('figure'):
+            fig = px.line(infection_counts, x='Date', y='count', title='Daily Infection Cases')
+            return finish_figure(fig)
 
     # Callback for Anemia Distribution
     @app.callback(
         Output('anemia-distribution', 'figure'),
-        Input('filtered-data', 'data')
+        Input('gender-filter', 'value'),
+        Input('diagnosis-filter', 'value'),
+        Input('date-range', 'start_date'),
+        Input('date-range', 'end_date'),
+        Input('data-version', 'data')
     )
-    def update_anemia_distribution(jsonified_filtered_data):
+    @metrics.instrument('update_anemia_distribution', filters=lambda *args: filters_label(*args[:4]))
+    def update_anemia_distribution(selected_gender, selected_diagnosis, start_date, end_date, data_version):
         """Updates the anemia distribution graph based on the dataset and filters.
 
         Args:
-            jsonified_filtered_data (str): JSON string of the filtered dataframe.
+            selected_gender (str): The selected gender, or 'All'.
+            selected_diagnosis (str): The selected diagnosis, or 'All'.
+            start_date (str): Inclusive start of the selected date range, or None.
+            end_date (str): Inclusive end of the selected date range, or None.
+            data_version (dict): Row counts before and after the last refresh seen by the browser.
 
         Returns:
             plotly.graph_objects.Figure: The updated anemia distribution bar chart.
         """
-        filtered_df = pd.read_json(jsonified_filtered_data, orient='split')
+        if dash.callback_context.triggered_id == 'data-version' and not is_stale(
+                data_version, selected_gender, selected_diagnosis, start_date, end_date):
+            return dash.no_update
+        with phase('filter'):
+            cells = cube.select(**cube_filters(selected_gender, selected_diagnosis, start_date, end_date))
+            anemia_cells = cells[cells['Diagnosis'] == 'Anemia']
+        scanned(len(cube.cells))
+        with phase('aggregate'):
+            anemia_age_gender = cube.summarize(['Age', 'Gender'], cells=anemia_cells)[['Age', 'Gender', 'count']]
+        with phase('figure'):
+            fig = px.bar(anemia_age_gender, x='Age', y='count', color='Gender', title='Anemia Cases by Age and Gender')
+            return finish_figure(fig)
 
-        anemia_df = filtered_df[filtered_df['Diagnosis'] == 'Anemia']
-        anemia_age_gender = anemia_df.groupby(['Age', 'Gender']).size().reset_index(name='count')
-        fig = px.bar(anemia_age_gender, x='Age', y='count', color='Gender', title='Anemia Cases by Age and Gender')
-        return fig
+    # Callback for the surge alerts
+    @app.callback(
+        Output('surge-alerts', 'children'),
+        Input('data-version', 'data')
+    )
+    def update_surge_alerts(_):
+        """Lists the most recent surge events, newest first.
+
+        Returns:
+            dash.html.Table | dash.html.Div: The events table, or a note when there are none.
+        """
+        with refresh_lock:
+            events = surges.events_frame()
+        events = events.tail(SURGE_ROWS).iloc[::-1]
+        if events.empty:
+            return html.Div("No surges detected.")
+        header = ['Date', 'Gender', 'Segment', 'Metric', 'Kind', 'Value', 'Expected', 'z']
+        return html.Table(
+            [html.Tr([html.Th(col) for col in header])] +
+            [html.Tr([html.Td(cell) for cell in (
+                event.date.strftime('%Y-%m-%d'), event.gender, event.group, event.metric, event.kind,
+                f"{event.value:.2f}", f"{event.expected:.2f}", f"{event.z:.1f}")])
+             for event in events.itertuples(index=False)]
+        )
 
     # Callback for CRP Trends
     @app.callback(
         Output('crp-trends', 'figure'),
-        Input('filtered-data', 'data')
+        Input('filtered-data', 'data'),
+        Input('crp-trends', 'relayoutData'),
+        background=True,
+        interval=250,
+        running=[(Output('crp-status', 'children'), "Updating CRP trend…", "")],
+        cache_ignore_triggered=False
     )
-    def update_crp_trends(jsonified_filtered_data):
-        """Updates the CRP trends graph based on the dataset and filters.
+    @metrics.instrument('update_crp_trends', filters=lambda filter_key, *_: filters_label(*(filter_key or [])))
+    def update_crp_trends(filter_key, relayout_data):
+        """Updates the CRP trends graph based on the dataset, filters and zoom window.
+
+        The series is downsampled with LTTB to `CRP_MAX_POINTS` points and drawn as a
+        WebGL trace. When the user zooms or pans, only the visible window is
+        re-downsampled, so detail increases as the window narrows.
 
         Args:
-            jsonified_filtered_data (str): JSON string of the filtered dataframe.
+            filter_key (list): Cache key of the filtered view, as held by the `filtered-data` store.
+            relayout_data (dict): The graph's `relayoutData` after a zoom, pan or reset.
 
         Returns:
             plotly.graph_objects.Figure: The updated CRP levels line plot.
         """
-        filtered_df = pd.read_json(jsonified_filtered_data, orient='split')
-        filtered_df['Date'] = pd.to_datetime(filtered_df['Date'])
+        with phase('filter'):
+            (dates, crp), hit = crp_series.lookup(filter_key)
+        cache_result(hit)
 
-        crp_df = filtered_df.sort_values('Date')
-        fig = px.line(crp_df, x='Date', y='CRP_mg_L', title='CRP Levels Over Time')
-        return fig
+        # A new filter always shows the full range; a relayout only refines the window
+        window = None
+        if dash.callback_context.triggered_id == 'crp-trends':
+            window = visible_x_range(relayout_data)
+            if window is None:
+                return dash.no_update
+        if window and window != 'autorange':
+            with phase('filter'):
+                lo, hi = (pd.Timestamp(bound).value for bound in window)
+                start, end = np.searchsorted(dates, lo, side='left'), np.searchsorted(dates, hi, side='right')
+                dates, crp = dates[start:end], crp[start:end]
+        scanned(len(dates))
+
+        with phase('aggregate'):
+            keep = lttb(dates, crp, CRP_MAX_POINTS)
+        with phase('figure'):
+            fig = go.Figure(go.Scattergl(x=dates[keep].astype('datetime64[ns]'), y=crp[keep], mode='lines', name='CRP_mg_L'))
+            fig.update_layout(
+                title=f'CRP Levels Over Time ({len(keep):,} of {len(dates):,} points shown)',
+                xaxis_title='Date', yaxis_title='CRP_mg_L',
+                uirevision=str(filter_key)  # Keep the user's zoom while detail is re-fetched
+            )
+            if window and window != 'autorange':
+                fig.update_xaxes(range=list(window))
+            return finish_figure(fig)
     
     return app
 
 
-app = create_dashboard()
\ No newline at end of file
+app = create_dashboard(shared_memory=os.environ.get('DASHBOARD_SHARED_MEMORY') == '1',
+                       partitions_root=os.environ.get('DASHBOARD_PARTITIONS_DIR'),
+                       refresh_seconds=int(os.environ.get('DASHBOARD_REFRESH_SECONDS', '60')),
+                       incoming_dir=os.environ.get('DASHBOARD_INCOMING_DIR'),
+                       compact_payloads=os.environ.get('DASHBOARD_COMPACT_PAYLOADS', '1') == '1',
+                       slow_callback_seconds=float(os.environ.get('DASHBOARD_SLOW_CALLBACK_SECONDS', '1.0')),
+                       profile_sample_rate=float(os.environ.get('DASHBOARD_PROFILE_SAMPLE_RATE', '0')))
+server = app.server
+
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -0,0 +1,46 @@
+"""Module for shape-preserving downsampling of long time series for plotting.
+
+A browser cannot usefully draw one marker per report once a series reaches
+hundreds of thousands of points, and a chart is only about a thousand pixels
+wide. `lttb` reduces a sorted (x, y) series to roughly the plot's pixel width
+while keeping its visual shape, so spikes survive the reduction.
+"""
+
+import numpy as np
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Selects points with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept. The rest of the series is split
+    into `n_out - 2` buckets, and from each bucket the point forming the largest
+    triangle with the previously selected point and the next bucket's average is kept.
+
+    Args:
+        x (np.ndarray): Sorted x values (numeric; convert datetimes to int64 first).
+        y (np.ndarray): The y values.
+        n_out (int): The number of points to keep.
+
+    Returns:
+        np.ndarray: Indices of the selected points, in ascending order.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 buckets over x[1:-1]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
@@ -0,0 +1,100 @@
+"""Module for the server-side cache of filtered dashboard frames.
+
+Instead of serializing filtered DataFrames into a `dcc.Store` (and parsing them
+back in every chart callback), the dashboard keeps filtered views in a bounded
+in-process LRU cache keyed by the filter tuple. The browser only holds the key,
+and chart callbacks read the cached frame directly.
+
+Frames are computed outside the lock. Every invalidation bumps a generation
+counter, and a frame whose computation overlapped one is returned but not
+stored, since it may predate the rows that invalidation was for.
+"""
+
+import threading
+
+import pandas as pd
+from cachetools import LRUCache
+
+class FilteredFrameCache:
+    """A thread-safe, size-bounded LRU cache of filtered frames keyed by filter tuples."""
+
+    def __init__(self, compute, max_entries: int = 32):
+        """Initializes the cache.
+
+        Args:
+            compute (callable): Builds the filtered frame for a key, called as `compute(*key)`.
+            max_entries (int): Maximum number of cached frames; the least recently
+                used entry is evicted beyond this.
+        """
+        self._compute = compute
+        self._frames = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        # Bumped by `invalidate` and `clear`
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*filter_values) -> tuple:
+        """Builds a cache key from filter values (JSON-serializable, so it fits a `dcc.Store`)."""
+        return tuple(filter_values)
+
+    def get(self, key) -> pd.DataFrame:
+        """Returns the filtered frame for a key, computing and caching it on a miss.
+
+        Keys coming back from the browser are lists; they are normalized to tuples,
+        so a frame evicted (or built by another worker process) is simply recomputed.
+
+        Args:
+            key (tuple | list): The filter values.
+
+        Returns:
+            pd.DataFrame: The filtered frame. Callers must treat it as read-only.
+        """
+        return self.lookup(key)[0]
+
+    def lookup(self, key) -> tuple:
+        """Like `get`, but also reports whether the frame came from the cache.
+
+        Args:
+            key (tuple | list): The filter values.
+
+        Returns:
+            tuple: (filtered frame, True on a cache hit).
+        """
+        key = tuple(key)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self.hits += 1
+                return frame, True
+            self.misses += 1
+            generation = self._generation
+
+        frame = self._compute(*key)
+        with self._lock:
+            if self._generation == generation:
+                self._frames[key] = frame
+        return frame, False
+
+    def invalidate(self, predicate) -> int:
+        """Drops the cached frames whose key matches a predicate, keeping the rest.
+
+        Args:
+            predicate (callable): Called with each key; returns True for stale entries.
+
+        Returns:
+            int: The number of dropped entries.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._frames if predicate(key)]
+            for key in stale:
+                del self._frames[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drops every cached frame."""
+        with self._lock:
+            self._generation += 1
+            self._frames.clear()
@@ -0,0 +1,305 @@
+"""Module for per-callback performance instrumentation of the dashboards.
+
+Callbacks decorated with `CallbackMetrics.instrument` are timed per callback and
+filter combination. Inside a callback, `phase('filter')`, `phase('aggregate')`
+and `phase('figure')` (building the output: figures or table records) blocks split
+the wall time, `scanned(n)` counts the rows
+(or rollup cells) read, and `cache_result(hit)` records whether a cached view
+was reused. The time spent after the callback body in the request that returns
+its result (JSON encoding) is recorded as the 'serialize' phase,
+together with the response size.
+
+`instrument_server` serves everything as Prometheus text on `/metrics`.
+Background callbacks run in child processes, so their records are spooled to
+disk and merged into the server's totals on each scrape. Callbacks slower than
+`slow_seconds` are logged with their phase breakdown, and a sample of calls can
+be profiled with cProfile, keeping the profiles of the slow ones.
+"""
+
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import diskcache
+from flask import Response, g, has_request_context, request
+
+from dash_app.background import CALLBACK_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the callback duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_record = contextvars.ContextVar('callback_record', default=None)
+
+def filters_label(gender=None, diagnosis=None, start_date=None, end_date=None) -> str:
+    """Builds the metric label of a filter combination, bucketing date ranges to keep cardinality low.
+
+    Args:
+        gender (str): The selected gender, or 'All'/None.
+        diagnosis (str): The selected diagnosis, or 'All'/None.
+        start_date (str): Start of the selected date range, or None.
+        end_date (str): End of the selected date range, or None.
+
+    Returns:
+        str: A label such as 'gender=F,diagnosis=All,dates=range'.
+    """
+    dates = 'range' if start_date or end_date else 'all'
+    return f"gender={gender or 'All'},diagnosis={diagnosis or 'All'},dates={dates}"
+
+class CallbackRecord:
+    """Timings and counters collected during one callback call."""
+
+    def __init__(self, callback: str, filters: str):
+        self.callback = callback
+        self.filters = filters
+        self.phases = {}
+        self.rows_scanned = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        """Returns the record as a plain dict (for spooling across processes)."""
+        return dict(vars(self))
+
+@contextmanager
+def phase(name: str):
+    """Adds the time spent in the block to a phase of the current callback record (no-op outside one)."""
+    record = _current_record.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record.phases[name] = record.phases.get(name, 0.0) + time.perf_counter() - start
+
+def scanned(rows: int) -> None:
+    """Adds to the number of rows (or rollup cells) read by the current callback."""
+    record = _current_record.get()
+    if record is not None:
+        record.rows_scanned += int(rows)
+
+def cache_result(hit: bool) -> None:
+    """Records a cache hit or miss for the current callback."""
+    record = _current_record.get()
+    if record is not None:
+        if hit:
+            record.cache_hits += 1
+        else:
+            record.cache_misses += 1
+
+def _escape(value) -> str:
+    """Escapes a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class CallbackMetrics:
+    """Per callback and filter combination totals, exposed in Prometheus text format."""
+
+    def __init__(self, name: str, slow_seconds: float = None, profile_sample_rate: float = 0.0,
+                 profile_dir: str = None):
+        """Initializes empty metrics.
+
+        Args:
+            name (str): Name of the app; separates the on-disk spools of different apps.
+            slow_seconds (float): Callbacks slower than this are logged (and their sampled
+                profiles kept); None disables both.
+            profile_sample_rate (float): Fraction of calls run under cProfile (0 disables).
+            profile_dir (str): Where profiles of slow sampled calls are written.
+        """
+        self.slow_seconds = slow_seconds
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_dir = profile_dir or os.path.join(CALLBACK_CACHE_DIR, 'profiles')
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._spool = diskcache.Deque(directory=os.path.join(CALLBACK_CACHE_DIR, 'metrics', name))
+        self._series = {}
+        self._caches = {}
+        self._instrumented = set()
+
+    def instrument(self, callback: str, filters=None):
+        """Decorates a callback so each call is timed and recorded.
+
+        Args:
+            callback (str): The callback name used as metric label.
+            filters (callable): Maps the callback's arguments to a `filters_label`; None
+                labels every call 'all'.
+
+        Returns:
+            callable: The decorator.
+        """
+        self._instrumented.add(callback)
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                record = CallbackRecord(callback, filters(*args, **kwargs) if filters else 'all')
+                token = _current_record.set(record)
+                profiler = cProfile.Profile() if random.random() < self.profile_sample_rate else None
+                start = time.perf_counter()
+                try:
+                    if profiler is not None:
+                        return profiler.runcall(func, *args, **kwargs)
+                    return func(*args, **kwargs)
+                finally:
+                    record.seconds = time.perf_counter() - start
+                    _current_record.reset(token)
+                    self._finish(record, profiler)
+            return wrapper
+        return decorator
+
+    def _finish(self, record: CallbackRecord, profiler) -> None:
+        """Logs slow calls, keeps their profiles and stores the record."""
+        if self.slow_seconds is not None and record.seconds > self.slow_seconds:
+            logger.warning("Slow callback %s [%s]: %.3fs (%s), %d rows scanned",
+                           record.callback, record.filters, record.seconds,
+                           ', '.join(f'{name} {seconds:.3f}s' for name, seconds in record.phases.items()),
+                           record.rows_scanned)
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f'{record.callback}-{time.time_ns()}.prof'))
+
+        if os.getpid() != self._pid:
+            # Background job process: hand the record to the server process
+            self._spool.append(record.as_dict())
+            return
+        self.observe(record)
+        if has_request_context():
+            g.callback_record = record
+
+    def observe(self, record) -> None:
+        """Adds a record (a `CallbackRecord` or its dict form) to the totals."""
+        record = record if isinstance(record, dict) else record.as_dict()
+        with self._lock:
+            series = self._series_for(record['callback'], record['filters'])
+            series['count'] += 1
+            series['seconds'] += record['seconds']
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if record['seconds'] <= bound:
+                    series['buckets'][i] += 1
+            for name, seconds in record['phases'].items():
+                series['phases'][name] = series['phases'].get(name, 0.0) + seconds
+            for counter in ('rows_scanned', 'cache_hits', 'cache_misses'):
+                series[counter] += record[counter]
+
+    def _series_for(self, callback: str, filters: str) -> dict:
+        """Returns the totals of one callback and filter combination, creating them empty."""
+        return self._series.setdefault((callback, filters), {
+            'count': 0, 'seconds': 0.0, 'buckets': [0] * len(DURATION_BUCKETS), 'phases': {},
+            'rows_scanned': 0, 'cache_hits': 0, 'cache_misses': 0, 'responses': 0, 'response_bytes': 0,
+        })
+
+    def observe_response(self, callback: str, filters: str, serialize_seconds: float, response_bytes: int) -> None:
+        """Adds a callback response's serialize time and size to the totals."""
+        with self._lock:
+            series = self._series_for(callback, filters)
+            series['phases']['serialize'] = series['phases'].get('serialize', 0.0) + serialize_seconds
+            series['responses'] += 1
+            series['response_bytes'] += response_bytes
+
+    def register_cache(self, name: str, cache) -> None:
+        """Exposes the hit/miss counters of a `FilteredFrameCache` under `name`."""
+        self._caches[name] = cache
+
+    def _drain_spool(self) -> None:
+        """Merges the records spooled by background job processes."""
+        while True:
+            try:
+                record = self._spool.popleft()
+            except IndexError:
+                return
+            self.observe(record)
+
+    def render(self) -> str:
+        """Returns all metrics in Prometheus text exposition format."""
+        self._drain_spool()
+        with self._lock:
+            series = {key: {**value, 'phases': dict(value['phases']), 'buckets': list(value['buckets'])}
+                      for key, value in self._series.items()}
+
+        lines = ['# HELP dashboard_callback_seconds Wall time of dashboard callbacks.',
+                 '# TYPE dashboard_callback_seconds histogram']
+        for (callback, filters), value in sorted(series.items()):
+            labels = f'callback="{_escape(callback)}",filters="{_escape(filters)}"'
+            for bound, count in zip(DURATION_BUCKETS, value['buckets']):
+                lines.append(f'dashboard_callback_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'dashboard_callback_seconds_bucket{{{labels},le="+Inf"}} {value["count"]}')
+            lines.append(f'dashboard_callback_seconds_sum{{{labels}}} {value["seconds"]:.6f}')
+            lines.append(f'dashboard_callback_seconds_count{{{labels}}} {value["count"]}')
+
+        counters = [
+            ('dashboard_callback_phase_seconds_total', 'Wall time per callback phase.',
+             lambda value: [(f',phase="{name}"', seconds) for name, seconds in sorted(value['phases'].items())]),
+            ('dashboard_callback_rows_scanned_total', 'Rows (or rollup cells) read by callbacks.',
+             lambda value: [('', value['rows_scanned'])]),
+            ('dashboard_callback_cache_total', 'Cached view lookups by callbacks.',
+             lambda value: [(',result="hit"', value['cache_hits']), (',result="miss"', value['cache_misses'])]),
+            ('dashboard_callback_response_bytes_total', 'Uncompressed size of callback responses.',
+             lambda value: [('', value['response_bytes'])]),
+            ('dashboard_callback_responses_total', 'Callback responses sent.',
+             lambda value: [('', value['responses'])]),
+        ]
+        for metric, help_text, samples in counters:
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for (callback, filters), value in sorted(series.items()):
+                labels = f'callback="{_escape(callback)}",filters="{_escape(filters)}"'
+                lines += [f'{metric}{{{labels}{extra}}} {sample}' for extra, sample in samples(value)]
+
+        lines += ['# HELP dashboard_frame_cache_total Filtered view cache lookups in this process.',
+                  '# TYPE dashboard_frame_cache_total counter']
+        for name, cache in sorted(self._caches.items()):
+            lines.append(f'dashboard_frame_cache_total{{cache="{_escape(name)}",result="hit"}} {cache.hits}')
+            lines.append(f'dashboard_frame_cache_total{{cache="{_escape(name)}",result="miss"}} {cache.misses}')
+        return '\n'.join(lines) + '\n'
+
+    def instrument_server(self, app) -> None:
+        """Adds the `/metrics` route and request hooks measuring serialize time and response size.
+
+        Call this after `enable_compression`: Flask runs the later-registered hook
+        first, so responses are measured before they are compressed.
+
+        Args:
+            app (dash.Dash): The Dash app; its callbacks are matched to responses by output.
+        """
+        server = app.server
+
+        @server.before_request
+        def start_timer():
+            g.request_start = time.perf_counter()
+
+        @server.after_request
+        def record_response(response):
+            if not request.path.endswith('_dash-update-component') or response.status_code != 200:
+                return response
+            body = request.get_json(silent=True) or {}
+            entry = app.callback_map.get(body.get('output'))
+            callback = entry['callback'].__name__ if entry else None
+            if callback not in self._instrumented:
+                return response
+            data = response.get_data()
+            if b'"response":' not in data:
+                return response  # A background job was started or is still running
+            record = g.get('callback_record')
+            inputs = {f"{item.get('id')}.{item.get('property')}": item.get('value')
+                      for item in body.get('inputs', []) if isinstance(item, dict)}
+            filters = record.filters if record is not None else filters_from_inputs(inputs)
+            elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+            self.observe_response(callback, filters, max(elapsed - (record.seconds if record else 0.0), 0.0), len(data))
+            return response
+
+        server.add_url_rule('/metrics', 'metrics',
+                            lambda: Response(self.render(), mimetype='text/plain; version=0.0.4'))
+
+def filters_from_inputs(inputs: dict) -> str:
+    """Builds the filters label from a callback request's input values by 'id.property'."""
+    filter_key = inputs.get('filtered-data.data')
+    if isinstance(filter_key, list) and len(filter_key) == 4:
+        return filters_label(*filter_key)
+    return filters_label(inputs.get('gender-filter.value'), inputs.get('diagnosis-filter.value'),
+                         inputs.get('date-range.start_date'), inputs.get('date-range.end_date'))
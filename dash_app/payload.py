@@ -0,0 +1,156 @@
+"""Module for compact dashboard callback payloads.
+
+Callback responses are dominated by figure data. `compact_figure` rewrites a
+figure's trace arrays so they serialize as Plotly typed arrays (a dtype plus a
+base64 buffer) in the smallest lossless dtype. Dates are sent as epoch
+milliseconds on a date axis instead of 30-character ISO strings. Figures are
+serialized with orjson. `enable_compression` then Brotli- or gzip-compresses
+responses on the Flask server and records, per callback output, the payload
+size before and after compression (served as JSON on `/payload-stats`).
+"""
+
+import gzip
+import threading
+
+import numpy as np
+import plotly.io as pio
+from flask import jsonify, request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Serialize figures with orjson (Plotly's fastest JSON engine, handles numpy natively)
+pio.json.config.default_engine = 'orjson'
+
+# Trace attributes holding per-point data
+ARRAY_ATTRIBUTES = ('x', 'y', 'z', 'values', 'customdata')
+
+# Integer dtypes Plotly.js can decode from typed arrays, smallest first
+_INT_DTYPES = (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32)
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript', 'text/javascript', 'text/html', 'text/css'}
+
+def _compact_array(values):
+    """Returns (array in its smallest lossless typed-array dtype, is_date), or (None, False) if not numeric."""
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'M':
+        # Date axes accept epoch milliseconds; 8 bytes per point instead of an ISO string
+        return arr.astype('datetime64[ms]').astype(np.int64).astype(np.float64), True
+    if arr.dtype.kind in 'iu' and arr.size:
+        low, high = arr.min(), arr.max()
+        for dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return arr.astype(dtype), False
+        return arr.astype(np.float64), False
+    if arr.dtype.kind == 'f':
+        as_float32 = arr.astype(np.float32)
+        lossless = np.array_equal(as_float32.astype(arr.dtype), arr, equal_nan=True)
+        return (as_float32 if lossless else arr.astype(np.float64)), False
+    return None, False
+
+def compact_figure(fig):
+    """Rewrites a figure's numeric and date trace arrays as compact typed arrays, in place.
+
+    Values are unchanged: floats are narrowed to float32 only when exact, integers
+    to the smallest integer type that holds them, and datetimes become epoch
+    milliseconds with the trace's axis set to type 'date'.
+
+    Args:
+        fig (plotly.graph_objects.Figure): The figure to compact.
+
+    Returns:
+        plotly.graph_objects.Figure: The same figure.
+    """
+    for trace in fig.data:
+        for attribute in ARRAY_ATTRIBUTES:
+            values = getattr(trace, attribute, None) if attribute in trace else None
+            if values is None or isinstance(values, (str, dict)):
+                continue
+            compact, is_date = _compact_array(values)
+            if compact is None:
+                continue
+            trace[attribute] = compact
+            if is_date and attribute in ('x', 'y'):
+                axis_id = trace[f'{attribute}axis'] or attribute
+                fig.layout[f'{attribute}axis{axis_id[1:]}'].type = 'date'
+    return fig
+
+class PayloadStats:
+    """Thread-safe running totals of response sizes before and after compression."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}
+
+    def record(self, name: str, raw_bytes: int, sent_bytes: int) -> None:
+        """Adds one response to the totals of `name` (a callback output or a path)."""
+        with self._lock:
+            count, raw, sent = self.totals.get(name, (0, 0, 0))
+            self.totals[name] = (count + 1, raw + raw_bytes, sent + sent_bytes)
+
+    def summary(self) -> list:
+        """Returns one dict per name with response count, total bytes before/after and the ratio."""
+        with self._lock:
+            items = sorted(self.totals.items())
+        return [{'name': name, 'responses': count, 'raw_bytes': raw, 'sent_bytes': sent,
+                 'ratio': round(sent / raw, 3) if raw else None}
+                for name, (count, raw, sent) in items]
+
+def _response_name() -> str:
+    """Names a response by its callback output, or by its path for non-callback requests."""
+    if request.path.endswith('_dash-update-component'):
+        body = request.get_json(silent=True) or {}
+        return body.get('output', request.path)
+    return request.path
+
+def enable_compression(server, min_size: int = 1024, brotli_quality: int = 5, gzip_level: int = 6) -> PayloadStats:
+    """Compresses the server's text responses with Brotli (or gzip) and tracks their sizes.
+
+    The per-output totals are served as JSON on `/payload-stats`.
+
+    Compressed component bundles (Plotly.js alone is several MB) are memoized, since
+    their content never changes while the server runs.
+
+    Args:
+        server (flask.Flask): The Dash app's Flask server (`app.server`).
+        min_size (int): Responses smaller than this many bytes are sent uncompressed.
+        brotli_quality (int): Brotli quality (0-11); mid values suit per-request compression.
+        gzip_level (int): gzip level (1-9), used when the client or server lacks Brotli.
+
+    Returns:
+        PayloadStats: The size totals, updated on every response.
+    """
+    stats = PayloadStats()
+    static_cache = {}
+
+    @server.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        data = response.get_data()
+        accept = request.headers.get('Accept-Encoding', '')
+        encoding = 'br' if brotli is not None and 'br' in accept else 'gzip' if 'gzip' in accept else None
+        if len(data) < min_size or encoding is None:
+            stats.record(_response_name(), len(data), len(data))
+            return response
+
+        static_key = (request.path, encoding) if request.path.startswith('/_dash-component-suites/') else None
+        body = static_cache.get(static_key) if static_key else None
+        if body is None:
+            body = brotli.compress(data, quality=brotli_quality) if encoding == 'br' else gzip.compress(data, gzip_level)
+            if static_key:
+                static_cache[static_key] = body
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['X-Uncompressed-Length'] = str(len(data))
+        response.vary.add('Accept-Encoding')
+        stats.record(_response_name(), len(data), len(body))
+        return response
+
+    server.add_url_rule('/payload-stats', 'payload_stats', lambda: jsonify(stats.summary()))
+    return stats
@@ -0,0 +1,130 @@
+"""Module for server-side paging, sorting and filtering of Dash DataTables.
+
+With `page_action`, `sort_action` and `filter_action` set to 'custom', the
+DataTable sends its `filter_query`, `sort_by`, `page_current` and `page_size`
+to the server. These helpers evaluate them in pandas and return only the rows
+of the visible page, so the browser never receives the full table.
+"""
+
+import numpy as np
+import pandas as pd
+
+# DataTable filter operators, in the order they must be matched
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+
+def split_filter_part(filter_part: str) -> tuple:
+    """Parses one '&&'-separated clause of a DataTable `filter_query`.
+
+    Args:
+        filter_part (str): A clause such as '{Age} >= 40' or '{Diagnosis} contains viral'.
+
+    Returns:
+        tuple: (column name, operator keyword, value), or (None, None, None) if unparseable.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                if value_part and value_part[0] == value_part[-1] and value_part[0] in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + value_part[0], value_part[0])
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # Report the word form of the operator without its trailing space
+                return name, operator_type[0].strip(), value
+    return None, None, None
+
+def apply_filter_query(frame: pd.DataFrame, filter_query: str) -> pd.DataFrame:
+    """Applies a DataTable `filter_query` to a frame with a single combined mask.
+
+    Args:
+        frame (pd.DataFrame): The rows to filter.
+        filter_query (str): The DataTable filter expression ('' for none).
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    if not filter_query:
+        return frame
+
+    mask = np.ones(len(frame), dtype=bool)
+    for filter_part in filter_query.split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in frame.columns:
+            continue
+        column = frame[col_name]
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            # A value that is not a date or number becomes NaT/NaN, which only 'ne' matches
+            if pd.api.types.is_datetime64_any_dtype(column):
+                filter_value = pd.to_datetime(str(filter_value), errors='coerce')
+            elif isinstance(column.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(column):
+                column, filter_value = column.astype(str), str(filter_value)
+            elif pd.api.types.is_numeric_dtype(column):
+                filter_value = pd.to_numeric(filter_value, errors='coerce')
+            mask &= getattr(column, operator)(filter_value).to_numpy()
+        elif operator == 'contains':
+            mask &= column.astype(str).str.contains(str(filter_value), case=False, regex=False).to_numpy()
+        elif operator == 'datestartswith':
+            mask &= column.astype(str).str.startswith(str(filter_value)).to_numpy()
+    return frame[mask]
+
+def sorted_page(frame: pd.DataFrame, sort_by: list, page_current: int, page_size: int) -> pd.DataFrame:
+    """Returns one page of a frame in the requested sort order.
+
+    A single numeric sort key is served with a partial sort (`nsmallest`/`nlargest`)
+    of only the rows up to the end of the requested page; other sorts fall back
+    to a full stable sort.
+
+    Args:
+        frame (pd.DataFrame): The filtered rows.
+        sort_by (list): DataTable `sort_by` entries ({'column_id', 'direction'}).
+        page_current (int): Zero-based page index.
+        page_size (int): Rows per page.
+
+    Returns:
+        pd.DataFrame: The rows of the requested page.
+    """
+    start = page_current * page_size
+    end = start + page_size
+    if not sort_by:
+        return frame.iloc[start:end]
+
+    columns = [entry['column_id'] for entry in sort_by]
+    ascending = [entry['direction'] == 'asc' for entry in sort_by]
+    if len(columns) == 1 and pd.api.types.is_numeric_dtype(frame[columns[0]]):
+        top = frame.nsmallest(end, columns[0]) if ascending[0] else frame.nlargest(end, columns[0])
+        return top.iloc[start:end]
+    return frame.sort_values(columns, ascending=ascending, kind='stable').iloc[start:end]
+
+def page_records(page: pd.DataFrame, decimals: int = 2) -> list:
+    """Converts a page of rows to DataTable records.
+
+    float32 measurements are widened and rounded so the table shows the recorded
+    values (e.g. 16.8) instead of their float32 representation (16.799999...).
+
+    Args:
+        page (pd.DataFrame): The rows of the visible page.
+        decimals (int): Decimal places kept for float32 columns.
+
+    Returns:
+        list: One dict per row.
+    """
+    float32_columns = page.select_dtypes(include='float32').columns
+    if len(float32_columns):
+        page = page.astype({col: 'float64' for col in float32_columns}).round({col: decimals for col in float32_columns})
+    return page.to_dict('records')
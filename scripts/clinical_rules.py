@@ -0,0 +1,142 @@
+"""Module for the declarative clinical rules shared by the generator, dashboards and reports.
+
+Rules are data: each one is a list of (column, operator, threshold) conditions that
+must all hold. They are evaluated over whole columns with vectorized masks and
+`np.select`, never row by row, so classifying a million reports takes milliseconds.
+Inputs can be a DataFrame or any mapping of column name to array.
+
+To add a flag (e.g. a new cytopenia), add an entry to `FLAG_RULES`; to change the
+diagnosis logic, edit `DIAGNOSIS_RULES`, whose order sets the precedence.
+"""
+
+import operator
+
+import numpy as np
+import pandas as pd
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Diagnosis rules in order of precedence; the first matching rule wins
+DIAGNOSIS_RULES = [
+    ('Anemia', [('Haemoglobin_g_dl', '<', 11)]),
+    ('Bacterial infection', [('CRP_mg_L', '>', 10), ('TLC_count_per_cumm', '>', 10000)]),
+    ('Viral infection', [('CRP_mg_L', '>', 10), ('Lymphocytes_%', '>', 50)]),
+    ('Mild inflammation', [('CRP_mg_L', '>', 6)]),
+]
+DEFAULT_DIAGNOSIS = 'Normal'
+
+# Diagnoses counted together as infection cases
+INFECTION_DIAGNOSES = ['Bacterial infection', 'Viral infection']
+
+# Gender-specific haemoglobin thresholds (g/dL) below which a report is anemic
+ANEMIA_HB_THRESHOLDS = {'M': 13.0, 'F': 12.0}
+
+# Independent clinical flags; a report can carry any number of them
+FLAG_RULES = {
+    'Leukocytosis': [('TLC_count_per_cumm', '>', 11000)],
+    'Leukopenia': [('TLC_count_per_cumm', '<', 4000)],
+    'Thrombocytopenia': [('Platelets_lakh_per_cumm', '<', 1.5)],
+    'Thrombocytosis': [('Platelets_lakh_per_cumm', '>', 4.5)],
+    'Lymphocytosis': [('Lymphocytes_%', '>', 50)],
+    'Eosinophilia': [('Eosinophils_%', '>', 6)],
+    'Raised_CRP': [('CRP_mg_L', '>', 10)],
+}
+
+def evaluate_conditions(data, conditions: list) -> np.ndarray:
+    """Evaluates an AND of (column, operator, threshold) conditions over whole columns.
+
+    Args:
+        data (pd.DataFrame | dict): Column name to values.
+        conditions (list): The conditions that must all hold.
+
+    Returns:
+        np.ndarray: Boolean mask, one entry per row.
+    """
+    mask = None
+    for column, op, threshold in conditions:
+        result = OPERATORS[op](np.asarray(data[column]), threshold)
+        mask = result if mask is None else mask & result
+    return mask
+
+def classify_diagnosis(data) -> np.ndarray:
+    """Assigns each report the first matching diagnosis in `DIAGNOSIS_RULES`.
+
+    Args:
+        data (pd.DataFrame | dict): Reports with the columns the rules refer to.
+
+    Returns:
+        np.ndarray: The diagnosis of each report ('Normal' when no rule matches).
+    """
+    return np.select(
+        [evaluate_conditions(data, conditions) for _, conditions in DIAGNOSIS_RULES],
+        [label for label, _ in DIAGNOSIS_RULES],
+        default=DEFAULT_DIAGNOSIS
+    )
+
+def is_abnormal(diagnosis) -> np.ndarray:
+    """Flags reports whose diagnosis is anything other than the default ('Normal').
+
+    Args:
+        diagnosis (array-like): Diagnoses, as returned by `classify_diagnosis`.
+
+    Returns:
+        np.ndarray: Boolean mask of abnormal reports.
+    """
+    return np.asarray(diagnosis, dtype=object) != DEFAULT_DIAGNOSIS
+
+def abnormal_flag(diagnosis) -> np.ndarray:
+    """Returns the dataset's 'Yes'/'No' Abnormal_Flag for each diagnosis."""
+    return np.where(is_abnormal(diagnosis), 'Yes', 'No')
+
+def abnormal_ratio(data) -> float:
+    """Returns the share of reports classified as abnormal.
+
+    Args:
+        data (pd.DataFrame | dict): Reports with a 'Diagnosis' column.
+
+    Returns:
+        float: The fraction of abnormal reports (0.0 for no reports).
+    """
+    abnormal = is_abnormal(data['Diagnosis'])
+    return float(abnormal.mean()) if len(abnormal) else 0.0
+
+def anemia_mask(data) -> np.ndarray:
+    """Flags reports below the gender-specific haemoglobin threshold.
+
+    Args:
+        data (pd.DataFrame | dict): Reports with 'Gender' and 'Haemoglobin_g_dl' columns.
+
+    Returns:
+        np.ndarray: Boolean mask of anemic reports.
+    """
+    gender = np.asarray(data['Gender'], dtype=object)
+    hb = np.asarray(data['Haemoglobin_g_dl'])
+    mask = np.zeros(len(hb), dtype=bool)
+    for value, threshold in ANEMIA_HB_THRESHOLDS.items():
+        mask |= (gender == value) & (hb < threshold)
+    return mask
+
+def anemia_status(data) -> np.ndarray:
+    """Returns 'Anemic' or 'Normal' for each report, using `ANEMIA_HB_THRESHOLDS`."""
+    return np.where(anemia_mask(data), 'Anemic', 'Normal')
+
+def clinical_flags(data, flags: list = None) -> pd.DataFrame:
+    """Evaluates the independent clinical flags in `FLAG_RULES`.
+
+    Args:
+        data (pd.DataFrame | dict): Reports with the columns the rules refer to.
+        flags (list): Names of the flags to evaluate; defaults to all of them.
+
+    Returns:
+        pd.DataFrame: One boolean column per flag.
+    """
+    flags = list(FLAG_RULES) if flags is None else flags
+    return pd.DataFrame({flag: evaluate_conditions(data, FLAG_RULES[flag]) for flag in flags},
+                        index=getattr(data, 'index', None))
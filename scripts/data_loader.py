@@ -0,0 +1,287 @@
+"""Module for loading the blood reports dataset with a declared, compact schema.
+
+Every entry point (dashboards, EDA, visuals, predictive analytics and the business
+report) loads the dataset through `load_dataset`, which applies a typed schema
+(categoricals, compact integers, float32 measurements and a parsed Date) and keeps
+a Parquet sidecar of the parsed frame. The sidecar is rebuilt only when the source
+CSV's size or modification time changes, so repeated loads are a columnar read
+instead of a CSV parse.
+
+Multi-process servers can use `load_shared_dataset` instead, which memory-maps an
+uncompressed Arrow IPC sidecar read-only so all workers share the same pages.
+
+Single-pass aggregations over data larger than memory use `split_into_units`,
+which cuts CSV files into line-aligned byte ranges and Parquet files into row
+groups. `iter_unit_chunks` then streams each unit as typed chunks, so worker
+processes can each summarize their own units.
+"""
+
+import csv
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Project-relative locations, independent of the current working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+REPORTS_DIR = os.path.join(PROJECT_ROOT, 'reports')
+DATASET_PATH = os.path.join(DATA_DIR, 'blood_reports_dataset.csv')
+
+# Column types of the blood reports dataset ('Date' is parsed separately)
+SCHEMA = {
+    'Report_ID': 'string',
+    'Gender': 'category',
+    'Age': 'int8',
+    'Haemoglobin_g_dl': 'float32',
+    'TLC_count_per_cumm': 'int32',
+    'Polymorph_%': 'float32',
+    'Lymphocytes_%': 'float32',
+    'Eosinophils_%': 'float32',
+    'Monocytes_%': 'float32',
+    'Platelets_lakh_per_cumm': 'float32',
+    'HCT_%': 'float32',
+    'MCV_fl': 'float32',
+    'MCH_pg': 'float32',
+    'MCHC_g_dl': 'float32',
+    'CRP_mg_L': 'float32',
+    'Diagnosis': 'category',
+    'Abnormal_Flag': 'category',
+}
+DATE_COLUMN = 'Date'
+
+# Rows per chunk and target CSV byte-range size for streaming reads (`split_into_units`)
+CHUNK_ROWS = 200_000
+SPLIT_BYTES = 64 * 1024 * 1024
+
+# Parquet metadata keys recording which CSV version a sidecar was built from
+_SOURCE_SIZE_KEY = b'blood_reports.source_size'
+_SOURCE_MTIME_KEY = b'blood_reports.source_mtime_ns'
+
+def read_csv_typed(file_path: str = DATASET_PATH, columns: list = None, **kwargs) -> pd.DataFrame:
+    """Parses a blood reports CSV with the declared schema applied.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        columns (list): Optional subset of columns to read.
+        **kwargs: Extra keyword arguments passed to `pd.read_csv` (e.g. `chunksize`).
+
+    Returns:
+        pd.DataFrame: The typed DataFrame (or a chunk iterator when `chunksize` is given).
+    """
+    dtypes = {col: dtype for col, dtype in SCHEMA.items() if columns is None or col in columns}
+    parse_dates = [DATE_COLUMN] if columns is None or DATE_COLUMN in columns else False
+    return pd.read_csv(file_path, usecols=columns, dtype=dtypes, parse_dates=parse_dates, **kwargs)
+
+def cache_path_for(file_path: str, extension: str = '.parquet') -> str:
+    """Returns the sidecar path used to cache a CSV file.
+
+    Args:
+        file_path (str): The path to the source CSV file.
+        extension (str): The sidecar file extension ('.parquet' or '.arrow').
+
+    Returns:
+        str: The sidecar path, inside a `.cache` directory next to the CSV.
+    """
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, '.cache', os.path.splitext(name)[0] + extension)
+
+def _source_signature(file_path: str) -> dict:
+    """Returns the size/mtime signature of a source file as Parquet metadata."""
+    stat = os.stat(file_path)
+    return {_SOURCE_SIZE_KEY: str(stat.st_size).encode(), _SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode()}
+
+def _cache_is_fresh(cache_path: str, signature: dict) -> bool:
+    """Checks whether a sidecar exists and was built from the current source file."""
+    if not os.path.exists(cache_path):
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return all(metadata.get(key) == value for key, value in signature.items())
+
+def _tagged_table(df: pd.DataFrame, file_path: str) -> pa.Table:
+    """Converts a frame to an Arrow table carrying the source file's signature in its metadata."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), **_source_signature(file_path)})
+
+def write_cache(df: pd.DataFrame, file_path: str) -> str:
+    """Writes the Parquet sidecar for a CSV file, tagged with the CSV's size and mtime.
+
+    The sidecar is written to a temporary file and atomically renamed, so concurrent
+    processes never read a partially written cache.
+
+    Args:
+        df (pd.DataFrame): The fully parsed, typed dataset.
+        file_path (str): The path to the source CSV file.
+
+    Returns:
+        str: The sidecar path.
+    """
+    cache_path = cache_path_for(file_path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    table = _tagged_table(df, file_path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+def load_dataset(file_path: str = DATASET_PATH, columns: list = None, use_cache: bool = True) -> pd.DataFrame:
+    """Loads the blood reports dataset with the declared schema.
+
+    Reads the Parquet sidecar when it matches the CSV's current size and mtime;
+    otherwise parses the CSV and (re)builds the sidecar.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        columns (list): Optional subset of columns to load.
+        use_cache (bool): Whether to read and maintain the Parquet sidecar.
+
+    Returns:
+        pd.DataFrame: The typed blood reports DataFrame.
+    """
+    if not use_cache:
+        return read_csv_typed(file_path, columns=columns)
+
+    cache_path = cache_path_for(file_path)
+    if _cache_is_fresh(cache_path, _source_signature(file_path)):
+        return pd.read_parquet(cache_path, columns=columns)
+
+    df = read_csv_typed(file_path)
+    write_cache(df, file_path)
+    return df[columns] if columns is not None else df
+
+def _arrow_cache_is_fresh(arrow_path: str, signature: dict) -> bool:
+    """Checks whether an Arrow IPC sidecar exists and was built from the current source file."""
+    if not os.path.exists(arrow_path):
+        return False
+    try:
+        with pa.memory_map(arrow_path, 'r') as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return all(metadata.get(key) == value for key, value in signature.items())
+
+def write_arrow_cache(df: pd.DataFrame, file_path: str) -> str:
+    """Writes an uncompressed Arrow IPC sidecar for a CSV file, suitable for memory-mapping.
+
+    Args:
+        df (pd.DataFrame): The fully parsed, typed dataset.
+        file_path (str): The path to the source CSV file.
+
+    Returns:
+        str: The Arrow IPC sidecar path.
+    """
+    arrow_path = cache_path_for(file_path, '.arrow')
+    os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+    table = _tagged_table(df, file_path)
+    tmp_path = f"{arrow_path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+def load_shared_dataset(file_path: str = DATASET_PATH) -> pd.DataFrame:
+    """Loads the dataset as read-only, zero-copy views over a memory-mapped Arrow IPC file.
+
+    The Arrow sidecar is built once from the typed dataset (itself served from the
+    Parquet cache when fresh). Every process that calls this maps the same file, so
+    numeric, date and string columns share the OS page cache instead of each
+    process holding a private copy, and starting a new worker does not parse the CSV.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+
+    Returns:
+        pd.DataFrame: The typed dataset. Its column buffers are read-only.
+    """
+    arrow_path = cache_path_for(file_path, '.arrow')
+    if not _arrow_cache_is_fresh(arrow_path, _source_signature(file_path)):
+        write_arrow_cache(load_dataset(file_path), file_path)
+
+    # The mapping stays open for as long as the returned columns reference it
+    table = pa.ipc.open_file(pa.memory_map(arrow_path, 'r')).read_all()
+    # split_blocks avoids consolidating columns into new 2-D blocks, and Arrow-backed
+    # strings keep Report_ID in the mapped buffers instead of Python objects.
+    return table.to_pandas(
+        split_blocks=True,
+        types_mapper=lambda arrow_type: pd.StringDtype('pyarrow') if pa.types.is_string(arrow_type) else None
+    )
+
+class _ByteRange(io.RawIOBase):
+    """A read-only view of a file that ends at a given offset."""
+
+    def __init__(self, f, end: int):
+        self._f = f
+        self._end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._end - self._f.tell())
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        return len(data)
+
+def _csv_ranges(path: str, split_bytes: int = SPLIT_BYTES) -> list:
+    """Splits a CSV's data lines into byte ranges of about `split_bytes` that start at line boundaries."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        boundaries = [f.tell()]
+        for offset in range(boundaries[0] + split_bytes, size, split_bytes):
+            # Reading from the byte before lands on `offset` itself when a line starts there
+            f.seek(offset - 1)
+            f.readline()
+            if boundaries[-1] < f.tell() < size:
+                boundaries.append(f.tell())
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+def split_into_units(paths: list, split_bytes: int = SPLIT_BYTES) -> list:
+    """Splits CSV and Parquet files into independently readable work units.
+
+    Args:
+        paths (list): Blood reports CSV and/or Parquet files.
+        split_bytes (int): Target size of the line-aligned CSV byte ranges.
+
+    Returns:
+        list: (path, (start, end) byte range) for CSV files and (path, row group) for Parquet files.
+    """
+    units = []
+    for path in paths:
+        if path.endswith('.parquet'):
+            units += [(path, row_group) for row_group in range(pq.ParquetFile(path).num_row_groups)]
+        else:
+            units += [(path, byte_range) for byte_range in _csv_ranges(path, split_bytes)]
+    return units
+
+def iter_unit_chunks(unit: tuple, columns: list = None, chunk_rows: int = CHUNK_ROWS):
+    """Streams the rows of one work unit with the declared schema applied.
+
+    Args:
+        unit (tuple): A work unit from `split_into_units`.
+        columns (list): Optional subset of columns to read.
+        chunk_rows (int): Maximum rows per yielded frame.
+
+    Yields:
+        pd.DataFrame: Typed chunks of the unit's rows, in file order.
+    """
+    path, part = unit
+    if path.endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, row_groups=[part], columns=columns):
+            yield batch.to_pandas()
+        return
+    start, end = part
+    with open(path, 'rb') as f:
+        names = next(csv.reader([f.readline().decode('utf-8')]))
+        f.seek(start)
+        reader = io.BufferedReader(_ByteRange(f, end))
+        yield from read_csv_typed(reader, columns=columns, header=None, names=names, chunksize=chunk_rows)
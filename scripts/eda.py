@@ -3,18 +3,48 @@
 This module loads the synthetic blood reports dataset, displays basic information,
 summary statistics, performs outlier detection, and calculates the correlation matrix
 for numerical columns.
+
+`profile_dataset` is the out-of-core mode. It streams the dataset in chunks, with
+worker processes summarizing separate parts of the files. Every numeric column is
+summarized by exact moments (see `kpi_engine`) and a mergeable t-digest quantile
+sketch. Percentiles, IQR and percentile outlier counts for all columns are then
+estimated from the sketches, in one pass and fixed memory per worker. The result is
+written as a JSON profile.
 """
 
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+
+import numpy as np
 import pandas as pd
 
-def perform_eda(file_path: str = "data/blood_reports_dataset.csv") -> None:
+from scripts.data_loader import (CHUNK_ROWS, DATASET_PATH, REPORTS_DIR, SCHEMA, SPLIT_BYTES, iter_unit_chunks,
+                                 load_dataset, split_into_units)
+from scripts.kpi_engine import KPIStats
+from scripts.partitioned_store import list_partition_files
+from scripts.quantile_sketch import DEFAULT_COMPRESSION, TDigest
+
+PROFILE_PATH = os.path.join(REPORTS_DIR, 'eda_profile.json')
+
+NUMERIC_COLUMNS = [col for col, dtype in SCHEMA.items() if dtype.startswith(('int', 'float'))]
+
+# Percentiles reported per column, and the fences of the percentile outlier rule
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+OUTLIER_PERCENTILES = (0.01, 0.99)
+IQR_MULTIPLIER = 1.5
+
+def perform_eda(file_path: str = DATASET_PATH) -> None:
     """Performs exploratory data analysis on the blood reports dataset.
 
     Args:
         file_path (str): The path to the blood reports CSV file.
     """
     # Load the dataset
-    df = pd.read_csv(file_path)
+    df = load_dataset(file_path)
 
     # Display basic information about the dataset
     print("Dataset Info:")
@@ -46,6 +76,116 @@ def perform_eda(file_path: str = "data/blood_reports_dataset.csv") -> None:
     print("\nCorrelation Matrix (numerical columns):")
     print(df.corr(numeric_only=True))
 
+def _unit_profile(unit: tuple, columns: list, compression: float, chunk_rows: int) -> tuple:
+    """Summarizes one work unit into moments and per-column sketches (runs in a worker process)."""
+    stats = KPIStats(columns, segment_columns=())
+    sketches = {col: TDigest(compression) for col in columns}
+    for chunk in iter_unit_chunks(unit, list(dict.fromkeys([*columns, 'Diagnosis'])), chunk_rows):
+        stats.update(chunk)
+        for col in columns:
+            sketches[col].update(chunk[col].to_numpy(dtype=np.float64, na_value=np.nan))
+    return stats, sketches
+
+def _column_profile(sketch: TDigest, count: int, records: int, mean: float, variance: float) -> dict:
+    """Builds the JSON profile entry of one column from its sketch and exact moments."""
+    quantiles = sketch.quantile(PROFILE_QUANTILES)
+    q1, q3 = sketch.quantile([0.25, 0.75])
+    iqr_lower, iqr_upper = q1 - IQR_MULTIPLIER * (q3 - q1), q3 + IQR_MULTIPLIER * (q3 - q1)
+    iqr_below, iqr_above = sketch.count_outside(iqr_lower, iqr_upper)
+    pct_lower, pct_upper = sketch.quantile(OUTLIER_PERCENTILES)
+    pct_below, pct_above = sketch.count_outside(pct_lower, pct_upper)
+    return {
+        'count': count,
+        'missing': records - count,
+        'mean': mean,
+        'std': float(np.sqrt(variance)) if variance == variance else None,
+        'min': sketch.min if count else None,
+        'max': sketch.max if count else None,
+        'quantiles': {f'p{round(q * 100):g}': float(value) for q, value in zip(PROFILE_QUANTILES, quantiles)},
+        'iqr_outliers': {'lower_fence': float(iqr_lower), 'upper_fence': float(iqr_upper),
+                         'below': iqr_below, 'above': iqr_above},
+        'percentile_outliers': {'lower_fence': float(pct_lower), 'upper_fence': float(pct_upper),
+                                'below': pct_below, 'above': pct_above},
+    }
+
+def profile_dataset(paths=DATASET_PATH, columns: list = None, output_path: str = PROFILE_PATH,
+                    compression: float = DEFAULT_COMPRESSION, chunk_rows: int = CHUNK_ROWS,
+                    workers: int = None, split_bytes: int = SPLIT_BYTES) -> dict:
+    """Profiles every numeric column in one streaming pass and writes a JSON profile.
+
+    Counts, means and standard deviations are exact. Percentiles and outlier counts
+    (IQR rule and `OUTLIER_PERCENTILES` fences) are estimated from t-digest sketches.
+
+    Args:
+        paths (str | list): A blood reports CSV or Parquet file, or a list of them
+            (e.g. `partitioned_store.list_partition_files()`).
+        columns (list): Numeric columns to profile; defaults to all of them.
+        output_path (str): Where to write the JSON profile, or None to skip writing.
+        compression (float): t-digest compression; higher is more accurate and larger.
+        chunk_rows (int): Rows parsed at a time by each worker.
+        workers (int): Number of worker processes (defaults to the CPU count, capped by
+            the number of work units); 1 reads everything in this process.
+        split_bytes (int): Target size of the CSV byte ranges handed to workers.
+
+    Returns:
+        dict: The profile (also written to `output_path`).
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    columns = list(columns or NUMERIC_COLUMNS)
+    units = split_into_units(paths, split_bytes)
+    summarize = partial(_unit_profile, columns=columns, compression=compression, chunk_rows=chunk_rows)
+
+    stats = KPIStats(columns, segment_columns=())
+    sketches = {col: TDigest(compression) for col in columns}
+    def merge(results):
+        for unit_stats, unit_sketches in results:
+            stats.merge(unit_stats)
+            for col in columns:
+                sketches[col].merge(unit_sketches[col])
+
+    workers = min(workers or os.cpu_count() or 1, len(units))
+    if workers <= 1:
+        merge(map(summarize, units))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            merge(executor.map(summarize, units))
+
+    counts = dict(zip(columns, stats.moments[0].tolist()))
+    means, variances = stats.means, stats.variances
+    profile = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sources': paths,
+        'rows': stats.records,
+        'sketch': {'type': 't-digest', 'compression': compression},
+        'columns': {col: _column_profile(sketches[col], counts[col], stats.records, means[col], variances[col])
+                    for col in columns},
+    }
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(profile, f, indent=2)
+    return profile
+
+def print_profile(profile: dict) -> None:
+    """Prints the per-column summary of a profile built by `profile_dataset`."""
+    rows = {col: {'mean': entry['mean'], 'std': entry['std'], **entry['quantiles'],
+                  'iqr_outliers': entry['iqr_outliers']['below'] + entry['iqr_outliers']['above'],
+                  'pct_outliers': entry['percentile_outliers']['below'] + entry['percentile_outliers']['above']}
+            for col, entry in profile['columns'].items()}
+    print(f"Profile of {profile['rows']} records (quantiles and outlier counts estimated from t-digest sketches):")
+    print(pd.DataFrame(rows).T.round(3))
+
 if __name__ == '__main__':
-    import numpy as np # Import numpy here as it's only used in this block
-    perform_eda()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Exploratory data analysis of the blood reports dataset.")
+    parser.add_argument('--stream', action='store_true', help="Profile out of core in one pass and write a JSON profile")
+    parser.add_argument('--partitions', action='store_true', help="Stream the month partitions instead of the CSV")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for streaming mode")
+    parser.add_argument('--output', default=PROFILE_PATH, help="Path of the JSON profile")
+    args = parser.parse_args()
+    if args.stream or args.partitions:
+        profile = profile_dataset(list_partition_files() if args.partitions else DATASET_PATH,
+                                  output_path=args.output, workers=args.workers)
+        print_profile(profile)
+        print(f"✅ EDA profile written to {args.output}")
+    else:
+        perform_eda()
@@ -0,0 +1,138 @@
+"""Module for the precomputed row index behind dashboard filtering.
+
+The index is built once when the dataset is loaded. For each filter column it
+keeps one bitmap (boolean array) per value, and for the Date column a sort order,
+so a date range maps to a contiguous slice of row positions. Answering a filter
+combination is then a few bitmap ANDs rather than full-column equality scans over
+a copied frame, and callers get row positions they can take only the rows or
+columns they need from. When rows are appended to the frame, `extended` builds the
+index of the longer frame from the old one and the new rows only.
+"""
+
+import numpy as np
+import pandas as pd
+
+def _value_bitmaps(column: pd.Series) -> dict:
+    """Returns one boolean row mask per distinct value of a column."""
+    codes, values = pd.factorize(column, sort=True)
+    return {value: codes == code for code, value in enumerate(values)}
+
+class FilterIndex:
+    """Bitmaps per categorical value plus a date ordering over one frame's rows."""
+
+    def __init__(self, frame: pd.DataFrame, columns: tuple = ('Gender', 'Diagnosis'), date_column: str = 'Date'):
+        """Builds the index.
+
+        Args:
+            frame (pd.DataFrame): The frame to index. Row positions refer to it.
+            columns (tuple): Categorical columns to build value bitmaps for.
+            date_column (str): The datetime column supporting range filters, or None.
+        """
+        self.num_rows = len(frame)
+        self.bitmaps = {col: _value_bitmaps(frame[col]) for col in columns}
+
+        self.date_column = date_column
+        if date_column is not None:
+            dates = frame[date_column].to_numpy().astype('datetime64[ns]')
+            self._date_order = np.argsort(dates, kind='stable')
+            self._sorted_dates = dates[self._date_order]
+
+    def extended(self, new_rows: pd.DataFrame) -> 'FilterIndex':
+        """Returns the index of the frame with `new_rows` appended after its last row.
+
+        The bitmaps are extended and the new dates are merged into the existing
+        ordering, so only the new rows are factorized and sorted. The current index is
+        left unchanged, so callers can swap the new one in while others still read it.
+
+        Args:
+            new_rows (pd.DataFrame): The appended rows, in the order they were appended.
+
+        Returns:
+            FilterIndex: The index over the old and new rows.
+        """
+        index = FilterIndex.__new__(FilterIndex)
+        index.num_rows = self.num_rows + len(new_rows)
+        index.bitmaps = {}
+        for col, bitmaps in self.bitmaps.items():
+            new_bitmaps = _value_bitmaps(new_rows[col])
+            old_empty, new_empty = np.zeros(self.num_rows, dtype=bool), np.zeros(len(new_rows), dtype=bool)
+            index.bitmaps[col] = {
+                value: np.concatenate([bitmaps.get(value, old_empty), new_bitmaps.get(value, new_empty)])
+                for value in sorted(set(bitmaps) | set(new_bitmaps))
+            }
+
+        index.date_column = self.date_column
+        if self.date_column is not None:
+            dates = new_rows[self.date_column].to_numpy().astype('datetime64[ns]')
+            order = np.argsort(dates, kind='stable')
+            # New rows go after old rows with the same date, as a stable sort of the whole frame would put them
+            insert_at = np.searchsorted(self._sorted_dates, dates[order], side='right')
+            index._date_order = np.insert(self._date_order, insert_at, order + self.num_rows)
+            index._sorted_dates = np.insert(self._sorted_dates, insert_at, dates[order])
+        return index
+
+    def mask(self, start_date=None, end_date=None, **equals) -> np.ndarray:
+        """Returns the boolean row mask for a filter combination.
+
+        Args:
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Column name to required value; None means no filter on that column.
+
+        Returns:
+            np.ndarray: The row mask, or None when no filter is active (all rows match).
+        """
+        mask = None
+        for col, value in equals.items():
+            if value is None:
+                continue
+            bitmap = self.bitmaps[col].get(value)
+            if bitmap is None:
+                return np.zeros(self.num_rows, dtype=bool)
+            mask = bitmap.copy() if mask is None else mask & bitmap
+
+        if start_date or end_date:
+            lo = np.searchsorted(self._sorted_dates, np.datetime64(pd.Timestamp(start_date)), side='left') if start_date else 0
+            hi = np.searchsorted(self._sorted_dates, np.datetime64(pd.Timestamp(end_date)), side='right') if end_date else self.num_rows
+            date_mask = np.zeros(self.num_rows, dtype=bool)
+            date_mask[self._date_order[lo:hi]] = True
+            mask = date_mask if mask is None else mask & date_mask
+        return mask
+
+    def positions(self, start_date=None, end_date=None, **equals) -> np.ndarray:
+        """Returns the ascending row positions matching a filter combination.
+
+        Args:
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Column name to required value; None means no filter on that column.
+
+        Returns:
+            np.ndarray: The matching row positions.
+        """
+        mask = self.mask(start_date, end_date, **equals)
+        return np.arange(self.num_rows) if mask is None else np.flatnonzero(mask)
+
+    def select(self, frame: pd.DataFrame, columns: list = None, start_date=None, end_date=None, **equals) -> pd.DataFrame:
+        """Returns the rows of `frame` matching a filter combination.
+
+        With no active filter the frame itself is returned (no copy); otherwise only
+        the matching rows of the requested columns are materialized.
+
+        Args:
+            frame (pd.DataFrame): The indexed frame.
+            columns (list): Columns to keep, or None for all.
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Column name to required value; None means no filter on that column.
+
+        Returns:
+            pd.DataFrame: The matching rows.
+        """
+        mask = self.mask(start_date, end_date, **equals)
+        if mask is None:
+            return frame
+        positions = np.flatnonzero(mask)
+        if columns is None:
+            return frame.take(positions)
+        return frame.iloc[positions, [frame.columns.get_loc(col) for col in columns]]
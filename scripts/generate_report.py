@@ -3,56 +3,161 @@
 This module uses ReportLab to create a professional PDF document that includes
 an executive summary, key visualizations (infection trends, anemia distribution,
 and CRP trends), and a summary of predictive analytics.
+
+`generate_segment_reports` produces one such report per segment (a month, a
+gender, a diagnosis, or a combination) in a pool of worker processes. Each worker
+loads the dataset and builds its filter index once. It also keeps a `ReportAssets`
+cache of what every report shares: registered fonts, the style sheet, parsed
+static text blocks and downscaled images. Each report then only selects its rows,
+renders its figures at print size in memory and lays out its pages. The timings of
+each report are returned and written next to the PDFs.
 """
 
+import argparse
+import copy
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from PIL import Image as PILImage
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-import os
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+from scripts.clinical_rules import abnormal_ratio
+from scripts.data_loader import DATASET_PATH, PROJECT_ROOT, REPORTS_DIR, load_dataset, load_shared_dataset
+from scripts.filter_index import FilterIndex
+from scripts.generate_visuals import build_figure_inputs
+
+# Project-relative defaults, independent of the current working directory
+EXECUTIVE_SUMMARY_PATH = os.path.join(PROJECT_ROOT, 'docs', 'executive_summary.md')
+REPORT_PATH = os.path.join(REPORTS_DIR, 'Blood_Report_Analytics_Report.pdf')
+SEGMENTS_DIR = os.path.join(REPORTS_DIR, 'segments')
+VISUAL_PATHS = [os.path.join(REPORTS_DIR, name)
+                for name in ('infection_trends.png', 'anemia_distribution.png', 'crp_trends.png')]
+
+# Printed size of report images, and the resolution they are downscaled to
+IMAGE_WIDTH, IMAGE_HEIGHT = 6 * inch, 3.5 * inch
+PRINT_DPI = 150
+
+# CID font used for tables (ReportLab parses its CMap once per process)
+TABLE_FONT = 'HeiseiMin-W3'
+
+# Columns a segment report reads
+SEGMENT_COLUMNS = ['Date', 'Gender', 'Age', 'Diagnosis', 'CRP_mg_L', 'Haemoglobin_g_dl']
+
+# Segment dimensions: spec key to dataset column ('month' filters on Date)
+SEGMENT_DIMENSIONS = {'month': 'Date', 'gender': 'Gender', 'diagnosis': 'Diagnosis'}
+
+class ReportAssets:
+    """Per-process cache of the assets shared by every report: fonts, styles, text blocks and images."""
+
+    def __init__(self, fonts: tuple = (TABLE_FONT,)):
+        """Registers the fonts and builds the style sheet.
+
+        Args:
+            fonts (tuple): Names of the ReportLab CID fonts the reports use.
+        """
+        registered = set(pdfmetrics.getRegisteredFontNames())
+        for font in fonts:
+            if font not in registered:
+                pdfmetrics.registerFont(UnicodeCIDFont(font))
+        self.styles = getSampleStyleSheet()
+        self._blocks = {}
+        self._images = {}
+
+    def markdown_blocks(self, path: str) -> list:
+        """Returns the flowables of a markdown file, parsed once per file version.
+
+        Headings ('# ', '## ') become h2/h3 paragraphs and other lines Normal paragraphs.
+        Shallow copies are returned, since ReportLab keeps layout state on a flowable
+        during a build; the copies share the parsed markup.
 
-def generate_pdf_report(output_filename: str = "../reports/Blood_Report_Analytics_Report.pdf",
-                        executive_summary_path: str = "../docs/executive_summary.md",
-                        image_paths: list = None) -> None:
+        Args:
+            path (str): The path to the markdown file.
+
+        Returns:
+            list: Paragraphs and spacers.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        key = (path, os.stat(path).st_mtime_ns)
+        if key not in self._blocks:
+            with open(path, "r", encoding='utf-8') as f:
+                content = f.read()
+            blocks = []
+            for line in content.split('\n'):
+                if line.startswith('# '):
+                    blocks.append(Paragraph(line[2:], self.styles['h2']))
+                elif line.startswith('## '):
+                    blocks.append(Paragraph(line[3:], self.styles['h3']))
+                else:
+                    blocks.append(Paragraph(line, self.styles['Normal']))
+                blocks.append(Spacer(1, 0.1 * inch))
+            self._blocks[key] = blocks
+        return [copy.copy(block) for block in self._blocks[key]]
+
+    def image(self, path: str, width: float = IMAGE_WIDTH, height: float = IMAGE_HEIGHT) -> Image:
+        """Returns an image flowable, downscaled once to its printed size at `PRINT_DPI`.
+
+        Args:
+            path (str): The path to the image file.
+            width (float): Printed width in points.
+            height (float): Printed height in points.
+
+        Returns:
+            Image: The flowable, backed by the cached PNG bytes.
+        """
+        key = (path, os.stat(path).st_mtime_ns, width, height)
+        if key not in self._images:
+            size = (round(width / inch * PRINT_DPI), round(height / inch * PRINT_DPI))
+            with PILImage.open(path) as img:
+                # Flattened to RGB: an alpha channel would be embedded as a second image
+                img = img.convert('RGB')
+                if img.width > size[0] or img.height > size[1]:
+                    img = img.resize(size, PILImage.BOX)  # area average; compresses better than LANCZOS
+                buffer = io.BytesIO()
+                img.save(buffer, format='PNG', optimize=True)
+            self._images[key] = buffer.getvalue()
+        return Image(io.BytesIO(self._images[key]), width=width, height=height)
+
+def generate_pdf_report(output_filename: str = REPORT_PATH,
+                        executive_summary_path: str = EXECUTIVE_SUMMARY_PATH,
+                        image_paths: list = None, assets: ReportAssets = None) -> None:
     """Generates a comprehensive PDF analytics report.
 
     Args:
         output_filename (str): The full path and filename for the output PDF report.
         executive_summary_path (str): The path to the markdown file containing the executive summary.
         image_paths (list): A list of paths to image files to be included in the report.
+        assets (ReportAssets): Shared asset cache, or None to create one.
     """
     if image_paths is None:
-        image_paths = [
-            "../reports/infection_trends.png",
-            "../reports/anemia_distribution.png",
-            "../reports/crp_trends.png"
-        ]
+        image_paths = VISUAL_PATHS
+    assets = assets or ReportAssets()
 
     doc = SimpleDocTemplate(output_filename, pagesize=letter)
-    styles = getSampleStyleSheet()
+    styles = assets.styles
     story = []
 
     # Add Title to the report
     story.append(Paragraph("Executive Summary: Blood Report Analytics", styles['h1']))
     story.append(Spacer(1, 0.2 * inch))
 
-    # Read and add executive summary content from markdown file
+    # Add the executive summary content from the markdown file
     try:
-        with open(executive_summary_path, "r", encoding='utf-8') as f:
-            summary_content = f.read()
+        story.extend(assets.markdown_blocks(executive_summary_path))
     except FileNotFoundError:
         story.append(Paragraph(f"Error: Executive summary file not found at {executive_summary_path}", styles['Normal']))
-        summary_content = "Executive summary content could not be loaded."
-
-    # Basic formatting for markdown content
-    for line in summary_content.split('\n'):
-        if line.startswith('# '):
-            story.append(Paragraph(line[2:], styles['h2']))
-        elif line.startswith('## '):
-            story.append(Paragraph(line[3:], styles['h3']))
-        else:
-            story.append(Paragraph(line, styles['Normal']))
-        story.append(Spacer(1, 0.1 * inch))
+        story.append(Paragraph("Executive summary content could not be loaded.", styles['Normal']))
 
     # Add a section for Key Visualizations
     story.append(Paragraph("Key Visualizations", styles['h2']))
@@ -61,8 +166,7 @@ def generate_pdf_report(output_filename: str = "../reports/Blood_Report_Analytic
     # Add images to the report
     for img_path in image_paths:
         if os.path.exists(img_path):
-            img = Image(img_path, width=6*inch, height=3.5*inch)
-            story.append(img)
+            story.append(assets.image(img_path))
             story.append(Spacer(1, 0.1 * inch))
         else:
             story.append(Paragraph(f"Image not found: {img_path}", styles['Normal']))
@@ -72,11 +176,206 @@ def generate_pdf_report(output_filename: str = "../reports/Blood_Report_Analytic
     doc.build(story)
     print(f"✅ PDF report generated: {output_filename}")
 
-if __name__ == '__main__':
-    # Default image paths for standalone execution
-    default_image_paths = [
-        "../reports/infection_trends.png",
-        "../reports/anemia_distribution.png",
-        "../reports/crp_trends.png"
+def segment_name(spec: dict) -> str:
+    """Returns a segment's file-name stem, e.g. 'month-2024-03_gender-F'."""
+    if spec.get('name'):
+        return spec['name']
+    parts = [f"{key}-{spec[key]}" for key in SEGMENT_DIMENSIONS if spec.get(key) is not None]
+    if spec.get('start_date') or spec.get('end_date'):
+        parts.append(f"dates-{spec.get('start_date') or 'start'}-{spec.get('end_date') or 'end'}")
+    name = '_'.join(parts) or 'all'
+    return ''.join(c if c.isalnum() or c in '-_' else '-' for c in name)
+
+def segment_filters(spec: dict) -> dict:
+    """Translates a segment spec into `FilterIndex.select` keyword arguments.
+
+    Args:
+        spec (dict): Optional 'month' ('YYYY-MM'), 'gender', 'diagnosis', 'start_date'
+            and 'end_date' keys; a month is intersected with the date bounds.
+
+    Returns:
+        dict: start_date, end_date, Gender and Diagnosis filters.
+    """
+    start_date, end_date = spec.get('start_date'), spec.get('end_date')
+    if spec.get('month'):
+        month = pd.Period(spec['month'], freq='M')
+        start_date = max(filter(None, [pd.Timestamp(start_date) if start_date else None, month.start_time]))
+        end_date = min(filter(None, [pd.Timestamp(end_date) if end_date else None, month.end_time.normalize()]))
+    return {'start_date': start_date, 'end_date': end_date,
+            'Gender': spec.get('gender'), 'Diagnosis': spec.get('diagnosis')}
+
+def segment_specs(df: pd.DataFrame, dimensions: tuple = ('month', 'gender', 'diagnosis'),
+                  cross: bool = False) -> list:
+    """Enumerates the segments present in the data.
+
+    Args:
+        df (pd.DataFrame): Reports with the columns of the requested dimensions.
+        dimensions (tuple): Any of 'month', 'gender' and 'diagnosis'.
+        cross (bool): One segment per observed combination of the dimensions instead of
+            one per value of each dimension.
+
+    Returns:
+        list: Segment specs, e.g. {'month': '2024-03'} or {'month': '2024-03', 'gender': 'F'}.
+    """
+    keys = {}
+    for dim in dimensions:
+        column = df[SEGMENT_DIMENSIONS[dim]]
+        keys[dim] = column.dt.to_period('M').astype(str) if dim == 'month' else column.astype(str)
+    if cross:
+        combos = pd.DataFrame(keys).drop_duplicates().sort_values(list(keys))
+        return combos.to_dict('records')
+    return [{dim: value} for dim, values in keys.items() for value in sorted(values.unique())]
+
+def _segment_title(spec: dict) -> str:
+    """Returns a human-readable segment title."""
+    parts = [f"{key.capitalize()}: {spec[key]}" for key in SEGMENT_DIMENSIONS if spec.get(key) is not None]
+    if spec.get('start_date') or spec.get('end_date'):
+        parts.append(f"Dates: {spec.get('start_date') or '…'} to {spec.get('end_date') or '…'}")
+    return spec.get('title') or ', '.join(parts) or 'All reports'
+
+def _kpi_table(rows: pd.DataFrame) -> Table:
+    """Returns the table of a segment's headline figures."""
+    data = [
+        ["Metric", "Value"],
+        ["Reports", f"{len(rows):,}"],
+        ["Average haemoglobin (g/dL)", f"{rows['Haemoglobin_g_dl'].mean():.2f}"],
+        ["Average CRP (mg/L)", f"{rows['CRP_mg_L'].mean():.2f}"],
+        ["Abnormal reports", f"{abnormal_ratio(rows) * 100:.1f}%"],
     ]
-    generate_pdf_report(image_paths=default_image_paths)
\ No newline at end of file
+    table = Table(data, colWidths=[200, 120])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('FONT', (0, 0), (-1, -1), TABLE_FONT, 9),
+    ]))
+    return table
+
+def _segment_figures(rows: pd.DataFrame, styles) -> list:
+    """Renders a segment's figures at their printed size into in-memory PNGs."""
+    size = {'figsize': (IMAGE_WIDTH / inch, IMAGE_HEIGHT / inch), 'dpi': PRINT_DPI}
+    figures = []
+    for name, (render, data, settings) in build_figure_inputs(rows).items():
+        if data.empty:  # e.g. no anemia cases in an infection segment
+            title = name.removesuffix('.png').replace('_', ' ')
+            figures.append(Paragraph(f"No data for {title} in this segment.", styles['Normal']))
+            continue
+        buffer = io.BytesIO()
+        render(data, buffer, {**settings, **size})
+        buffer.seek(0)
+        figures.append(Image(buffer, width=IMAGE_WIDTH, height=IMAGE_HEIGHT))
+    return figures
+
+def build_segment_report(spec: dict, frame: pd.DataFrame, index: FilterIndex, assets: ReportAssets,
+                         output_dir: str = SEGMENTS_DIR, executive_summary_path: str = EXECUTIVE_SUMMARY_PATH,
+                         shared_images: list = None) -> dict:
+    """Builds the PDF report of one segment.
+
+    Args:
+        spec (dict): The segment spec (see `segment_filters`), optionally with 'name' and 'title'.
+        frame (pd.DataFrame): The dataset with at least `SEGMENT_COLUMNS`.
+        index (FilterIndex): The filter index of `frame`.
+        assets (ReportAssets): The shared asset cache.
+        output_dir (str): Directory of the PDF, named after the segment.
+        executive_summary_path (str): Markdown included in every report, or None to omit it.
+        shared_images (list): Paths of images appended to every report (e.g. a logo or overall trends).
+
+    Returns:
+        dict: The segment name, PDF path and size, row count, and the seconds spent
+            selecting rows, rendering figures and building the PDF.
+    """
+    started = time.perf_counter()
+    name = segment_name(spec)
+    rows = index.select(frame, SEGMENT_COLUMNS, **segment_filters(spec))
+    selected = time.perf_counter()
+
+    styles = assets.styles
+    story = [Paragraph(f"Blood Report Analytics: {_segment_title(spec)}", styles['h1']), Spacer(1, 0.2 * inch)]
+    if len(rows):
+        story += [_kpi_table(rows), Spacer(1, 0.2 * inch), Paragraph("Key Visualizations", styles['h2'])]
+        for figure in _segment_figures(rows, styles):
+            story += [figure, Spacer(1, 0.2 * inch)]
+    else:
+        story.append(Paragraph("No reports fall in this segment.", styles['Normal']))
+    rendered = time.perf_counter()
+
+    for img_path in shared_images or []:
+        story += [assets.image(img_path), Spacer(1, 0.2 * inch)]
+    if executive_summary_path:
+        story += [Paragraph("About This Analysis", styles['h2'])] + assets.markdown_blocks(executive_summary_path)
+
+    path = os.path.join(output_dir, f"{name}.pdf")
+    SimpleDocTemplate(path, pagesize=letter).build(story)
+    finished = time.perf_counter()
+
+    return {'segment': name, 'path': path, 'rows': len(rows), 'bytes': os.path.getsize(path),
+            'select_seconds': round(selected - started, 4), 'figures_seconds': round(rendered - selected, 4),
+            'build_seconds': round(finished - rendered, 4), 'total_seconds': round(finished - started, 4)}
+
+# State of a report worker process, set up once by `_init_worker`
+_worker = {}
+
+def _init_worker(file_path: str, shared_memory: bool, report_kwargs: dict) -> None:
+    """Loads the dataset, its filter index and the shared assets into a worker process."""
+    frame = load_shared_dataset(file_path) if shared_memory else load_dataset(file_path, columns=SEGMENT_COLUMNS)
+    _worker.update(frame=frame, index=FilterIndex(frame), assets=ReportAssets(), kwargs=report_kwargs)
+
+def _build_in_worker(spec: dict) -> dict:
+    """Builds one segment report with the worker's dataset and assets."""
+    return build_segment_report(spec, _worker['frame'], _worker['index'], _worker['assets'], **_worker['kwargs'])
+
+def generate_segment_reports(specs: list, file_path: str = DATASET_PATH, output_dir: str = SEGMENTS_DIR,
+                             executive_summary_path: str = EXECUTIVE_SUMMARY_PATH, shared_images: list = None,
+                             workers: int = None, shared_memory: bool = False) -> list:
+    """Generates one PDF report per segment in parallel worker processes.
+
+    Args:
+        specs (list): Segment specs (see `segment_specs` and `segment_filters`).
+        file_path (str): The path to the blood reports CSV file.
+        output_dir (str): Directory of the PDFs and of `report_timings.json`.
+        executive_summary_path (str): Markdown included in every report, or None to omit it.
+        shared_images (list): Paths of images appended to every report.
+        workers (int): Number of worker processes (defaults to the CPU count); 1 builds
+            the reports in this process.
+        shared_memory (bool): Workers read the memory-mapped Arrow sidecar instead of
+            each loading its own copy of the dataset.
+
+    Returns:
+        list: The timing record of each report (see `build_segment_report`), in spec order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    report_kwargs = {'output_dir': output_dir, 'executive_summary_path': executive_summary_path,
+                     'shared_images': shared_images}
+    started = time.perf_counter()
+
+    workers = min(workers or os.cpu_count() or 1, len(specs)) or 1
+    if workers == 1:
+        _init_worker(file_path, shared_memory, report_kwargs)
+        timings = [_build_in_worker(spec) for spec in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(file_path, shared_memory, report_kwargs)) as executor:
+            timings = list(executor.map(_build_in_worker, specs, chunksize=max(1, len(specs) // (workers * 4))))
+
+    elapsed = time.perf_counter() - started
+    with open(os.path.join(output_dir, 'report_timings.json'), 'w') as f:
+        json.dump({'workers': workers, 'elapsed_seconds': round(elapsed, 3), 'reports': timings}, f, indent=2)
+
+    slowest = max(timings, key=lambda t: t['total_seconds'], default=None)
+    print(f"✅ {len(timings)} segment reports generated in {output_dir} ({elapsed:.1f}s with {workers} workers"
+          + (f", slowest {slowest['segment']} at {slowest['total_seconds']:.2f}s)" if slowest else ")"))
+    return timings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the PDF analytics report, or one report per segment.")
+    parser.add_argument('--segments', nargs='+', choices=list(SEGMENT_DIMENSIONS),
+                        help="Generate one report per value of each dimension")
+    parser.add_argument('--cross', action='store_true', help="One report per combination of the segment dimensions")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (1 builds serially)")
+    parser.add_argument('--output-dir', default=SEGMENTS_DIR, help="Directory of the segment reports")
+    args = parser.parse_args()
+
+    if args.segments:
+        specs = segment_specs(load_dataset(columns=SEGMENT_COLUMNS), tuple(args.segments), cross=args.cross)
+        generate_segment_reports(specs, output_dir=args.output_dir, workers=args.workers)
+    else:
+        generate_pdf_report()
@@ -3,71 +3,228 @@
 This module loads the preprocessed blood reports dataset and generates several
 key visualizations, including infection trends, anemia distribution, and CRP levels
 over time. The visualizations are saved as PNG files in the 'reports/' directory.
+
+By default the plots are fed small pre-aggregated inputs (daily counts, per-age
+counts, and the daily CRP mean with a precomputed 95% confidence interval or an
+interquartile band) instead of raw rows, so seaborn never bootstraps over the
+full dataset. The figures are rendered in parallel worker processes with the Agg
+backend, and a figure is skipped when the hash of its input data and plot
+settings matches the one recorded for the existing PNG.
 """
 
-import pandas as pd
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # Headless rendering, also in worker processes
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 import seaborn as sns
 
-def generate_static_visuals(file_path: str = "../data/blood_reports_dataset.csv", output_dir: str = "../reports/") -> None:
-    """Generates and saves static visualizations from the blood reports dataset.
+from scripts.data_loader import DATASET_PATH, REPORTS_DIR, load_dataset
+from scripts.partitioned_store import query_reports
 
-    Args:
-        file_path (str): The path to the blood reports CSV file.
-        output_dir (str): The directory where the generated image files will be saved.
-    """
-    # Load the dataset
-    df = pd.read_csv(file_path)
+# Records the input hash of every generated PNG in the output directory
+MANIFEST_NAME = '.visuals_manifest.json'
 
-    # Ensure 'Date' column is in datetime format for time-series analysis
-    df['Date'] = pd.to_datetime(df['Date'])
+# Bump when the rendering code changes, so existing PNGs are regenerated
+RENDER_VERSION = 1
 
-    # Set a professional style for all plots
-    sns.set_theme(style="whitegrid")
+# z-value of the 95% normal confidence interval of the daily CRP mean
+CI_Z = 1.96
 
-    # --- Visualization 1: Infection Trends over Time ---
-    plt.figure(figsize=(12, 6))
-    # Filter data for bacterial and viral infections
-    infection_df = df[df['Diagnosis'].isin(['Bacterial infection', 'Viral infection'])]
-    # Group by date and count the number of infection cases
-    infection_counts = infection_df.groupby('Date').size().reset_index(name='count')
-    # Plot the daily infection cases
-    sns.lineplot(data=infection_counts, x='Date', y='count')
+def _render_infection_trends(data: pd.DataFrame, path: str, settings: dict) -> None:
+    """Renders daily infection case counts."""
+    sns.set_theme(style="whitegrid")
+    plt.figure(figsize=settings['figsize'])
+    sns.lineplot(data=data, x='Date', y='count')
     plt.title('Daily Infection Cases Over Time')
     plt.xlabel('Date')
     plt.ylabel('Number of Cases')
     plt.tight_layout()
-    # Save the plot to the specified output directory
-    plt.savefig(f'{output_dir}infection_trends.png')
+    plt.savefig(path, dpi=settings['dpi'])
     plt.close()
 
-    # --- Visualization 2: Anemia Distribution by Age and Gender ---
-    plt.figure(figsize=(12, 6))
-    # Filter data for anemia cases
-    anemia_df = df[df['Diagnosis'] == 'Anemia']
-    # Plot the distribution of anemia cases by age, separated by gender
-    sns.histplot(data=anemia_df, x='Age', hue='Gender', multiple='stack', bins=20)
+def _render_anemia_distribution(data: pd.DataFrame, path: str, settings: dict) -> None:
+    """Renders the stacked age histogram of anemia cases (raw rows, or counts per Age/Gender as weights)."""
+    sns.set_theme(style="whitegrid")
+    plt.figure(figsize=settings['figsize'])
+    weights = 'count' if 'count' in data.columns else None
+    sns.histplot(data=data, x='Age', hue='Gender', weights=weights, multiple='stack', bins=settings['bins'])
     plt.title('Anemia Cases Distribution by Age and Gender')
     plt.xlabel('Age')
     plt.ylabel('Number of Cases')
     plt.tight_layout()
-    # Save the plot
-    plt.savefig(f'{output_dir}anemia_distribution.png')
+    plt.savefig(path, dpi=settings['dpi'])
     plt.close()
 
-    # --- Visualization 3: CRP Trends (Inflammation Spikes) ---
-    plt.figure(figsize=(12, 6))
-    # Plot CRP levels over time to identify inflammation trends
-    sns.lineplot(data=df, x='Date', y='CRP_mg_L')
+def _render_crp_trends(data: pd.DataFrame, path: str, settings: dict) -> None:
+    """Renders CRP over time: the daily mean with its band, or seaborn's bootstrap on raw rows."""
+    sns.set_theme(style="whitegrid")
+    plt.figure(figsize=settings['figsize'])
+    if settings['aggregate']:
+        ax = sns.lineplot(data=data, x='Date', y='mean')
+        ax.fill_between(data['Date'], data['low'], data['high'], alpha=0.2)
+    else:
+        sns.lineplot(data=data, x='Date', y='CRP_mg_L')
     plt.title('CRP Levels Over Time')
     plt.xlabel('Date')
     plt.ylabel('CRP (mg/L)')
     plt.tight_layout()
-    # Save the plot
-    plt.savefig(f'{output_dir}crp_trends.png')
+    plt.savefig(path, dpi=settings['dpi'])
     plt.close()
 
-    print(f"✅ Static visuals generated and saved to {output_dir}")
+def daily_crp_band(df: pd.DataFrame, band: str = 'ci') -> pd.DataFrame:
+    """Computes the daily CRP mean with a band around it.
+
+    Args:
+        df (pd.DataFrame): Reports with 'Date' and 'CRP_mg_L' columns.
+        band (str): 'ci' for the 95% normal confidence interval of the mean (what
+            seaborn estimates by bootstrapping), or 'quantile' for the 25th-75th percentiles.
+
+    Returns:
+        pd.DataFrame: One row per date with 'mean', 'low' and 'high' columns.
+    """
+    grouped = df['CRP_mg_L'].astype(np.float64).groupby(df['Date'])
+    daily = grouped.agg(['mean', 'std', 'count'])
+    if band == 'ci':
+        half_width = CI_Z * daily['std'].fillna(0.0) / np.sqrt(daily['count'])
+        daily['low'], daily['high'] = daily['mean'] - half_width, daily['mean'] + half_width
+    elif band == 'quantile':
+        daily['low'], daily['high'] = grouped.quantile(0.25), grouped.quantile(0.75)
+    else:
+        raise ValueError(f"Unknown band {band!r}; expected 'ci' or 'quantile'")
+    return daily[['mean', 'low', 'high']].reset_index()
+
+def build_figure_inputs(df: pd.DataFrame, aggregate: bool = True, band: str = 'ci') -> dict:
+    """Prepares the input data and plot settings of each figure.
+
+    Args:
+        df (pd.DataFrame): Reports with Date, Gender, Age, Diagnosis and CRP_mg_L columns.
+        aggregate (bool): Feed the plots pre-aggregated statistics instead of raw rows.
+        band (str): The CRP band in aggregate mode ('ci' or 'quantile').
+
+    Returns:
+        dict: Output file name to (render function, input data, settings).
+    """
+    base = {'figsize': (12, 6), 'dpi': 100, 'version': RENDER_VERSION}
+
+    infection_df = df[df['Diagnosis'].isin(['Bacterial infection', 'Viral infection'])]
+    infection_counts = infection_df.groupby('Date').size().reset_index(name='count')
+
+    anemia_df = df[df['Diagnosis'] == 'Anemia'][['Age', 'Gender']]
+    if aggregate:
+        anemia_df = anemia_df.groupby(['Age', 'Gender'], observed=True).size().reset_index(name='count')
+
+    crp = daily_crp_band(df, band) if aggregate else df[['Date', 'CRP_mg_L']]
+
+    return {
+        'infection_trends.png': (_render_infection_trends, infection_counts, base),
+        'anemia_distribution.png': (_render_anemia_distribution, anemia_df, {**base, 'bins': 20}),
+        'crp_trends.png': (_render_crp_trends, crp, {**base, 'aggregate': aggregate, 'band': band}),
+    }
+
+def input_hash(data: pd.DataFrame, settings: dict) -> str:
+    """Hashes a figure's input data and plot settings.
+
+    Args:
+        data (pd.DataFrame): The figure's input data.
+        settings (dict): The figure's plot settings.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    digest.update(','.join(f'{col}:{dtype}' for col, dtype in data.dtypes.items()).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _render(render, data: pd.DataFrame, path: str, settings: dict) -> str:
+    """Renders one figure in a worker process and returns its path."""
+    render(data, path, settings)
+    return path
+
+def generate_static_visuals(file_path: str = DATASET_PATH, output_dir: str = REPORTS_DIR,
+                            start_date: str = None, end_date: str = None, partitions_root: str = None,
+                            aggregate: bool = True, band: str = 'ci', workers: int = None,
+                            force: bool = False) -> dict:
+    """Generates and saves static visualizations from the blood reports dataset.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        output_dir (str): The directory where the generated image files will be saved.
+        start_date (str): Inclusive start of the reporting period, or None for all history.
+        end_date (str): Inclusive end of the reporting period, or None for all history.
+        partitions_root (str): Root of the month-partitioned layout. When given, only the
+            partitions overlapping the period are read instead of the full CSV.
+        aggregate (bool): Plot pre-aggregated daily statistics instead of raw rows.
+        band (str): The CRP band in aggregate mode: 'ci' (95% confidence interval of
+            the daily mean) or 'quantile' (interquartile range).
+        workers (int): Number of rendering processes (defaults to one per figure, up to
+            the CPU count); 1 renders in this process.
+        force (bool): Re-render every figure even if its inputs are unchanged.
+
+    Returns:
+        dict: Output file name to 'rendered' or 'unchanged'.
+    """
+    # Load the dataset ('Date' is parsed to datetime by the loader)
+    columns = ['Date', 'Gender', 'Age', 'Diagnosis', 'CRP_mg_L']
+    if partitions_root:
+        df = query_reports(start_date, end_date, columns=columns, root=partitions_root)
+    else:
+        df = load_dataset(file_path, columns=columns)
+        if start_date:
+            df = df[df['Date'] >= start_date]
+        if end_date:
+            df = df[df['Date'] <= end_date]
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    # Only figures whose inputs changed (or whose PNG is missing) are rendered
+    status, pending, hashes = {}, {}, {}
+    for name, (render, data, settings) in build_figure_inputs(df, aggregate, band).items():
+        hashes[name] = input_hash(data, settings)
+        path = os.path.join(output_dir, name)
+        if not force and manifest.get(name) == hashes[name] and os.path.exists(path):
+            status[name] = 'unchanged'
+        else:
+            pending[name] = (render, data, path, settings)
+
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+    if workers <= 1 or len(pending) <= 1:
+        for name, args in pending.items():
+            _render(*args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(_render, *args) for name, args in pending.items()}
+            for future in futures.values():
+                future.result()
+
+    for name in pending:
+        manifest[name] = hashes[name]
+        status[name] = 'rendered'
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"✅ Static visuals generated and saved to {output_dir} "
+          f"({len(pending)} rendered, {len(status) - len(pending)} unchanged)")
+    return status
 
 if __name__ == '__main__':
-    generate_static_visuals()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the static report visuals.")
+    parser.add_argument('--raw', action='store_true', help="Plot raw rows (seaborn bootstrap) instead of daily aggregates")
+    parser.add_argument('--band', choices=['ci', 'quantile'], default='ci', help="CRP band in aggregate mode")
+    parser.add_argument('--workers', type=int, default=None, help="Rendering processes (1 renders serially)")
+    parser.add_argument('--force', action='store_true', help="Re-render figures even if their inputs are unchanged")
+    args = parser.parse_args()
+    generate_static_visuals(aggregate=not args.raw, band=args.band, workers=args.workers, force=args.force)
@@ -0,0 +1,188 @@
+"""Module for headline KPIs computed in one streaming pass over the dataset.
+
+`compute_kpis` reads the CSV (or Parquet files such as the month partitions) in
+fixed-size chunks and folds each chunk into a `KPIStats`: the record count, the
+abnormal count, and per numeric column the count, mean and sum of squared
+deviations (M2), overall and per segment (by default Gender × Diagnosis). Chunk
+moments are combined with the parallel form of Welford's update (Chan et al.),
+which stays accurate where summing raw squares would cancel, and makes partial
+statistics mergeable. The input is split into line-aligned byte ranges (CSV) or
+row groups (Parquet) that worker processes summarize independently; their
+results are merged in order. Memory use is bounded by the chunk size, not the
+dataset size.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from scripts.clinical_rules import is_abnormal
+from scripts.data_loader import CHUNK_ROWS, DATASET_PATH, SPLIT_BYTES, iter_unit_chunks, split_into_units
+
+KPI_COLUMNS = ('Haemoglobin_g_dl', 'CRP_mg_L')
+SEGMENT_COLUMNS = ('Gender', 'Diagnosis')
+
+def _merge_moments(a: tuple, b: tuple) -> tuple:
+    """Combines two (count, mean, M2) triples of per-column arrays (Chan et al.)."""
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(count > 0, count_b / count, 0.0)
+    delta = np.nan_to_num(mean_b - mean_a)
+    mean = np.where(count_a > 0, mean_a + delta * weight, mean_b)
+    m2 = m2_a + m2_b + delta ** 2 * count_a * weight
+    return count, np.nan_to_num(mean), m2
+
+class KPIStats:
+    """Mergeable record counts and per-column moments, overall and per segment."""
+
+    def __init__(self, columns: tuple = KPI_COLUMNS, segment_columns: tuple = SEGMENT_COLUMNS):
+        """Initializes empty statistics.
+
+        Args:
+            columns (tuple): The numeric columns to track.
+            segment_columns (tuple): The columns whose value combinations define segments.
+        """
+        self.columns = list(columns)
+        self.segment_columns = list(segment_columns)
+        self.records = 0
+        self.abnormal = 0
+        self.moments = self._empty_moments()
+        # Segment key tuple to [records, abnormal, (count, mean, M2)]
+        self.segments = {}
+
+    def _empty_moments(self) -> tuple:
+        k = len(self.columns)
+        return np.zeros(k, dtype=np.int64), np.zeros(k), np.zeros(k)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Folds a chunk of reports into the statistics.
+
+        Args:
+            chunk (pd.DataFrame): Reports with the tracked columns, the segment columns and 'Diagnosis'.
+        """
+        if len(chunk) == 0:
+            return
+        abnormal = pd.Series(is_abnormal(chunk['Diagnosis']), index=chunk.index)
+        values = chunk[self.columns].astype(np.float64)
+        self.records += len(chunk)
+        self.abnormal += int(abnormal.sum())
+        self.moments = _merge_moments(self.moments, (
+            values.count().to_numpy(), values.mean().fillna(0.0).to_numpy(),
+            values.var(ddof=0).fillna(0.0).to_numpy() * values.count().to_numpy()))
+
+        if not self.segment_columns:
+            return
+        keys = [chunk[col] for col in self.segment_columns]
+        grouped = values.groupby(keys, observed=True, sort=False)
+        counts, means, variances = grouped.count(), grouped.mean(), grouped.var(ddof=0)
+        sizes = grouped.size()
+        abnormal_counts = abnormal.groupby(keys, observed=True, sort=False).sum()
+        for key in sizes.index:
+            key_tuple = key if isinstance(key, tuple) else (key,)
+            n = counts.loc[key].to_numpy()
+            chunk_moments = (n, means.loc[key].fillna(0.0).to_numpy(), variances.loc[key].fillna(0.0).to_numpy() * n)
+            records, abnormal_count, moments = self.segments.get(key_tuple, (0, 0, self._empty_moments()))
+            self.segments[key_tuple] = [records + int(sizes.loc[key]), abnormal_count + int(abnormal_counts.loc[key]),
+                                        _merge_moments(moments, chunk_moments)]
+
+    def merge(self, other: 'KPIStats') -> 'KPIStats':
+        """Adds the statistics of other rows (e.g. another worker's chunk) in place.
+
+        Args:
+            other (KPIStats): Statistics over the same columns and segment columns.
+
+        Returns:
+            KPIStats: self.
+        """
+        self.records += other.records
+        self.abnormal += other.abnormal
+        self.moments = _merge_moments(self.moments, other.moments)
+        for key, (records, abnormal, moments) in other.segments.items():
+            if key in self.segments:
+                own_records, own_abnormal, own_moments = self.segments[key]
+                self.segments[key] = [own_records + records, own_abnormal + abnormal,
+                                      _merge_moments(own_moments, moments)]
+            else:
+                self.segments[key] = [records, abnormal, moments]
+        return self
+
+    @property
+    def abnormal_ratio(self) -> float:
+        """The share of reports classified as abnormal (0.0 for no reports)."""
+        return self.abnormal / self.records if self.records else 0.0
+
+    @property
+    def means(self) -> dict:
+        """Column name to mean (NaN for a column without values)."""
+        count, mean, _ = self.moments
+        return {col: float(mean[i]) if count[i] else float('nan') for i, col in enumerate(self.columns)}
+
+    @property
+    def variances(self) -> dict:
+        """Column name to sample variance (NaN for fewer than two values)."""
+        count, _, m2 = self.moments
+        return {col: float(m2[i] / (count[i] - 1)) if count[i] > 1 else float('nan')
+                for i, col in enumerate(self.columns)}
+
+    def segment_frame(self) -> pd.DataFrame:
+        """Returns one row per segment with its records, abnormal ratio, and per-column mean and variance.
+
+        Returns:
+            pd.DataFrame: Indexed by the segment columns, sorted.
+        """
+        rows = []
+        for key, (records, abnormal, (count, mean, m2)) in self.segments.items():
+            row = dict(zip(self.segment_columns, key), records=records, abnormal_ratio=abnormal / records)
+            for i, col in enumerate(self.columns):
+                row[f'{col}_mean'] = mean[i] if count[i] else np.nan
+                row[f'{col}_var'] = m2[i] / (count[i] - 1) if count[i] > 1 else np.nan
+            rows.append(row)
+        frame = pd.DataFrame(rows, columns=self.segment_columns + ['records', 'abnormal_ratio'] +
+                             [f'{col}_{stat}' for col in self.columns for stat in ('mean', 'var')])
+        return frame.set_index(self.segment_columns).sort_index()
+
+def _unit_stats(unit: tuple, columns: tuple, segment_columns: tuple, chunk_rows: int) -> KPIStats:
+    """Summarizes one work unit (runs in a worker process)."""
+    stats = KPIStats(columns, segment_columns)
+    read_columns = list(dict.fromkeys([*columns, *segment_columns, 'Diagnosis']))
+    for chunk in iter_unit_chunks(unit, read_columns, chunk_rows):
+        stats.update(chunk)
+    return stats
+
+def compute_kpis(paths=DATASET_PATH, columns: tuple = KPI_COLUMNS, segment_columns: tuple = SEGMENT_COLUMNS,
+                 chunk_rows: int = CHUNK_ROWS, workers: int = None, split_bytes: int = SPLIT_BYTES) -> KPIStats:
+    """Computes the KPI statistics in one chunked pass over CSV or Parquet files.
+
+    Args:
+        paths (str | list): A blood reports CSV or Parquet file, or a list of them
+            (e.g. `partitioned_store.list_partition_files()`).
+        columns (tuple): The numeric columns to track.
+        segment_columns (tuple): The columns whose value combinations define segments.
+        chunk_rows (int): Rows parsed at a time by each worker.
+        workers (int): Number of worker processes (defaults to the CPU count, capped by
+            the number of work units); 1 reads everything in this process.
+        split_bytes (int): Target size of the CSV byte ranges handed to workers.
+
+    Returns:
+        KPIStats: The statistics over every row of the input.
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    units = split_into_units(paths, split_bytes)
+    summarize = partial(_unit_stats, columns=tuple(columns), segment_columns=tuple(segment_columns),
+                        chunk_rows=chunk_rows)
+
+    stats = KPIStats(columns, segment_columns)
+    workers = min(workers or os.cpu_count() or 1, len(units))
+    if workers <= 1:
+        for unit in units:
+            stats.merge(summarize(unit))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for partial_stats in executor.map(summarize, units):
+                stats.merge(partial_stats)
+    return stats
@@ -0,0 +1,379 @@
+"""Module for keeping an in-memory copy of the dataset current while it grows.
+
+`LiveDataset` loads the dataset once and remembers how many bytes of the CSV it
+has consumed. Each `poll` checks the file size and, when reports were appended,
+parses only the new bytes. It can also watch a drop directory where the lab
+uploads batch CSV files (same header as the dataset), ingesting each file once.
+The new rows are appended to the dataset and returned, so callers can fold them
+into their own derived structures (rollup cube, filter index, moment statistics)
+and invalidate only the cached results they touch, without a restart or a
+re-parse of the full history.
+
+Appends never copy the history. Rows are held in preallocated column arrays
+whose capacity grows by half when full (`_GrowingFrame`), so an append costs
+amortized time in the size of the batch, and `frame` is a zero-copy view of the
+filled part. With `shared_memory`, the memory-mapped rows stay mapped and only
+the appended rows live in a private growing frame. `take`, `select` and
+`rows_since` read both parts without copying the mapped rows; `frame` combines
+them on demand.
+
+Only appends are detected incrementally. Each poll checks that the file is the
+same one (same inode, not shorter) and that its first and last consumed bytes
+are unchanged. If the CSV was rewritten, even to a longer file, the dataset is
+reloaded in full, the drop-directory batches are folded back in, and `poll`
+reports it.
+"""
+
+import glob
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from scripts.data_loader import DATASET_PATH, load_dataset, load_shared_dataset, read_csv_typed
+
+# Bytes compared at the start and at the end of the consumed CSV to detect a rewrite
+FINGERPRINT_BYTES = 4096
+
+def concat_reports(frames: list) -> pd.DataFrame:
+    """Concatenates typed report frames, keeping categorical columns categorical.
+
+    `pd.concat` falls back to object dtype when categoricals have different
+    categories (e.g. a batch introducing a new diagnosis), so categories are unioned first.
+
+    Args:
+        frames (list): Typed report frames with the same columns.
+
+    Returns:
+        pd.DataFrame: The rows of all frames with a fresh RangeIndex.
+    """
+    categorical = [col for col in frames[0].columns if isinstance(frames[0][col].dtype, pd.CategoricalDtype)]
+    if categorical:
+        frames = [frame.copy(deep=False) for frame in frames]
+        for col in categorical:
+            categories = pd.Index(sorted(set().union(*(frame[col].cat.categories for frame in frames))))
+            for frame in frames:
+                frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+def _codes_dtype(num_categories: int) -> np.dtype:
+    """Returns the code dtype pandas uses for this many categories, so codes are wrapped without a copy."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+class _GrowingFrame:
+    """Report columns in preallocated arrays that grow geometrically as rows are appended.
+
+    Categorical columns are stored as codes, with categories extended in order of
+    appearance; columns of extension dtypes (e.g. strings) as object arrays.
+    """
+
+    GROWTH = 1.5
+
+    def __init__(self, frame: pd.DataFrame):
+        self.columns = list(frame.columns)
+        self.num_rows = 0
+        self._arrays = {}
+        self._categories = {}
+        for col in self.columns:
+            dtype = frame[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                self._categories[col] = pd.Index(dtype.categories)
+                self._arrays[col] = np.empty(0, dtype=_codes_dtype(len(dtype.categories)))
+            else:
+                self._arrays[col] = np.empty(0, dtype=dtype if isinstance(dtype, np.dtype) else object)
+        self._view = None
+        self.append(frame)
+
+    def append(self, frame: pd.DataFrame) -> None:
+        """Copies the rows of `frame` (same columns) after the current rows."""
+        start, end = self.num_rows, self.num_rows + len(frame)
+        capacity = len(self._arrays[self.columns[0]])
+        if end > capacity:
+            capacity = max(end, int(capacity * self.GROWTH))
+            for col, array in self._arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:start] = array[:start]
+                self._arrays[col] = grown
+
+        for col in self.columns:
+            values = frame[col]
+            if col in self._categories:
+                codes, batch_categories = (
+                    (values.cat.codes.to_numpy(), values.cat.categories)
+                    if isinstance(values.dtype, pd.CategoricalDtype) else pd.factorize(values))
+                categories = self._categories[col]
+                unseen = batch_categories[~batch_categories.isin(categories)]
+                if len(unseen):
+                    categories = self._categories[col] = categories.append(unseen)
+                    dtype = _codes_dtype(len(categories))
+                    if dtype != self._arrays[col].dtype:
+                        self._arrays[col] = self._arrays[col].astype(dtype)
+                mapping = categories.get_indexer(batch_categories)
+                self._arrays[col][start:end] = np.where(codes >= 0, mapping[codes], -1)
+            else:
+                self._arrays[col][start:end] = values.to_numpy(dtype=self._arrays[col].dtype)
+        self.num_rows = end
+        self._view = None
+
+    def view(self) -> pd.DataFrame:
+        """Returns the rows as a DataFrame over the arrays (no copy); later appends do not change it."""
+        if self._view is None:
+            data = {}
+            for col, array in self._arrays.items():
+                filled = array[:self.num_rows]
+                data[col] = (pd.Categorical.from_codes(filled, categories=self._categories[col], validate=False)
+                             if col in self._categories else filled)
+            self._view = pd.DataFrame(data, copy=False)
+        return self._view
+
+def _take(frame: pd.DataFrame, positions: np.ndarray, columns: list = None) -> pd.DataFrame:
+    """Returns the rows of `frame` at `positions`, optionally only some columns."""
+    if columns is None:
+        return frame.take(positions)
+    return frame.iloc[positions, [frame.columns.get_loc(col) for col in columns]]
+
+class LiveDataset:
+    """The dataset in memory, extended in place as the CSV or a drop directory grows."""
+
+    def __init__(self, file_path: str = DATASET_PATH, incoming_dir: str = None, derive=None,
+                 shared_memory: bool = False):
+        """Loads the dataset and records the consumed CSV length.
+
+        Args:
+            file_path (str): The path to the blood reports CSV file.
+            incoming_dir (str): Optional directory of batch CSV files to ingest as they appear.
+                Files should be moved in complete (written elsewhere, then renamed).
+            derive (callable): Optional function adding derived columns to a frame of
+                reports; applied to the initial dataset and to every batch of new rows.
+            shared_memory (bool): Load the initial dataset from the memory-mapped Arrow
+                sidecar. It stays mapped; appended rows are kept in private memory.
+        """
+        self.file_path = file_path
+        self.incoming_dir = incoming_dir
+        self._derive = derive or (lambda frame: frame)
+        self._shared_memory = shared_memory
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """(Re)loads the full dataset and resets the consumed CSV length and ingested batches."""
+        # Taken before loading, so rows appended during the load are never missed
+        self._offset = os.path.getsize(self.file_path)
+        self._inode = os.stat(self.file_path).st_ino
+        self._fingerprint = self._read_fingerprint()
+        self._ingested = set()
+        frame = load_shared_dataset(self.file_path) if self._shared_memory else load_dataset(self.file_path)
+        self._columns = list(frame.columns)
+        frame = self._derive(frame)
+        # Rows from the CSV as loaded; later rows were appended or came from the drop directory
+        self.loaded_rows = len(frame)
+        # The CSV grew while loading: the load may have parsed rows past `_offset` as well
+        self._overlap_check = os.path.getsize(self.file_path) != self._offset
+        # Mapped rows, and the growing frame of all (private) or appended (shared) rows
+        self._mapped = frame if self._shared_memory else None
+        self._growing = None if self._shared_memory else _GrowingFrame(frame)
+        self._combined = None
+
+    def _append(self, new_rows: pd.DataFrame) -> None:
+        """Appends derived rows without copying the existing ones."""
+        if self._growing is None:
+            self._growing = _GrowingFrame(new_rows)
+        else:
+            self._growing.append(new_rows)
+        self._combined = None
+
+    def _parts(self) -> list:
+        """Returns the (first row position, frame) parts holding the rows, in order."""
+        parts = [] if self._mapped is None else [(0, self._mapped)]
+        if self._growing is not None:
+            parts.append((0 if self._mapped is None else len(self._mapped), self._growing.view()))
+        return parts
+
+    def _read_fingerprint(self) -> tuple:
+        """Reads the first and last `FINGERPRINT_BYTES` of the consumed part of the CSV."""
+        with open(self.file_path, 'rb') as f:
+            head = f.read(min(FINGERPRINT_BYTES, self._offset))
+            f.seek(max(0, self._offset - FINGERPRINT_BYTES))
+            tail = f.read(min(FINGERPRINT_BYTES, self._offset))
+        return head, tail
+
+    def _was_rewritten(self) -> bool:
+        """Checks whether the CSV was replaced or rewritten since it was consumed."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            # Between the unlink and rename of a replacement; the next poll sees the new file
+            return False
+        return (stat.st_ino != self._inode or stat.st_size < self._offset
+                or self._read_fingerprint() != self._fingerprint)
+
+    def _read_appended(self) -> pd.DataFrame:
+        """Parses the complete lines appended to the CSV since the last read, or returns None."""
+        size = os.path.getsize(self.file_path)
+        if size <= self._offset:
+            return None
+        with open(self.file_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        # A line still being written is left for the next poll
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None
+        self._offset += end
+        self._fingerprint = self._read_fingerprint()
+        rows = read_csv_typed(io.BytesIO(data[:end]), header=None, names=self._columns)
+        if self._overlap_check:
+            self._overlap_check = False
+            # Rows appended during the load end the loaded CSV rows; skip those already loaded
+            loaded = self.take(np.arange(max(0, self.loaded_rows - len(rows)), self.loaded_rows), columns=['Report_ID'])
+            rows = rows[~rows['Report_ID'].astype(str).isin(set(loaded['Report_ID'].astype(str)))].reset_index(drop=True)
+        return rows
+
+    def _read_incoming(self) -> list:
+        """Parses the batch files that appeared in the drop directory since the last poll."""
+        if not self.incoming_dir:
+            return []
+        batches = []
+        for path in sorted(glob.glob(os.path.join(self.incoming_dir, '*.csv'))):
+            if path in self._ingested:
+                continue
+            batches.append(read_csv_typed(path)[self._columns])
+            self._ingested.add(path)
+        return batches
+
+    def poll(self) -> tuple:
+        """Ingests reports added since the last poll.
+
+        Cheap when nothing changed: one `stat` and two small reads of the CSV, and a
+        listing of the drop directory.
+
+        Returns:
+            tuple: (new rows, reloaded). `new rows` is a frame of the appended reports
+                (with derived columns) or None when there are none; `reloaded` is True
+                when the CSV was rewritten and `frame` was reloaded in full, together
+                with the drop-directory batches.
+        """
+        with self._lock:
+            if self._was_rewritten():
+                self._load()
+                for batch in self._read_incoming():
+                    if len(batch):
+                        self._append(self._derive(batch))
+                return None, True
+
+            batches = [batch for batch in [self._read_appended()] + self._read_incoming()
+                       if batch is not None and len(batch)]
+            if not batches:
+                return None, False
+
+            new_rows = self._derive(concat_reports(batches) if len(batches) > 1 else batches[0])
+            self._append(new_rows)
+            return new_rows, False
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """All reports as one frame.
+
+        A zero-copy view, except with `shared_memory` after rows were appended: the mapped
+        and appended rows are then combined into private memory (once per append). Use
+        `select`, `take` or `rows_since` to avoid that.
+        """
+        parts = self._parts()
+        if len(parts) == 1:
+            return parts[0][1]
+        if self._combined is None:
+            self._combined = concat_reports([part for _, part in parts])
+        return self._combined
+
+    @property
+    def num_rows(self) -> int:
+        """The number of reports currently in memory."""
+        return sum(len(part) for _, part in self._parts())
+
+    def take(self, positions: np.ndarray, columns: list = None) -> pd.DataFrame:
+        """Returns the reports at the given ascending row positions.
+
+        Args:
+            positions (np.ndarray): Ascending row positions, e.g. from `FilterIndex.positions`.
+            columns (list): Columns to keep, or None for all.
+
+        Returns:
+            pd.DataFrame: The selected rows.
+        """
+        parts = self._parts()
+        if len(parts) == 1:
+            return _take(parts[0][1], positions, columns)
+        pieces = []
+        for start, part in parts:
+            lo, hi = np.searchsorted(positions, [start, start + len(part)])
+            pieces.append(_take(part, positions[lo:hi] - start, columns))
+        return concat_reports(pieces)
+
+    def select(self, index, columns: list = None, start_date=None, end_date=None, **equals) -> pd.DataFrame:
+        """Returns the reports matching a filter combination of a `FilterIndex` over this dataset.
+
+        With no active filter and a single part, the frame itself is returned (no copy).
+
+        Args:
+            index (FilterIndex): The index of the current rows.
+            columns (list): Columns to keep, or None for all.
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Column name to required value; None means no filter on that column.
+
+        Returns:
+            pd.DataFrame: The matching rows.
+        """
+        mask = index.mask(start_date, end_date, **equals)
+        if mask is None and len(self._parts()) == 1:
+            return self.frame
+        return self.take(np.arange(self.num_rows) if mask is None else np.flatnonzero(mask), columns)
+
+    def rows_since(self, position: int) -> pd.DataFrame:
+        """Returns the reports from a row position on (e.g. those appended since a browser's last refresh).
+
+        Args:
+            position (int): The first row position.
+
+        Returns:
+            pd.DataFrame: The rows, which only copy the parts after `position`.
+        """
+        pieces = [part.iloc[max(0, position - start):] for start, part in self._parts() if start + len(part) > position]
+        if not pieces:
+            return self.frame.iloc[:0]
+        return pieces[0] if len(pieces) == 1 else concat_reports(pieces)
+
+    def column_max(self, column: str):
+        """Returns the largest value of a column over all reports."""
+        return max(part[column].max() for _, part in self._parts())
+
+def rows_match(rows: pd.DataFrame, gender=None, diagnosis=None, start_date=None, end_date=None) -> bool:
+    """Checks whether any of the given reports falls inside a dashboard filter combination.
+
+    Used to decide which cached views and charts new rows make stale.
+
+    Args:
+        rows (pd.DataFrame): Reports with Gender, Diagnosis and Date columns.
+        gender (str): Required gender, or None for all.
+        diagnosis (str): Required diagnosis, or None for all.
+        start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+        end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+
+    Returns:
+        bool: True if at least one row matches.
+    """
+    mask = pd.Series(True, index=rows.index)
+    if gender is not None:
+        mask &= rows['Gender'] == gender
+    if diagnosis is not None:
+        mask &= rows['Diagnosis'] == diagnosis
+    if start_date:
+        mask &= rows['Date'] >= pd.Timestamp(start_date)
+    if end_date:
+        mask &= rows['Date'] <= pd.Timestamp(end_date)
+    return bool(mask.any())
@@ -0,0 +1,204 @@
+"""Module for updating the persisted diagnosis model with new batches of reports.
+
+`update_from_batches` avoids the nightly full retrain. Each new batch (CSV or
+Parquet, read chunk by chunk) is first scored by the current model and compared
+with the labelled diagnoses. This gives an honest out-of-sample accuracy and
+per-class precision, recall and F1, which are checked against the metrics
+recorded at the last full training (`detect_drift`).
+
+Without drift, the model is updated from the new rows only:
+- A random forest grows `TREES_PER_UPDATE` warm-started trees, and the oldest
+  trees are dropped beyond `MAX_ESTIMATORS`, so the forest slides forward in time.
+- An XGBoost model continues boosting for `ROUNDS_PER_UPDATE` rounds from its
+  current trees.
+
+The new rows are fitted together with the artifact's small per-class replay
+sample of past rows, so every class stays represented even when a day's batch
+lacks one. When a class's F1 or the overall accuracy degrades beyond tolerance,
+or the batch holds a gender or diagnosis the encoders have never seen, the model
+is retrained from scratch instead: on the full dataset together with the batch
+(which the dataset usually does not hold yet), with the backend, row cap and
+threads of the last full training. Every update is recorded in the artifact's
+history.
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+
+from scripts.data_loader import DATASET_PATH, iter_unit_chunks, split_into_units
+from scripts.predictive_analytics import (FEATURE_COLUMNS, MODEL_PATH, TARGET_COLUMN, class_metrics, feature_matrix,
+                                          load_model, replay_sample, run_predictive_analytics, save_model, xgboost)
+
+# Growth per update: trees for a random forest, boosting rounds for XGBoost
+TREES_PER_UPDATE = 20
+ROUNDS_PER_UPDATE = 20
+
+# A random forest keeps its newest trees up to this many
+MAX_ESTIMATORS = 300
+
+# Drift: allowed drop below the last full training's metrics before a full retrain
+ACCURACY_TOLERANCE = 0.02
+F1_TOLERANCE = 0.05
+# Classes with fewer rows in a batch are too noisy to judge
+MIN_CLASS_SUPPORT = 30
+
+def read_batches(paths) -> pd.DataFrame:
+    """Reads the Report_ID, feature and target columns of CSV or Parquet batches.
+
+    Args:
+        paths (str | list): Files of new labelled reports.
+
+    Returns:
+        pd.DataFrame: The typed rows of every batch, in order.
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    chunks = [chunk for unit in split_into_units(paths)
+              for chunk in iter_unit_chunks(unit, ['Report_ID'] + FEATURE_COLUMNS + [TARGET_COLUMN])]
+    return pd.concat(chunks, ignore_index=True)
+
+def detect_drift(baseline: dict, current: dict, accuracy_tolerance: float = ACCURACY_TOLERANCE,
+                 f1_tolerance: float = F1_TOLERANCE, min_support: int = MIN_CLASS_SUPPORT) -> list:
+    """Compares a batch's metrics with those of the last full training.
+
+    Args:
+        baseline (dict): The artifact's 'metrics' ('accuracy' and per-class 'classes').
+        current (dict): The batch's metrics, in the same layout.
+        accuracy_tolerance (float): Allowed drop in accuracy.
+        f1_tolerance (float): Allowed drop in a class's F1.
+        min_support (int): Minimum rows of a class in the batch for its F1 to be judged.
+
+    Returns:
+        list: Descriptions of the degraded metrics; empty when there is no drift.
+    """
+    drift = []
+    if current['accuracy'] < baseline['accuracy'] - accuracy_tolerance:
+        drift.append(f"accuracy {current['accuracy']:.3f} < {baseline['accuracy']:.3f}")
+    for cls, metrics in current['classes'].items():
+        reference = baseline['classes'].get(cls)
+        if reference and metrics['support'] >= min_support and metrics['f1'] < reference['f1'] - f1_tolerance:
+            drift.append(f"{cls} F1 {metrics['f1']:.3f} < {reference['f1']:.3f}")
+    return drift
+
+def update_model(artifact: dict, X: np.ndarray, y: np.ndarray, trees: int = TREES_PER_UPDATE,
+                 rounds: int = ROUNDS_PER_UPDATE, n_jobs: int = -1):
+    """Extends the artifact's model with new rows (and its replay sample), in place.
+
+    Args:
+        artifact (dict): The model artifact.
+        X (np.ndarray): The float32 feature matrix of the new rows.
+        y (np.ndarray): The encoded labels of the new rows.
+        trees (int): Trees added to a random forest.
+        rounds (int): Boosting rounds added to an XGBoost model.
+        n_jobs (int): Threads used for fitting (-1 for all cores).
+
+    Returns:
+        The updated model.
+
+    Raises:
+        TypeError: If the model is neither a random forest nor an XGBoost classifier.
+    """
+    replay = artifact['replay']
+    X_fit = np.concatenate([replay['X'], X])
+    y_fit = np.concatenate([replay['y'], y])
+    model = artifact['model']
+
+    if isinstance(model, RandomForestClassifier):
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees, n_jobs=n_jobs)
+        model.fit(X_fit, y_fit)
+        model.estimators_ = model.estimators_[-MAX_ESTIMATORS:]
+        model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    elif xgboost is not None and isinstance(model, xgboost.XGBClassifier):
+        # Continue from the trees that are used for prediction, without the early-stopping marker
+        booster = model.get_booster()
+        best_iteration = booster.attr('best_iteration')
+        if best_iteration is not None:
+            booster = booster[:int(best_iteration) + 1]
+        booster.set_attr(best_iteration=None, best_score=None)
+        model = xgboost.XGBClassifier(**{**model.get_params(), 'n_estimators': rounds,
+                                         'early_stopping_rounds': None, 'n_jobs': n_jobs})
+        model.fit(X_fit, y_fit, xgb_model=booster, verbose=False)
+    else:
+        raise TypeError(f"Cannot update a {type(model).__name__} incrementally")
+
+    artifact['model'] = model
+    artifact['replay'] = replay_sample(X_fit, y_fit, random_state=len(artifact['updates']) + 1)
+    return model
+
+def update_from_batches(paths, model_path: str = MODEL_PATH, trees: int = TREES_PER_UPDATE,
+                        rounds: int = ROUNDS_PER_UPDATE, retrain_on_drift: bool = True,
+                        full_data_path: str = DATASET_PATH) -> dict:
+    """Evaluates the persisted model on new labelled batches, then updates or retrains it.
+
+    Args:
+        paths (str | list): Files of new labelled reports.
+        model_path (str): The model artifact, overwritten with the result.
+        trees (int): Trees added to a random forest.
+        rounds (int): Boosting rounds added to an XGBoost model.
+        retrain_on_drift (bool): Whether drift triggers a full retrain; otherwise it is
+            only recorded and the model is updated anyway.
+        full_data_path (str): The full dataset for retraining. The batch rows are added to
+            it; those it already holds (same Report_ID) are used once.
+
+    Returns:
+        dict: The history entry: 'version', 'updated_at', 'action' ('updated' or
+            'retrained'), 'rows', 'seconds', 'metrics' of the prior model on the batch
+            and 'drift'.
+    """
+    started = time.perf_counter()
+    artifact = load_model(model_path)
+    df = read_batches(paths)
+    gender_encoder, diagnosis_encoder = artifact['gender_encoder'], artifact['diagnosis_encoder']
+
+    unseen = sorted(set(df['Gender'].astype(str)) - set(gender_encoder.classes_) |
+                    set(df[TARGET_COLUMN].astype(str)) - set(diagnosis_encoder.classes_))
+    if unseen:
+        metrics, drift = None, [f"unseen labels {unseen}"]
+    else:
+        X = feature_matrix(df, gender_encoder)
+        y = diagnosis_encoder.transform(df[TARGET_COLUMN].astype(str))
+        y_pred = artifact['model'].predict(X)
+        metrics = {'accuracy': accuracy_score(y, y_pred), 'classes': class_metrics(y, y_pred, diagnosis_encoder.classes_)}
+        drift = detect_drift(artifact['metrics'], metrics)
+
+    history = artifact['updates']
+    if unseen or (drift and retrain_on_drift):
+        print(f"Drift detected ({'; '.join(drift)}): retraining on {full_data_path} and the batch")
+        params = artifact['training_params']
+        artifact = run_predictive_analytics(full_data_path, model_path=None, backend=params['backend'],
+                                            n_jobs=params.get('n_jobs', -1), max_rows=params.get('max_rows'),
+                                            extra=df)
+        action = 'retrained'
+    else:
+        update_model(artifact, X, y, trees, rounds)
+        artifact['training_rows'] += len(df)
+        updated_at = datetime.now(timezone.utc)
+        artifact['version'] = updated_at.strftime('%Y%m%dT%H%M%SZ')
+        action = 'updated'
+
+    entry = {'version': artifact['version'], 'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+             'action': action, 'rows': len(df), 'seconds': round(time.perf_counter() - started, 3),
+             'metrics': metrics, 'drift': drift}
+    artifact['updates'] = history + [entry]
+    save_model(artifact, model_path)
+
+    accuracy = f", batch accuracy {metrics['accuracy']:.3f}" if metrics else ""
+    print(f"✅ Model {action} with {len(df)} new reports in {entry['seconds']}s{accuracy} -> {artifact['version']}")
+    return entry
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Update the diagnosis model with new batches of labelled reports.")
+    parser.add_argument('inputs', nargs='+', help="CSV or Parquet files of new reports")
+    parser.add_argument('--model', default=MODEL_PATH, help="Model artifact path")
+    parser.add_argument('--trees', type=int, default=TREES_PER_UPDATE, help="Trees added to a random forest")
+    parser.add_argument('--rounds', type=int, default=ROUNDS_PER_UPDATE, help="Boosting rounds added to XGBoost")
+    parser.add_argument('--no-retrain', action='store_true', help="Record drift but never retrain from scratch")
+    parser.add_argument('--full-data', default=DATASET_PATH, help="Full dataset used when retraining")
+    args = parser.parse_args()
+    update_from_batches(args.inputs, model_path=args.model, trees=args.trees, rounds=args.rounds,
+                        retrain_on_drift=not args.no_retrain, full_data_path=args.full_data)
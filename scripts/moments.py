@@ -0,0 +1,155 @@
+"""Module for mergeable moment statistics over dataset segments.
+
+For each segment (by default one per Gender × Diagnosis × Date combination) the
+statistics hold the row count, the per-column sums and the cross-product matrix
+of the numeric columns. These are sufficient to rebuild the means, covariance and
+correlation matrix of any union of segments by adding them up, so a correlation
+heatmap for any filter combination needs no row scan. New rows are folded in with
+`update`, which only touches the segments they fall in.
+
+Values are shifted by fixed per-column reference means before accumulating,
+which keeps the raw-moment formulas numerically stable.
+"""
+
+import numpy as np
+import pandas as pd
+
+SEGMENT_COLUMNS = ('Gender', 'Diagnosis', 'Date')
+
+class MomentStats:
+    """Per-segment count, sums and cross-products of the numeric columns."""
+
+    def __init__(self, columns: list, shift: np.ndarray, segment_columns: tuple = SEGMENT_COLUMNS):
+        """Initializes empty statistics.
+
+        Args:
+            columns (list): The numeric columns to track.
+            shift (np.ndarray): Reference value per column subtracted before accumulating.
+            segment_columns (tuple): The columns whose value combinations define segments.
+        """
+        self.columns = list(columns)
+        self.shift = np.asarray(shift, dtype=np.float64)
+        self.segment_columns = list(segment_columns)
+        self.segments = pd.DataFrame(columns=self.segment_columns)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros((0, len(self.columns)))
+        self.cross = np.zeros((0, len(self.columns), len(self.columns)))
+        self._positions = {}
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, columns: list = None,
+                   segment_columns: tuple = SEGMENT_COLUMNS) -> 'MomentStats':
+        """Builds the statistics from raw rows.
+
+        Args:
+            frame (pd.DataFrame): The rows to summarize.
+            columns (list): Numeric columns to track; defaults to every numeric column.
+            segment_columns (tuple): The columns whose value combinations define segments.
+
+        Returns:
+            MomentStats: The populated statistics.
+        """
+        if columns is None:
+            columns = frame.select_dtypes(include='number').columns.tolist()
+        shift = frame[columns].mean().to_numpy(dtype=np.float64) if len(frame) else np.zeros(len(columns))
+        stats = cls(columns, shift, segment_columns)
+        stats.update(frame)
+        return stats
+
+    def update(self, new_rows: pd.DataFrame) -> None:
+        """Adds rows to the statistics, creating segments for new key combinations.
+
+        Args:
+            new_rows (pd.DataFrame): The rows to add.
+        """
+        if len(new_rows) == 0:
+            return
+        keys = new_rows[self.segment_columns].astype({col: str for col in self.segment_columns if col != 'Date'})
+        codes, unique_keys = pd.MultiIndex.from_frame(keys).factorize()
+        values = new_rows[self.columns].to_numpy(dtype=np.float64) - self.shift
+
+        # Per-key count, sums and cross-products of the new rows
+        k = len(self.columns)
+        order = np.argsort(codes, kind='stable')
+        boundaries = np.searchsorted(codes[order], np.arange(len(unique_keys) + 1))
+        block_count = np.diff(boundaries)
+        block_sums = np.zeros((len(unique_keys), k))
+        block_cross = np.zeros((len(unique_keys), k, k))
+        for code in range(len(unique_keys)):
+            block = values[order[boundaries[code]:boundaries[code + 1]]]
+            block_sums[code] = block.sum(axis=0)
+            block_cross[code] = block.T @ block
+
+        # Register unseen keys as new (empty) segments in one step, then add
+        new_keys = [key for key in unique_keys if key not in self._positions]
+        if new_keys:
+            first = len(self.count)
+            self._positions.update({key: first + i for i, key in enumerate(new_keys)})
+            self.segments = pd.concat([self.segments, pd.DataFrame(new_keys, columns=self.segment_columns)],
+                                      ignore_index=True) if first else pd.DataFrame(new_keys, columns=self.segment_columns)
+            self.count = np.concatenate([self.count, np.zeros(len(new_keys), dtype=np.int64)])
+            self.sums = np.concatenate([self.sums, np.zeros((len(new_keys), k))])
+            self.cross = np.concatenate([self.cross, np.zeros((len(new_keys), k, k))])
+
+        positions = np.array([self._positions[key] for key in unique_keys])
+        self.count[positions] += block_count
+        self.sums[positions] += block_sums
+        self.cross[positions] += block_cross
+
+    def merged(self, start_date=None, end_date=None, **equals) -> tuple:
+        """Adds up the statistics of the segments matching a filter combination.
+
+        Args:
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Segment column to required value; None means no filter on that column.
+
+        Returns:
+            tuple: (count, sums, cross-products) of the shifted values.
+        """
+        mask = np.ones(len(self.count), dtype=bool)
+        for col, value in equals.items():
+            if value is not None:
+                mask &= (self.segments[col] == value).to_numpy()
+        if start_date:
+            mask &= (self.segments['Date'] >= pd.Timestamp(start_date)).to_numpy()
+        if end_date:
+            mask &= (self.segments['Date'] <= pd.Timestamp(end_date)).to_numpy()
+        return self.count[mask].sum(), self.sums[mask].sum(axis=0), self.cross[mask].sum(axis=0)
+
+    def covariance(self, start_date=None, end_date=None, **equals) -> pd.DataFrame:
+        """Returns the sample covariance matrix for a filter combination.
+
+        Args:
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Segment column to required value; None means no filter on that column.
+
+        Returns:
+            pd.DataFrame: The covariance matrix (NaN when fewer than two rows match).
+        """
+        n, sums, cross = self.merged(start_date, end_date, **equals)
+        if n < 2:
+            cov = np.full((len(self.columns), len(self.columns)), np.nan)
+        else:
+            cov = (cross - np.outer(sums, sums) / n) / (n - 1)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self, start_date=None, end_date=None, **equals) -> pd.DataFrame:
+        """Returns the Pearson correlation matrix for a filter combination.
+
+        Matches `DataFrame.corr()` over the same rows, without scanning them.
+
+        Args:
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+            **equals: Segment column to required value; None means no filter on that column.
+
+        Returns:
+            pd.DataFrame: The correlation matrix (NaN for constant columns).
+        """
+        cov = self.covariance(start_date, end_date, **equals).to_numpy()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(cov / np.outer(std, std), -1, 1)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
@@ -0,0 +1,147 @@
+"""Module for the month-partitioned on-disk layout of the blood reports dataset.
+
+Reports are stored as Parquet files under one directory per month
+(`month=YYYY-MM/part-*.parquet`), sorted by Date so row-group statistics are tight.
+`query_reports` prunes whole months by directory name and pushes the remaining
+Date, Gender and Diagnosis predicates and the column projection down to Parquet,
+so a "last 30 days" query reads about one or two months regardless of how much
+history has accumulated.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.data_loader import DATA_DIR, DATASET_PATH, load_dataset
+
+PARTITIONS_DIR = os.path.join(DATA_DIR, 'partitions')
+_PARTITION_PREFIX = 'month='
+
+def write_partitioned_dataset(df: pd.DataFrame, root: str = PARTITIONS_DIR, mode: str = 'overwrite',
+                              row_group_size: int = 100_000) -> list:
+    """Writes reports into month partitions.
+
+    Args:
+        df (pd.DataFrame): Typed blood reports (as returned by `load_dataset`).
+        root (str): The root directory of the partitioned layout.
+        mode (str): 'overwrite' replaces the files of every month present in `df`;
+            'append' adds a new part file to each month, leaving existing files untouched.
+        row_group_size (int): Maximum rows per Parquet row group.
+
+    Returns:
+        list: The paths of the written part files.
+    """
+    if mode not in ('overwrite', 'append'):
+        raise ValueError(f"Unsupported write mode: {mode}")
+
+    written = []
+    months = df['Date'].dt.strftime('%Y-%m')
+    for month, month_df in df.groupby(months, sort=True):
+        partition_dir = os.path.join(root, f"{_PARTITION_PREFIX}{month}")
+        os.makedirs(partition_dir, exist_ok=True)
+        if mode == 'overwrite':
+            for old_path in glob.glob(os.path.join(partition_dir, '*.parquet')):
+                os.remove(old_path)
+        part_path = os.path.join(partition_dir, f"part-{uuid.uuid4().hex}.parquet")
+        table = pa.Table.from_pandas(month_df.sort_values('Date'), preserve_index=False)
+        pq.write_table(table, part_path, row_group_size=row_group_size)
+        written.append(part_path)
+    return written
+
+def list_partition_files(root: str = PARTITIONS_DIR, start_date=None, end_date=None) -> list:
+    """Lists the part files of the months overlapping a date range.
+
+    Args:
+        root (str): The root directory of the partitioned layout.
+        start_date (str | pd.Timestamp): Inclusive start of the range, or None for unbounded.
+        end_date (str | pd.Timestamp): Inclusive end of the range, or None for unbounded.
+
+    Returns:
+        list: Part file paths in chronological month order.
+    """
+    first_month = pd.Timestamp(start_date).strftime('%Y-%m') if start_date is not None else None
+    last_month = pd.Timestamp(end_date).strftime('%Y-%m') if end_date is not None else None
+
+    files = []
+    for partition_dir in sorted(glob.glob(os.path.join(root, f"{_PARTITION_PREFIX}*"))):
+        month = os.path.basename(partition_dir)[len(_PARTITION_PREFIX):]
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        files.extend(sorted(glob.glob(os.path.join(partition_dir, '*.parquet'))))
+    return files
+
+def _as_list(value) -> list:
+    """Normalizes a filter value (None, a scalar or a list) to a list of accepted values."""
+    if value is None:
+        return None
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def query_reports(start_date=None, end_date=None, gender=None, diagnosis=None, columns: list = None,
+                  root: str = PARTITIONS_DIR) -> pd.DataFrame:
+    """Reads the reports matching a date range and Gender/Diagnosis filters.
+
+    Only the month partitions overlapping the range are opened; within them the
+    predicates and the column projection are pushed down to the Parquet reader.
+
+    Args:
+        start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+        end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+        gender (str | list): Gender value(s) to keep, or None for all.
+        diagnosis (str | list): Diagnosis value(s) to keep, or None for all.
+        columns (list): Columns to read, or None for all.
+        root (str): The root directory of the partitioned layout.
+
+    Returns:
+        pd.DataFrame: The matching reports, ordered by month.
+    """
+    files = list_partition_files(root, start_date, end_date)
+    if not files:
+        all_files = list_partition_files(root)
+        if not all_files:
+            raise FileNotFoundError(f"No partitions found in {root}")
+        schema = pq.read_schema(all_files[0])
+        empty = schema.empty_table()
+        return (empty.select(columns) if columns is not None else empty).to_pandas()
+
+    filters = []
+    if start_date is not None:
+        filters.append(('Date', '>=', pd.Timestamp(start_date)))
+    if end_date is not None:
+        filters.append(('Date', '<=', pd.Timestamp(end_date)))
+    if gender is not None:
+        filters.append(('Gender', 'in', _as_list(gender)))
+    if diagnosis is not None:
+        filters.append(('Diagnosis', 'in', _as_list(diagnosis)))
+
+    table = pq.read_table(files, columns=columns, filters=filters or None)
+    return table.to_pandas()
+
+def build_partitions(file_path: str = DATASET_PATH, root: str = PARTITIONS_DIR) -> list:
+    """Rebuilds the month partitions from the blood reports CSV, replacing any existing layout.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        root (str): The root directory of the partitioned layout.
+
+    Returns:
+        list: The paths of the written part files.
+    """
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    return write_partitioned_dataset(load_dataset(file_path), root, mode='overwrite')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the month-partitioned blood reports layout.")
+    parser.add_argument('--input', default=DATASET_PATH, help="Source CSV path.")
+    parser.add_argument('--output', default=PARTITIONS_DIR, help="Partition root directory.")
+    args = parser.parse_args()
+
+    part_files = build_partitions(args.input, args.output)
+    print(f"✅ {len(part_files)} month partitions written to {args.output}")
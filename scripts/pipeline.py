@@ -0,0 +1,309 @@
+"""Module for running the build chain as a cached, parallel DAG of stages.
+
+Each `Stage` calls one function of the existing scripts. It declares the stages
+it depends on, the data files it reads and the files it writes. Its code is found
+by following imports: the source of its module and of every project module that
+module imports, directly or transitively (`project_sources`).
+
+`run_pipeline` starts a stage as soon as its dependencies have finished. The
+stages run in a process pool, so independent ones run side by side: the EDA
+profile, the visuals, the model training and the business PDF. Before a stage is
+started, its inputs and parameters are hashed by content. If the digest matches
+the one recorded after its last successful run and every output still exists,
+the stage is skipped. A digest is only computed once its upstream stages are
+done, so a regenerated but identical dataset does not rerun anything downstream.
+File digests are cached by size and mtime in the manifest, so unchanged files
+are not rehashed.
+
+The CSV is parsed at most once per run. The `load` stage builds the typed
+Parquet sidecar (`data_loader.load_dataset`) if it is missing or stale. Every
+later stage reads its columns from the sidecar. A per-stage timing summary is printed at the end.
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from pdf import generate_business_report
+from scripts.data_loader import (DATA_DIR, DATASET_PATH, DATE_COLUMN, PROJECT_ROOT, REPORTS_DIR, cache_path_for,
+                                 load_dataset)
+from scripts.eda import PROFILE_PATH, profile_dataset
+from scripts.generate_report import EXECUTIVE_SUMMARY_PATH, REPORT_PATH, VISUAL_PATHS, generate_pdf_report
+from scripts.generate_visuals import generate_static_visuals
+from scripts.predictive_analytics import MODEL_PATH, run_predictive_analytics
+from scripts.reporteda import generate_blood_report_data_vectorized
+
+MANIFEST_PATH = os.path.join(DATA_DIR, '.cache', 'pipeline_manifest.json')
+
+# Default size of the generated dataset, as in `scripts.reporteda`
+DEFAULT_RECORDS = 10000
+DEFAULT_SEED = 42
+
+class Stage:
+    """One step of the pipeline: a function call with its dependencies, inputs and outputs."""
+
+    def __init__(self, name: str, func, kwargs: dict = None, deps: tuple = (), inputs: tuple = (),
+                 outputs: tuple = (), cached: bool = True, code: tuple = None):
+        """Declares a stage.
+
+        Args:
+            name (str): The stage name.
+            func (callable): A module-level function (it runs in a worker process).
+            kwargs (dict): Keyword arguments of `func`; they are part of the stage digest.
+            deps (tuple): Names of the stages that must finish first.
+            inputs (tuple): Data files the stage reads; their contents are hashed.
+            outputs (tuple): Files the stage writes; a missing one forces a run.
+            cached (bool): Whether the stage may be skipped; stages that check their own
+                freshness cheaply run every time.
+            code (tuple): Project modules whose sources, with those of the project modules
+                they import, are hashed; defaults to the module of `func`. Wrappers defined
+                here name the modules they call, so they do not depend on every stage.
+        """
+        self.name = name
+        self.func = func
+        self.kwargs = kwargs or {}
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.cached = cached
+        self.code = tuple(code) if code is not None else (func.__module__,)
+
+def _module_path(name: str) -> str:
+    """Returns the source file of a project module, or None for other modules."""
+    base = os.path.join(PROJECT_ROOT, *name.split('.'))
+    for path in (f"{base}.py", os.path.join(base, '__init__.py')):
+        if os.path.isfile(path):
+            return path
+    return None
+
+def project_sources(modules: tuple) -> list:
+    """Returns the source files of project modules and of the project modules they import, transitively.
+
+    Imports are read from the syntax tree, including those inside functions, without
+    importing anything; third-party and standard library modules are ignored.
+
+    Args:
+        modules (tuple): Dotted module names, e.g. 'scripts.eda'.
+
+    Returns:
+        list: The sorted source file paths.
+    """
+    sources, queue = set(), list(modules)
+    while queue:
+        path = _module_path(queue.pop())
+        if path is None or path in sources:
+            continue
+        sources.add(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                queue.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                # `from package import module` imports a module, `from module import name` does not
+                queue.append(node.module)
+                queue.extend(f"{node.module}.{alias.name}" for alias in node.names)
+    return sorted(sources)
+
+def generate_dataset(output_path: str = DATASET_PATH, records: int = DEFAULT_RECORDS, seed: int = DEFAULT_SEED) -> str:
+    """Generates the synthetic dataset CSV (as `python -m scripts.reporteda`)."""
+    generate_blood_report_data_vectorized(records, seed=seed).to_csv(output_path, index=False)
+    print(f"✅ CSV generated successfully: {output_path}")
+    return output_path
+
+def build_typed_cache(file_path: str = DATASET_PATH) -> str:
+    """Parses the CSV into its typed Parquet sidecar, unless the sidecar is fresh; later stages read it."""
+    rows = len(load_dataset(file_path, columns=[DATE_COLUMN]))
+    print(f"✅ Loaded {rows} reports into {cache_path_for(file_path)}")
+    return cache_path_for(file_path)
+
+def profile_eda(source: str, output_path: str) -> dict:
+    """Writes the streaming EDA profile."""
+    profile = profile_dataset(source, output_path=output_path)
+    print(f"✅ EDA profile written to {output_path}")
+    return profile
+
+def build_stages(dataset_path: str = DATASET_PATH, reports_dir: str = REPORTS_DIR, model_path: str = MODEL_PATH,
+                 records: int = DEFAULT_RECORDS, seed: int = DEFAULT_SEED) -> list:
+    """Declares the build chain.
+
+    Args:
+        dataset_path (str): The dataset CSV to generate and analyse.
+        reports_dir (str): Where the profile, visuals and PDFs are written.
+        model_path (str): Where the model artifact is saved.
+        records (int): Number of generated reports.
+        seed (int): Seed of the generator.
+
+    Returns:
+        list: The stages, in dependency order.
+    """
+    sidecar = cache_path_for(dataset_path)
+    visuals = [os.path.join(reports_dir, os.path.basename(path)) for path in VISUAL_PATHS]
+    report_path = os.path.join(reports_dir, os.path.basename(REPORT_PATH))
+    profile_path = os.path.join(reports_dir, os.path.basename(PROFILE_PATH))
+    # Published with the other reports rather than next to pdf.py
+    business_path = os.path.join(reports_dir, 'Blood_Report_Business_Impact_Report.pdf')
+
+    return [
+        Stage('dataset', generate_dataset, {'output_path': dataset_path, 'records': records, 'seed': seed},
+              code=['scripts.reporteda'], outputs=[dataset_path]),
+        # The sidecar is tagged with the CSV's size and mtime; `load_dataset` checks it in milliseconds
+        Stage('load', build_typed_cache, {'file_path': dataset_path}, deps=['dataset'], code=['scripts.data_loader'],
+              inputs=[dataset_path], outputs=[sidecar], cached=False),
+        Stage('eda', profile_eda, {'source': sidecar, 'output_path': profile_path}, deps=['load'],
+              code=['scripts.eda'], inputs=[dataset_path], outputs=[profile_path]),
+        Stage('visuals', generate_static_visuals, {'file_path': dataset_path, 'output_dir': reports_dir},
+              deps=['load'], inputs=[dataset_path], outputs=visuals),
+        Stage('model', run_predictive_analytics, {'file_path': dataset_path, 'model_path': model_path},
+              deps=['load'], inputs=[dataset_path], outputs=[model_path]),
+        Stage('business_pdf', generate_business_report, {'output_path': business_path, 'source': sidecar},
+              deps=['load'], inputs=[dataset_path], outputs=[business_path]),
+        Stage('report', generate_pdf_report,
+              {'output_filename': report_path, 'executive_summary_path': EXECUTIVE_SUMMARY_PATH, 'image_paths': visuals},
+              deps=['visuals'], inputs=[EXECUTIVE_SUMMARY_PATH] + visuals, outputs=[report_path]),
+    ]
+
+def _file_digest(path: str, known: dict) -> str:
+    """Returns the SHA-256 of a file, reusing `known` entries whose size and mtime still match."""
+    if not os.path.exists(path):
+        return 'missing'
+    stat = os.stat(path)
+    cached = known.get(path)
+    if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    known[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return known[path][2]
+
+def stage_digest(stage: Stage, known: dict) -> str:
+    """Hashes a stage's function source, parameters, code and input file contents.
+
+    Args:
+        stage (Stage): The stage.
+        known (dict): Cached file digests (path to [size, mtime_ns, sha256]), updated in place.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256(f"{stage.func.__module__}.{stage.func.__qualname__}".encode())
+    # Covers wrappers defined in this module, which are not among the stage's code modules
+    digest.update(inspect.getsource(stage.func).encode())
+    digest.update(json.dumps(stage.kwargs, sort_keys=True, default=str).encode())
+    for path in project_sources(stage.code) + list(stage.inputs):
+        digest.update(f"{path}:{_file_digest(path, known)}".encode())
+    return digest.hexdigest()
+
+def _run_stage(func, kwargs: dict) -> float:
+    """Runs a stage function (in a worker process) and returns its duration in seconds."""
+    started = time.perf_counter()
+    func(**kwargs)
+    return time.perf_counter() - started
+
+def run_pipeline(stages: list = None, workers: int = None, force: bool = False,
+                 manifest_path: str = MANIFEST_PATH) -> dict:
+    """Runs the stages whose inputs changed, independent ones in parallel.
+
+    Args:
+        stages (list): The stages (defaults to `build_stages()`).
+        workers (int): Number of stages run at once (defaults to the CPU count).
+        force (bool): Run every stage even if its inputs are unchanged.
+        manifest_path (str): Where file digests and the digests of successful runs are kept.
+
+    Returns:
+        dict: Stage name to {'status', 'seconds'}; status is 'ran', 'skipped', 'failed'
+            or 'blocked' (an upstream stage failed).
+
+    Raises:
+        ValueError: If a stage depends on an unknown stage or the dependencies form a cycle.
+    """
+    stages = {stage.name: stage for stage in (stages or build_stages())}
+    for stage in stages.values():
+        unknown = set(stage.deps) - set(stages)
+        if unknown:
+            raise ValueError(f"Stage {stage.name!r} depends on unknown stages {sorted(unknown)}")
+
+    manifest = {'files': {}, 'stages': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    started = time.perf_counter()
+    results, digests, running = {}, {}, {}
+    pending = dict(stages)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            while pending or running:
+                # Settle every stage whose dependencies are done: skip, block or start it
+                settled = True
+                while settled:
+                    settled = False
+                    for name, stage in list(pending.items()):
+                        statuses = [results.get(dep, {}).get('status') for dep in stage.deps]
+                        if any(status in ('failed', 'blocked') for status in statuses):
+                            results[name] = {'status': 'blocked', 'seconds': 0.0}
+                            settled = True
+                        elif all(status in ('ran', 'skipped') for status in statuses):
+                            digests[name] = stage_digest(stage, manifest['files'])
+                            if (not force and stage.cached and manifest['stages'].get(name) == digests[name]
+                                    and all(os.path.exists(path) for path in stage.outputs)):
+                                results[name] = {'status': 'skipped', 'seconds': 0.0}
+                                settled = True
+                            else:
+                                running[executor.submit(_run_stage, stage.func, stage.kwargs)] = name
+                        else:
+                            continue
+                        del pending[name]
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Stages {sorted(pending)} have cyclic dependencies")
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = {'status': 'ran', 'seconds': future.result()}
+                        manifest['stages'][name] = digests[name]
+                    except Exception as exc:
+                        results[name] = {'status': 'failed', 'seconds': 0.0, 'error': repr(exc)}
+                        manifest['stages'].pop(name, None)
+                        print(f"Stage {name} failed: {exc!r}")
+    finally:
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+    print_timings(results, time.perf_counter() - started)
+    return {name: results[name] for name in stages}
+
+def print_timings(results: dict, wall_seconds: float) -> None:
+    """Prints the per-stage status and duration."""
+    print("\nPipeline timings:")
+    for name, result in results.items():
+        print(f"  {name:<14} {result['status']:<8} {result['seconds']:8.2f}s")
+    busy = sum(result['seconds'] for result in results.values())
+    ran = sum(result['status'] == 'ran' for result in results.values())
+    failed = [name for name, result in results.items() if result['status'] in ('failed', 'blocked')]
+    summary = f"in {wall_seconds:.2f}s ({ran} of {len(results)} stages ran, {busy:.2f}s of stage time)"
+    print(f"Pipeline failed {summary}: {', '.join(failed)} did not complete" if failed else f"✅ Pipeline finished {summary}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the build chain, skipping stages whose inputs are unchanged.")
+    parser.add_argument('--records', type=int, default=DEFAULT_RECORDS, help="Number of records to generate")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed of the generator")
+    parser.add_argument('--workers', type=int, default=None, help="Stages run at once (defaults to the CPU count)")
+    parser.add_argument('--force', action='store_true', help="Run every stage even if its inputs are unchanged")
+    args = parser.parse_args()
+    results = run_pipeline(build_stages(records=args.records, seed=args.seed), workers=args.workers, force=args.force)
+    if any(result['status'] in ('failed', 'blocked') for result in results.values()):
+        raise SystemExit(1)
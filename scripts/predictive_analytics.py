@@ -3,51 +3,396 @@
 This module loads the blood reports dataset, preprocesses it by encoding categorical
 features, splits the data into training and testing sets, trains a RandomForestClassifier,
 and evaluates its performance using accuracy and a classification report.
+
+The fitted model, its label encoders and the feature order are saved as one
+versioned artifact (`save_model`), so new reports can be scored without
+retraining (see `scripts.score_reports`), or updated with new batches of reports
+(see `scripts.model_updates`).
+
+Training scales to millions of rows: trees are fitted on all cores from a float32
+matrix, the training set can be capped by stratified subsampling, and a
+histogram-based XGBoost backend with early stopping is available. The
+`benchmark_training` function records fit time, peak memory and accuracy per backend and
+dataset size, each measured in a fresh process.
 """
 
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
 import pandas as pd
+import psutil
+import sklearn
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.metrics import classification_report, accuracy_score, f1_score
 from sklearn.preprocessing import LabelEncoder
 
-def run_predictive_analytics(file_path: str = "data/blood_reports_dataset.csv") -> None:
-    """Runs the predictive analytics pipeline on the blood reports dataset.
+from scripts.data_loader import DATA_DIR, DATASET_PATH, REPORTS_DIR, SCHEMA, load_dataset
+
+try:
+    import xgboost
+except ImportError:  # random forest backend only
+    xgboost = None
+
+MODELS_DIR = os.path.join(DATA_DIR, 'models')
+MODEL_PATH = os.path.join(MODELS_DIR, 'diagnosis_model.joblib')
+
+# Bump when the artifact layout changes; artifacts of another format are rejected on load
+ARTIFACT_FORMAT = 2
+
+TARGET_COLUMN = 'Diagnosis'
+
+# Model inputs, in the order of the feature matrix columns
+FEATURE_COLUMNS = [col for col in SCHEMA if col not in ('Report_ID', 'Abnormal_Flag', TARGET_COLUMN)]
+
+BACKENDS = ('random_forest', 'xgboost')
+
+# XGBoost: upper bound on boosting rounds, stopped early on the validation loss
+XGB_MAX_ROUNDS = 500
+XGB_EARLY_STOPPING_ROUNDS = 20
+VALIDATION_FRACTION = 0.1
+
+# Past training rows kept per class in the artifact, replayed by incremental updates
+REPLAY_ROWS_PER_CLASS = 2000
+
+BENCHMARK_PATH = os.path.join(REPORTS_DIR, 'training_benchmark.json')
+BENCHMARK_SIZES = (10_000, 100_000, 1_000_000)
+# Interval between resident memory samples during a benchmark fit
+RSS_SAMPLE_SECONDS = 0.01
+
+def feature_matrix(df: pd.DataFrame, gender_encoder: LabelEncoder) -> np.ndarray:
+    """Builds the model's float32 feature matrix from typed reports.
 
     Args:
-        file_path (str): The path to the blood reports CSV file.
+        df (pd.DataFrame): Reports with every column of `FEATURE_COLUMNS`.
+        gender_encoder (LabelEncoder): The fitted encoder of the Gender column.
+
+    Returns:
+        np.ndarray: A C-contiguous (rows, features) float32 matrix.
     """
-    # Load the dataset
-    df = pd.read_csv(file_path)
+    X = np.empty((len(df), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, col in enumerate(FEATURE_COLUMNS):
+        X[:, i] = gender_encoder.transform(df[col].astype(str)) if col == 'Gender' else df[col].to_numpy(dtype=np.float32)
+    return X
 
-    # Drop irrelevant columns for prediction
-    df = df.drop(columns=['Report_ID', 'Date', 'Abnormal_Flag'])
+def save_model(artifact: dict, path: str = MODEL_PATH) -> str:
+    """Writes a model artifact atomically, so scorers never load a partial file.
 
-    # Encode categorical features
-    le_gender = LabelEncoder()
-    df['Gender'] = le_gender.fit_transform(df['Gender'])
+    Args:
+        artifact (dict): The artifact built by `run_predictive_analytics`.
+        path (str): The artifact path.
+
+    Returns:
+        str: The artifact path.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def load_model(path: str = MODEL_PATH) -> dict:
+    """Loads a model artifact.
+
+    Args:
+        path (str): The artifact path.
+
+    Returns:
+        dict: The artifact: 'model', 'gender_encoder', 'diagnosis_encoder', 'features',
+            'version', 'trained_at', 'training_rows', 'training_params', 'metrics' (with
+            per-class metrics under 'classes'), 'library_versions', 'replay' (a per-class
+            sample of training rows) and 'updates' (the incremental update history).
+
+    Raises:
+        ValueError: If the artifact has another format or feature order than this code.
+    """
+    artifact = joblib.load(path)
+    if not isinstance(artifact, dict) or artifact.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not a format-{ARTIFACT_FORMAT} model artifact; retrain the model")
+    if artifact['features'] != FEATURE_COLUMNS:
+        raise ValueError(f"{path} was trained on features {artifact['features']}, expected {FEATURE_COLUMNS}")
+    return artifact
+
+def class_metrics(y_true: np.ndarray, y_pred: np.ndarray, classes) -> dict:
+    """Computes the per-class precision, recall, F1 and support.
+
+    Args:
+        y_true (np.ndarray): The encoded true labels.
+        y_pred (np.ndarray): The encoded predictions.
+        classes (array-like): The class names, in encoder order.
+
+    Returns:
+        dict: Class name to {'precision', 'recall', 'f1', 'support'}.
+    """
+    report = classification_report(y_true, y_pred, labels=np.arange(len(classes)), target_names=list(classes),
+                                   output_dict=True, zero_division=0)
+    return {cls: {'precision': report[cls]['precision'], 'recall': report[cls]['recall'],
+                  'f1': report[cls]['f1-score'], 'support': int(report[cls]['support'])} for cls in classes}
+
+def replay_sample(X: np.ndarray, y: np.ndarray, per_class: int = REPLAY_ROWS_PER_CLASS,
+                  random_state: int = 42) -> dict:
+    """Draws up to `per_class` random rows of each class.
+
+    Args:
+        X (np.ndarray): The feature matrix.
+        y (np.ndarray): The encoded labels.
+        per_class (int): The maximum number of rows kept per class.
+        random_state (int): Seed of the sample.
+
+    Returns:
+        dict: {'X': float32 matrix, 'y': labels} of the sampled rows.
+    """
+    rng = np.random.default_rng(random_state)
+    keep = [rng.permutation(np.flatnonzero(y == label))[:per_class] for label in np.unique(y)]
+    keep = np.sort(np.concatenate(keep)) if keep else np.zeros(0, dtype=np.intp)
+    return {'X': np.ascontiguousarray(X[keep], dtype=np.float32), 'y': y[keep]}
+
+def stratified_sample(X: np.ndarray, y: np.ndarray, max_rows: int, random_state: int = 42) -> tuple:
+    """Caps a training set at `max_rows` rows, keeping the class proportions.
+
+    Args:
+        X (np.ndarray): The feature matrix.
+        y (np.ndarray): The encoded labels.
+        max_rows (int): The maximum number of rows, or None for no cap.
+        random_state (int): Seed of the sample.
+
+    Returns:
+        tuple: (X, y), unchanged when they already fit.
+    """
+    if max_rows is None or len(y) <= max_rows:
+        return X, y
+    X_sample, _, y_sample, _ = train_test_split(X, y, train_size=max_rows, stratify=y, random_state=random_state)
+    return X_sample, y_sample
 
+def train_model(X: np.ndarray, y: np.ndarray, backend: str = 'random_forest', n_jobs: int = -1,
+                random_state: int = 42) -> tuple:
+    """Fits a diagnosis classifier.
+
+    Args:
+        X (np.ndarray): The float32 training feature matrix.
+        y (np.ndarray): The encoded training labels.
+        backend (str): 'random_forest' (100 trees) or 'xgboost' (histogram trees, early
+            stopping on a stratified `VALIDATION_FRACTION` of the training rows).
+        n_jobs (int): Threads used for fitting and later prediction (-1 for all cores).
+        random_state (int): Seed of the model and the validation split.
+
+    Returns:
+        tuple: (fitted model, dict of training parameters).
+
+    Raises:
+        ValueError: If the backend is unknown or its library is not installed.
+    """
+    if backend == 'random_forest':
+        model = RandomForestClassifier(n_estimators=100, random_state=random_state, n_jobs=n_jobs)
+        model.fit(X, y)
+        return model, {'backend': backend, 'n_estimators': 100}
+
+    if backend == 'xgboost':
+        if xgboost is None:
+            raise ValueError("The xgboost backend requires the xgboost package")
+        X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=VALIDATION_FRACTION, stratify=y,
+                                                      random_state=random_state)
+        model = xgboost.XGBClassifier(n_estimators=XGB_MAX_ROUNDS, tree_method='hist', learning_rate=0.1,
+                                      max_depth=6, early_stopping_rounds=XGB_EARLY_STOPPING_ROUNDS,
+                                      eval_metric='mlogloss', n_jobs=n_jobs, random_state=random_state)
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        return model, {'backend': backend, 'n_estimators': int(model.best_iteration) + 1}
+
+    raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+
+def load_training_data(file_path: str = DATASET_PATH, extra: pd.DataFrame = None) -> tuple:
+    """Loads the features and labels and fits the label encoders.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        extra (pd.DataFrame): Optional labelled reports added to the dataset. With a
+            Report_ID column, reports already in the dataset are kept once.
+
+    Returns:
+        tuple: (X float32 matrix, encoded y, gender encoder, diagnosis encoder).
+    """
+    columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+    if extra is None:
+        df = load_dataset(file_path, columns=columns)
+    else:
+        key = ['Report_ID'] if 'Report_ID' in extra.columns else []
+        df = pd.concat([load_dataset(file_path, columns=key + columns), extra[key + columns]], ignore_index=True)
+        if key:
+            df = df.drop_duplicates('Report_ID', keep='last')
+
+    # Encode categorical features
+    le_gender = LabelEncoder().fit(df['Gender'].astype(str))
     le_diagnosis = LabelEncoder()
-    df['Diagnosis'] = le_diagnosis.fit_transform(df['Diagnosis'])
 
     # Define features (X) and target (y)
-    X = df.drop(columns=['Diagnosis'])
-    y = df['Diagnosis']
+    X = feature_matrix(df, le_gender)
+    y = le_diagnosis.fit_transform(df[TARGET_COLUMN].astype(str))
+    return X, y, le_gender, le_diagnosis
+
+def run_predictive_analytics(file_path: str = DATASET_PATH, model_path: str = MODEL_PATH,
+                             backend: str = 'random_forest', n_jobs: int = -1, max_rows: int = None,
+                             extra: pd.DataFrame = None) -> dict:
+    """Runs the predictive analytics pipeline on the blood reports dataset.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        model_path (str): Where to save the model artifact, or None to skip saving.
+        backend (str): The model backend (see `train_model`).
+        n_jobs (int): Threads used for fitting and prediction (-1 for all cores).
+        max_rows (int): Cap on the training rows by stratified subsampling, or None for all.
+        extra (pd.DataFrame): Labelled reports trained on together with the dataset, e.g. a
+            batch not yet merged into it (see `load_training_data`).
+
+    Returns:
+        dict: The model artifact (see `load_model`).
+    """
+    # Load the dataset
+    X, y, le_gender, le_diagnosis = load_training_data(file_path, extra)
 
     # Split data into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, y_train = stratified_sample(X_train, y_train, max_rows)
 
-    # Initialize and train a RandomForestClassifier model
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    # Initialize and train the model
+    started = time.perf_counter()
+    model, params = train_model(X_train, y_train, backend, n_jobs)
+    fit_seconds = time.perf_counter() - started
 
     # Make predictions on the test set
     y_pred = model.predict(X_test)
 
     # Evaluate the model
-    print("\nModel Accuracy:", accuracy_score(y_test, y_pred))
+    accuracy = accuracy_score(y_test, y_pred)
+    print("\nModel Accuracy:", accuracy)
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred, target_names=le_diagnosis.classes_))
 
+    trained_at = datetime.now(timezone.utc)
+    library_versions = {'scikit-learn': sklearn.__version__, 'numpy': np.__version__}
+    if backend == 'xgboost':
+        library_versions['xgboost'] = xgboost.__version__
+    artifact = {
+        'format': ARTIFACT_FORMAT,
+        'version': trained_at.strftime('%Y%m%dT%H%M%SZ'),
+        'trained_at': trained_at.isoformat(timespec='seconds'),
+        'model': model,
+        'gender_encoder': le_gender,
+        'diagnosis_encoder': le_diagnosis,
+        'features': list(FEATURE_COLUMNS),
+        'training_rows': len(X_train),
+        'training_params': {**params, 'max_rows': max_rows, 'n_jobs': n_jobs, 'fit_seconds': round(fit_seconds, 3)},
+        'metrics': {'accuracy': accuracy, 'test_rows': len(X_test),
+                    'classes': class_metrics(y_test, y_pred, le_diagnosis.classes_)},
+        'library_versions': library_versions,
+        'replay': replay_sample(X_train, y_train),
+        'updates': [],
+    }
+    if model_path:
+        save_model(artifact, model_path)
+        print(f"✅ Model {artifact['version']} saved to {model_path}")
+    return artifact
+
+def _fit_sampling_rss(X: np.ndarray, y: np.ndarray, backend: str, n_jobs: int) -> tuple:
+    """Fits a model while a background thread samples the process's resident memory.
+
+    Returns:
+        tuple: (fitted model, training parameters, fit seconds, resident bytes before
+            the fit, peak resident bytes during the fit).
+    """
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    peak = [rss_before]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(RSS_SAMPLE_SECONDS):
+            peak[0] = max(peak[0], process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        model, params = train_model(X, y, backend, n_jobs)
+    finally:
+        fit_seconds = time.perf_counter() - started
+        done.set()
+        sampler.join()
+    return model, params, fit_seconds, rss_before, max(peak[0], process.memory_info().rss)
+
+def _benchmark_run(file_path: str, backend: str, rows: int, n_jobs: int) -> dict:
+    """Fits one backend on `rows` stratified rows and measures it (runs in a fresh process)."""
+    X, y, _, _ = load_training_data(file_path)
+    X, y = stratified_sample(X, y, rows)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+
+    # Sampled during the fit: the process's lifetime high-water mark already includes the data load
+    model, params, fit_seconds, rss_before, rss_peak = _fit_sampling_rss(X_train, y_train, backend, n_jobs)
+
+    y_pred = model.predict(X_test)
+    return {
+        'backend': backend,
+        'rows': len(y),
+        'fit_seconds': round(fit_seconds, 3),
+        'peak_rss_mb': round(rss_peak / 2**20, 1),
+        'fit_memory_mb': round((rss_peak - rss_before) / 2**20, 1),
+        'accuracy': round(accuracy_score(y_test, y_pred), 4),
+        'macro_f1': round(f1_score(y_test, y_pred, average='macro'), 4),
+        'n_estimators': params['n_estimators'],
+    }
+
+def benchmark_training(file_path: str = DATASET_PATH, sizes: tuple = BENCHMARK_SIZES, backends: tuple = BACKENDS,
+                       n_jobs: int = -1, output_path: str = BENCHMARK_PATH) -> pd.DataFrame:
+    """Compares fit time, peak memory and accuracy per backend and training-set size.
+
+    Every run fits in a fresh process, so peak memory is not inherited from earlier
+    runs. Sizes larger than the dataset are skipped; generate a larger dataset
+    (`scripts.reporteda --records ...`) to benchmark them.
+
+    Args:
+        file_path (str): The path to the blood reports CSV file.
+        sizes (tuple): Dataset sizes (rows before the 80/20 split), stratified subsamples.
+        backends (tuple): The backends to compare.
+        n_jobs (int): Threads per fit (-1 for all cores).
+        output_path (str): Where to write the JSON report, or None to skip writing.
+
+    Returns:
+        pd.DataFrame: One row per (backend, size) run.
+    """
+    available = len(load_dataset(file_path, columns=[TARGET_COLUMN]))
+    runs = [(backend, rows) for rows in sorted(sizes) if rows <= available for backend in backends]
+    skipped = sorted(rows for rows in sizes if rows > available)
+
+    results = []
+    for backend, rows in runs:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results.append(executor.submit(_benchmark_run, file_path, backend, rows, n_jobs).result())
+        print(f"  {backend} on {rows} rows: {results[-1]['fit_seconds']}s, accuracy {results[-1]['accuracy']}")
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump({'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                       'dataset_rows': available, 'n_jobs': n_jobs, 'cpu_count': os.cpu_count(),
+                       'skipped_sizes': skipped, 'runs': results}, f, indent=2)
+    print(f"✅ Training benchmark of {len(results)} runs" + (f" written to {output_path}" if output_path else ""))
+    return pd.DataFrame(results)
+
 if __name__ == '__main__':
-    run_predictive_analytics()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train and evaluate the diagnosis model.")
+    parser.add_argument('--backend', choices=BACKENDS, default='random_forest', help="Model backend")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Threads for fitting (-1 for all cores)")
+    parser.add_argument('--max-rows', type=int, default=None, help="Cap training rows by stratified subsampling")
+    parser.add_argument('--benchmark', action='store_true', help="Compare backends and dataset sizes instead of training")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BENCHMARK_SIZES), help="Benchmark dataset sizes")
+    args = parser.parse_args()
+    if args.benchmark:
+        print(benchmark_training(sizes=tuple(args.sizes), n_jobs=args.n_jobs).to_string(index=False))
+    else:
+        run_predictive_analytics(backend=args.backend, n_jobs=args.n_jobs, max_rows=args.max_rows)
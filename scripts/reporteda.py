@@ -5,10 +5,17 @@ including various blood parameters, patient demographics, and diagnostic flags.
 The generated data is saved as a CSV file.
 """
 
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 from faker import Faker
 
+from scripts.clinical_rules import abnormal_flag, classify_diagnosis
+
 # Initialize Faker for generating realistic-looking data
 fake = Faker()
 
@@ -41,6 +48,7 @@ def generate_blood_report_data(num_records: int = 10000) -> pd.DataFrame:
     """
     fake = Faker()
     data = []
+    raw = {'Haemoglobin_g_dl': [], 'TLC_count_per_cumm': [], 'Lymphocytes_%': [], 'CRP_mg_L': []}
 
     for i in range(num_records):
         gender = np.random.choice(['M', 'F'])
@@ -60,21 +68,10 @@ def generate_blood_report_data(num_records: int = 10000) -> pd.DataFrame:
         mchc = generate_random_bounded_value(32, 2, 26, 36)  # Mean Corpuscular Hemoglobin Concentration (g/dL)
         crp = abs(generate_random_bounded_value(4, 8, 0, 80))  # C-Reactive Protein (mg/L) - inflammation marker
         
-        # Determine diagnosis based on simulated blood parameters
-        if hb < 11:
-            diagnosis = "Anemia"
-        elif crp > 10 and tlc > 10000:
-            diagnosis = "Bacterial infection"
-        elif crp > 10 and lymph > 50:
-            diagnosis = "Viral infection"
-        elif crp > 6:
-            diagnosis = "Mild inflammation"
-        else:
-            diagnosis = "Normal"
-
-        # Set abnormal flag based on diagnosis
-        abnormal = "Yes" if diagnosis != "Normal" else "No"
-        
+        # Keep the unrounded values the diagnosis rules are evaluated on
+        for column, value in zip(raw, (hb, tlc, lymph, crp)):
+            raw[column].append(value)
+
         # Generate synthetic blood report data for each record
         record = {
             "Report_ID": f"RPT_{i+1:05d}",
@@ -92,27 +89,224 @@ def generate_blood_report_data(num_records: int = 10000) -> pd.DataFrame:
             "MCV_fl": round(mcv, 1),
             "MCH_pg": round(mch, 1),
             "MCHC_g_dl": round(mchc, 1),
-            "CRP_mg_L": round(crp, 1),
-            "Diagnosis": diagnosis,
-            "Abnormal_Flag": abnormal
+            "CRP_mg_L": round(crp, 1)
         }
         data.append(record)
 
     # Convert the list of records into a Pandas DataFrame
     df = pd.DataFrame(data)
+
+    # Determine diagnosis and abnormal flag from the shared clinical rule table
+    df["Diagnosis"] = classify_diagnosis(raw)
+    df["Abnormal_Flag"] = abnormal_flag(df["Diagnosis"])
     return df
 
 
+def generate_bounded_array(rng: np.random.Generator, mean, std: float, low: float, high: float, size: int) -> np.ndarray:
+    """Generates an array of normally distributed values, bounded within a specified range.
+
+    Vectorized counterpart of `generate_random_bounded_value`; `mean` may be a scalar
+    or an array of per-record means.
+
+    Args:
+        rng (np.random.Generator): The random generator to draw from.
+        mean (float | np.ndarray): The mean of the normal distribution.
+        std (float): The standard deviation of the normal distribution.
+        low (float): The lower bound for the generated values.
+        high (float): The upper bound for the generated values.
+        size (int): The number of values to generate.
+
+    Returns:
+        np.ndarray: An array of values within the specified bounds.
+    """
+    return np.clip(rng.normal(mean, std, size), low, high)
+
+def generate_blood_report_data_vectorized(num_records: int = 10000, seed=None, start_index: int = 0,
+                                          end_date: str = None) -> pd.DataFrame:
+    """Generates a synthetic blood report dataset using whole-column array operations.
+
+    Produces the same columns, distributions and diagnosis rules as
+    `generate_blood_report_data`, but draws every parameter, date and diagnosis as
+    an array instead of building records one by one, so 1,000,000 records take
+    seconds rather than minutes.
+
+    Args:
+        num_records (int): The number of records to generate.
+        seed (int | list[int]): Seed (or seed sequence entropy) for the random generator.
+            Runs with the same seed are reproducible.
+        start_index (int): Zero-based position of the first record, used for `Report_ID` numbering.
+        end_date (str): Last date of the 120-day window (ISO format). Defaults to today.
+
+    Returns:
+        pd.DataFrame: A DataFrame containing the synthetic blood report data.
+    """
+    rng = np.random.default_rng(seed)
+    n = num_records
+
+    gender = rng.choice(np.array(['M', 'F']), size=n)
+    age = rng.integers(5, 80, size=n)
+
+    # Simulate various blood parameters with realistic ranges
+    hb = generate_bounded_array(rng, np.where(gender == 'M', 14, 12.5), 2, 7, 18, n)  # Haemoglobin (g/dL)
+    tlc = generate_bounded_array(rng, 7500, 2000, 4000, 15000, n)  # Total Leukocyte Count (per cumm)
+    poly = generate_bounded_array(rng, 55, 15, 20, 80, n)  # Polymorphs (%)
+    lymph = generate_bounded_array(rng, 40, 10, 15, 80, n)  # Lymphocytes (%)
+    eos = generate_bounded_array(rng, 2, 1.5, 0, 8, n)  # Eosinophils (%)
+    mono = generate_bounded_array(rng, 3, 2, 0, 10, n)  # Monocytes (%)
+    platelets = generate_bounded_array(rng, 2.8, 0.7, 1.0, 5.0, n)  # Platelets (lakh/cumm)
+    hct = hb * 3  # Hematocrit (%)
+    mcv = generate_bounded_array(rng, 85, 8, 60, 110, n)  # Mean Corpuscular Volume (fl)
+    mch = generate_bounded_array(rng, 29, 3, 20, 36, n)  # Mean Corpuscular Hemoglobin (pg)
+    mchc = generate_bounded_array(rng, 32, 2, 26, 36, n)  # Mean Corpuscular Hemoglobin Concentration (g/dL)
+    crp = np.abs(generate_bounded_array(rng, 4, 8, 0, 80, n))  # C-Reactive Protein (mg/L) - inflammation marker
+
+    # Determine diagnosis from the shared clinical rule table (unrounded values)
+    diagnosis = classify_diagnosis({'Haemoglobin_g_dl': hb, 'TLC_count_per_cumm': tlc,
+                                    'Lymphocytes_%': lymph, 'CRP_mg_L': crp})
+    abnormal = abnormal_flag(diagnosis)
+
+    # Uniform dates over the last 120 days, matching fake.date_between('-120d', 'today')
+    today = np.datetime64(end_date or 'today', 'D')
+    dates = today - rng.integers(0, 121, size=n).astype('timedelta64[D]')
+
+    report_ids = "RPT_" + pd.Series(np.arange(start_index + 1, start_index + n + 1)).astype(str).str.zfill(5)
+
+    df = pd.DataFrame({
+        "Report_ID": report_ids,
+        "Date": pd.to_datetime(dates),
+        "Gender": gender,
+        "Age": age,
+        "Haemoglobin_g_dl": hb.round(1),
+        "TLC_count_per_cumm": tlc.astype(np.int64),
+        "Polymorph_%": poly.round(1),
+        "Lymphocytes_%": lymph.round(1),
+        "Eosinophils_%": eos.round(1),
+        "Monocytes_%": mono.round(1),
+        "Platelets_lakh_per_cumm": platelets.round(2),
+        "HCT_%": hct.round(1),
+        "MCV_fl": mcv.round(1),
+        "MCH_pg": mch.round(1),
+        "MCHC_g_dl": mchc.round(1),
+        "CRP_mg_L": crp.round(1),
+        "Diagnosis": diagnosis,
+        "Abnormal_Flag": abnormal
+    })
+    return df
+
+def _generate_shard(shard_index: int, start_index: int, num_records: int, seed: int, end_date: str,
+                    output_dir: str, output_format: str, chunk_size: int) -> str:
+    """Generates one shard and streams it to disk chunk by chunk.
+
+    Each chunk is drawn from its own seed sequence `[seed, shard_index, chunk_index]`,
+    so a shard's content depends only on its position, not on worker scheduling.
+
+    Returns:
+        str: The path of the written shard file.
+    """
+    shard_path = os.path.join(output_dir, f"part-{shard_index:05d}.{output_format}")
+    writer = None
+    try:
+        for chunk_index, offset in enumerate(range(0, num_records, chunk_size)):
+            chunk = generate_blood_report_data_vectorized(
+                min(chunk_size, num_records - offset),
+                seed=[seed, shard_index, chunk_index],
+                start_index=start_index + offset,
+                end_date=end_date
+            )
+            if output_format == 'csv':
+                chunk.to_csv(shard_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(shard_path, table.schema)
+                writer.write_table(table)  # One row group per chunk
+    finally:
+        if writer is not None:
+            writer.close()
+    return shard_path
+
+def generate_sharded_dataset(num_records: int, output_dir: str, seed: int = 42, shard_size: int = 1_000_000,
+                             chunk_size: int = 250_000, output_format: str = 'csv', workers: int = None) -> list:
+    """Generates a large synthetic dataset as shards across a process pool.
+
+    The record range is split into shards of `shard_size` records. Shards are
+    generated in parallel and each one is streamed to its own file in chunks of
+    `chunk_size` records (CSV appends or Parquet row groups), so memory use stays
+    flat regardless of the total record count. `Report_ID` numbering is contiguous
+    and globally unique across shards.
+
+    Args:
+        num_records (int): The total number of records to generate.
+        output_dir (str): Directory where shard files (`part-00000.csv`, ...) are written.
+        seed (int): Base seed; shard and chunk seeds are derived from it deterministically.
+        shard_size (int): The number of records per shard.
+        chunk_size (int): The number of records held in memory at once per worker.
+        output_format (str): Either 'csv' or 'parquet'.
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        list: The shard file paths, in `Report_ID` order.
+    """
+    if output_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported output format: {output_format}")
+    os.makedirs(output_dir, exist_ok=True)
+    end_date = str(np.datetime64('today', 'D'))  # Fixed once so all shards share the same window
+
+    starts = range(0, num_records, shard_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_generate_shard, shard_index, start, min(shard_size, num_records - start),
+                            seed, end_date, output_dir, output_format, chunk_size)
+            for shard_index, start in enumerate(starts)
+        ]
+        return [future.result() for future in futures]
+
+def merge_csv_shards(shard_paths: list, output_path: str) -> None:
+    """Concatenates CSV shards into a single CSV file without loading them into memory.
+
+    Args:
+        shard_paths (list): CSV shard paths in the order they should appear.
+        output_path (str): The path of the merged CSV file.
+    """
+    with open(output_path, 'wb') as out:
+        for i, shard_path in enumerate(shard_paths):
+            with open(shard_path, 'rb') as shard:
+                header = shard.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(shard, out, length=16 * 1024 * 1024)
+
+
 if __name__ == '__main__':
-    # Define the number of records to generate for the dataset
-    num_records_to_generate = 10000  # Can be increased for a larger dataset
+    parser = argparse.ArgumentParser(description="Generate the synthetic blood reports dataset.")
+    parser.add_argument('--records', type=int, default=10000, help="Number of records to generate.")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for reproducible output.")
+    parser.add_argument('--output', default="data/blood_reports_dataset.csv",
+                        help="Output CSV path, or shard directory when --shard-size is given.")
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help="Generate in parallel shards of this many records, streamed to disk.")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Shard file format.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes.")
+    parser.add_argument('--merge', action='store_true', help="Merge CSV shards into <output>.csv.")
+    args = parser.parse_args()
 
-    # Generate the blood report data
-    blood_report_df = generate_blood_report_data(num_records_to_generate)
+    if args.shard_size:
+        shard_paths = generate_sharded_dataset(args.records, args.output, seed=args.seed, shard_size=args.shard_size,
+                                               output_format=args.format, workers=args.workers)
+        print(f"✅ {len(shard_paths)} shards generated successfully in {args.output}")
+        if args.merge and args.format == 'csv':
+            merged_path = args.output.rstrip('/') + '.csv'
+            merge_csv_shards(shard_paths, merged_path)
+            print(f"✅ Shards merged into {merged_path}")
+    else:
+        # Generate the blood report data (columnar mode; seeded for reproducible runs)
+        blood_report_df = generate_blood_report_data_vectorized(args.records, seed=args.seed)
 
-    # Save the generated DataFrame to a CSV file in the 'data' directory
-    output_path = "data/blood_reports_dataset.csv"
-    blood_report_df.to_csv(output_path, index=False)
+        # Save the generated DataFrame to a CSV file in the 'data' directory
+        output_path = args.output
+        blood_report_df.to_csv(output_path, index=False)
 
-    print(f"✅ CSV generated successfully: {output_path}")
-    print(blood_report_df.head())
+        print(f"✅ CSV generated successfully: {output_path}")
+        print(blood_report_df.head())
@@ -0,0 +1,115 @@
+"""Module for the pre-aggregated rollup cube behind the dashboard charts.
+
+The cube holds one cell per Date × Gender × Diagnosis × Age × Anemia_Status
+combination with the report count and, for each tracked measurement, its sum.
+Every dashboard chart is a filter plus a group-by over these cells,
+so chart cost depends on the number of cells rather than the number of reports.
+New reports are folded in with `append`, which aggregates only the new rows and
+merges them into the existing cells.
+
+Age is kept at single-year resolution so charts can show either exact ages or age
+bands (`AGE_BINS`/`AGE_LABELS`) from the same cells.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.clinical_rules import anemia_status
+
+DIMENSIONS = ['Date', 'Gender', 'Diagnosis', 'Age', 'Anemia_Status']
+MEASURES = ['Haemoglobin_g_dl', 'CRP_mg_L']
+VALUE_COLUMNS = ['count'] + [f'{m}_sum' for m in MEASURES]
+
+# Age bands used by the corporate dashboard
+AGE_BINS = [0, 12, 18, 30, 45, 60, 120]
+AGE_LABELS = ['0-12', '13-18', '19-30', '31-45', '46-60', '60+']
+
+def _aggregate(frame: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates raw reports into cube cells."""
+    values = pd.DataFrame({'count': np.ones(len(frame), dtype=np.int64)}, index=frame.index)
+    for measure in MEASURES:
+        values[f'{measure}_sum'] = frame[measure].to_numpy(dtype=np.float64)
+    keys = [frame['Date'], frame['Gender'].astype(str), frame['Diagnosis'].astype(str),
+            frame['Age'].astype(np.int16), pd.Series(anemia_status(frame), index=frame.index, name='Anemia_Status')]
+    return values.groupby(keys, observed=True, sort=False).sum().reset_index()
+
+class RollupCube:
+    """Materialized counts and sums over the dashboard dimensions."""
+
+    def __init__(self, cells: pd.DataFrame = None):
+        """Initializes the cube from existing cells (or empty).
+
+        Args:
+            cells (pd.DataFrame): Cells as produced by `RollupCube.from_frame(...).cells`.
+        """
+        self.cells = cells if cells is not None else pd.DataFrame(columns=DIMENSIONS + VALUE_COLUMNS)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'RollupCube':
+        """Builds a cube from raw reports.
+
+        Args:
+            frame (pd.DataFrame): Typed blood reports.
+
+        Returns:
+            RollupCube: The materialized cube.
+        """
+        return cls(_aggregate(frame))
+
+    def append(self, new_rows: pd.DataFrame) -> None:
+        """Folds newly arrived reports into the cube without rebuilding it.
+
+        Only `new_rows` is aggregated; the result is merged with the existing cells,
+        so the cost depends on the batch size and the number of cells.
+
+        Args:
+            new_rows (pd.DataFrame): The newly appended reports.
+        """
+        if len(new_rows) == 0:
+            return
+        if len(self.cells) == 0:
+            self.cells = _aggregate(new_rows)
+            return
+        merged = pd.concat([self.cells, _aggregate(new_rows)], ignore_index=True)
+        self.cells = merged.groupby(DIMENSIONS, sort=False).sum().reset_index()
+
+    def select(self, gender=None, diagnosis=None, start_date=None, end_date=None) -> pd.DataFrame:
+        """Returns the cells matching the dashboard filters.
+
+        Args:
+            gender (str | list): Gender value(s) to keep, or None for all.
+            diagnosis (str | list): Diagnosis value(s) to keep, or None for all.
+            start_date (str | pd.Timestamp): Inclusive start date, or None for unbounded.
+            end_date (str | pd.Timestamp): Inclusive end date, or None for unbounded.
+
+        Returns:
+            pd.DataFrame: The matching cells.
+        """
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        if gender is not None:
+            mask &= cells['Gender'].isin(gender if isinstance(gender, (list, tuple, set)) else [gender]).to_numpy()
+        if diagnosis is not None:
+            mask &= cells['Diagnosis'].isin(diagnosis if isinstance(diagnosis, (list, tuple, set)) else [diagnosis]).to_numpy()
+        if start_date:
+            mask &= (cells['Date'] >= pd.Timestamp(start_date)).to_numpy()
+        if end_date:
+            mask &= (cells['Date'] <= pd.Timestamp(end_date)).to_numpy()
+        return cells[mask]
+
+    def summarize(self, by: list, cells: pd.DataFrame = None, **filters) -> pd.DataFrame:
+        """Groups cells by some dimensions and derives counts and means.
+
+        Args:
+            by (list): The dimensions to group by.
+            cells (pd.DataFrame): Pre-selected cells; defaults to `select(**filters)`.
+            **filters: Filters passed to `select` when `cells` is not given.
+
+        Returns:
+            pd.DataFrame: One row per group with 'count' and, per measure, '<measure>_mean'.
+        """
+        cells = self.select(**filters) if cells is None else cells
+        totals = cells.groupby(by, sort=True)[VALUE_COLUMNS].sum().reset_index()
+        for measure in MEASURES:
+            totals[f'{measure}_mean'] = totals[f'{measure}_sum'] / totals['count']
+        return totals
@@ -0,0 +1,176 @@
+"""Module for scoring batches of new reports with the persisted diagnosis model.
+
+`score_reports` streams CSV or Parquet files of new reports through the model
+artifact saved by `predictive_analytics` without retraining. The input is split
+into line-aligned byte ranges or row groups (`data_loader.split_into_units`),
+which worker processes parse and score chunk by chunk. Each worker loads the
+artifact once. The output (Report_ID, predicted diagnosis and one probability
+column per class) is written in input order to a CSV or Parquet file, and the
+throughput is reported in rows per second.
+
+Inference stays on the model's compiled traversal (`predict_proba`), fed
+without conversions: features are written straight into a C-contiguous float32
+matrix, the dtype tree ensembles evaluate in, so no per-chunk float64 or
+DataFrame copies are made. Each worker uses its share of the CPU threads for
+tree-parallel prediction, while the processes parse and score separate parts of
+the input.
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.data_loader import CHUNK_ROWS, iter_unit_chunks, split_into_units
+from scripts.predictive_analytics import FEATURE_COLUMNS, MODEL_PATH, feature_matrix, load_model
+
+# Smaller than the aggregation default, as each unit's scored rows are sent back to the writer
+SCORE_SPLIT_BYTES = 16 * 1024 * 1024
+
+ID_COLUMN = 'Report_ID'
+PREDICTION_COLUMN = 'Predicted_Diagnosis'
+
+def score_frame(artifact: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """Scores typed reports.
+
+    Args:
+        artifact (dict): The model artifact.
+        df (pd.DataFrame): Reports with the feature columns (and optionally Report_ID).
+
+    Returns:
+        pd.DataFrame: Report_ID (when present), the predicted diagnosis, and one
+            float32 'Probability_<class>' column per diagnosis.
+    """
+    classes = artifact['diagnosis_encoder'].classes_
+    proba = artifact['model'].predict_proba(feature_matrix(df, artifact['gender_encoder']))
+    scored = pd.DataFrame(index=df.index)
+    if ID_COLUMN in df.columns:
+        scored[ID_COLUMN] = df[ID_COLUMN]
+    scored[PREDICTION_COLUMN] = pd.Categorical.from_codes(proba.argmax(axis=1), categories=classes)
+    for i, cls in enumerate(classes):
+        scored[f"Probability_{cls.replace(' ', '_')}"] = proba[:, i].astype(np.float32)
+    return scored.reset_index(drop=True)
+
+# State of a scoring worker process, set up once by `_init_worker`
+_worker = {}
+
+def _init_worker(model_path: str, threads: int = None) -> None:
+    """Loads the artifact into a worker process and sets its prediction threads."""
+    artifact = load_model(model_path)
+    if threads and hasattr(artifact['model'], 'n_jobs'):
+        artifact['model'].n_jobs = threads
+    _worker['artifact'] = artifact
+
+def _score_unit(unit: tuple, columns: list, chunk_rows: int) -> list:
+    """Scores one work unit in the worker, returning its scored chunks."""
+    return [score_frame(_worker['artifact'], chunk) for chunk in iter_unit_chunks(unit, columns, chunk_rows)]
+
+def _input_columns(path: str) -> list:
+    """Returns the column names of a CSV or Parquet file."""
+    if path.endswith('.parquet'):
+        return pq.read_schema(path).names
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f))
+
+class _ScoreWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = path.endswith('.parquet')
+        self._writer = None
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    def write(self, scored: pd.DataFrame) -> None:
+        if self._parquet:
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            scored.to_csv(self._tmp_path, mode='a' if self._writer else 'w', header=self._writer is None, index=False)
+            self._writer = True
+
+    def close(self, complete: bool = True) -> None:
+        """Finishes the file; an incomplete one is discarded instead of replacing the output."""
+        if self._parquet and self._writer is not None:
+            self._writer.close()
+        if self._writer is not None:
+            if complete:
+                os.replace(self._tmp_path, self.path)
+            else:
+                os.remove(self._tmp_path)
+
+def score_reports(paths, output_path: str, model_path: str = MODEL_PATH, chunk_rows: int = CHUNK_ROWS,
+                  workers: int = None, split_bytes: int = SCORE_SPLIT_BYTES) -> dict:
+    """Scores CSV or Parquet files of reports and writes the predictions.
+
+    Args:
+        paths (str | list): Files of new reports with at least the model's feature columns.
+        output_path (str): The output file; '.parquet' writes Parquet, anything else CSV.
+        model_path (str): The model artifact to score with.
+        chunk_rows (int): Rows parsed and scored at a time.
+        workers (int): Number of worker processes (defaults to the CPU count, capped by
+            the number of work units); 1 scores in this process. The CPU threads are
+            divided among the workers for tree-parallel prediction.
+        split_bytes (int): Target size of the CSV byte ranges handed to workers.
+
+    Returns:
+        dict: 'rows', 'seconds', 'rows_per_second', 'output', 'model_version' and 'workers'.
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    started = time.perf_counter()
+    artifact = load_model(model_path)
+    units = split_into_units(paths, split_bytes)
+    columns_by_path = {path: [col for col in [ID_COLUMN] + FEATURE_COLUMNS if col in _input_columns(path)]
+                       for path in paths}
+    jobs = [(unit, columns_by_path[unit[0]], chunk_rows) for unit in units]
+
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, len(units)) or 1
+    writer = _ScoreWriter(output_path)
+    rows = 0
+
+    def write(results):
+        nonlocal rows
+        for scored_chunks in results:
+            for scored in scored_chunks:
+                writer.write(scored)
+                rows += len(scored)
+
+    try:
+        if workers == 1:
+            if hasattr(artifact['model'], 'n_jobs'):
+                artifact['model'].n_jobs = cpus
+            _worker['artifact'] = artifact
+            write(_score_unit(*job) for job in jobs)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(model_path, max(1, cpus // workers))) as executor:
+                write(executor.map(_score_unit, *zip(*jobs)))
+    except BaseException:
+        writer.close(complete=False)
+        raise
+    writer.close()
+
+    seconds = time.perf_counter() - started
+    summary = {'rows': rows, 'seconds': round(seconds, 3), 'rows_per_second': round(rows / seconds) if seconds else None,
+               'output': output_path, 'model_version': artifact['version'], 'workers': workers}
+    print(f"✅ Scored {rows} reports in {seconds:.1f}s ({summary['rows_per_second']:,} rows/s) -> {output_path}")
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score new blood reports with the persisted diagnosis model.")
+    parser.add_argument('inputs', nargs='+', help="CSV or Parquet files of reports")
+    parser.add_argument('--output', required=True, help="Output file (.parquet or .csv)")
+    parser.add_argument('--model', default=MODEL_PATH, help="Model artifact path")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (1 scores serially)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows scored at a time")
+    args = parser.parse_args()
+    score_reports(args.inputs, args.output, model_path=args.model, chunk_rows=args.chunk_rows, workers=args.workers)
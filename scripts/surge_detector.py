@@ -0,0 +1,315 @@
+"""Module for detecting surges of abnormal reports, infections and CRP as reports stream in.
+
+`SurgeDetector` consumes reports one at a time (`observe`) or in micro-batches
+(`observe_batch`). They are tracked in segments: each Gender and Diagnosis, plus
+all infections together, plus 'All' rollups. Within the current day each segment
+only accumulates a few counters, so a report costs a constant number of
+dictionary updates.
+
+When the date moves on, the day is closed. Every segment turns its counters into
+daily values: the number of reports, the mean CRP and, for the whole-gender
+segments, the abnormal rate. Each value goes to its own `EwmaCusum`, which keeps
+an exponentially weighted mean and variance of the series, plus a one-sided CUSUM
+of the standardized excess over that mean. A surge event is emitted when a single
+day is far above the baseline (`SPIKE_Z`) or a run of moderately raised days
+pushes the CUSUM over `CUSUM_H`.
+
+State is constant per segment and metric, whatever the number of reports.
+Closing a day costs a constant amount per segment, and there is a fixed number of
+segments. `observe_batch` aggregates a micro-batch by day, gender and diagnosis
+before feeding the same counters. `replay` backtests the detector on the
+existing CSV: it reduces the file chunk by chunk to these daily counts, then
+feeds them in date order.
+
+Live reports are expected in date order. Within a micro-batch any order is fine.
+A report dated before the current day is counted in the current day and tallied
+as late.
+"""
+
+import argparse
+import math
+from collections import deque
+
+import pandas as pd
+
+from scripts.clinical_rules import DEFAULT_DIAGNOSIS, INFECTION_DIAGNOSES
+from scripts.data_loader import CHUNK_ROWS, DATASET_PATH, iter_unit_chunks, split_into_units
+
+ALL = 'All'
+INFECTION = 'Infection'
+DETECTOR_COLUMNS = ['Date', 'Gender', 'Diagnosis', 'CRP_mg_L']
+
+# EWMA weight of the newest day (about a 20-day memory)
+ALPHA = 0.05
+# CUSUM slack and decision threshold, in standard deviations
+CUSUM_K = 0.5
+CUSUM_H = 5.0
+# A single day this many standard deviations above the baseline is a surge on its own
+SPIKE_Z = 4.0
+# Days observed before a series can raise events
+WARMUP_DAYS = 14
+
+# Lower bound of each metric's standard deviation, so flat baselines do not alarm on noise
+STD_FLOORS = {
+    'reports': lambda mean: math.sqrt(max(mean, 1.0)),  # Poisson noise of daily counts
+    'abnormal_rate': lambda mean: 0.02,
+    'crp_mean': lambda mean: 0.5,  # mg/L
+}
+
+class EwmaCusum:
+    """Exponentially weighted baseline of a daily series with an upper CUSUM."""
+
+    __slots__ = ('mean', 'var', 'days', 'cusum', 'last')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.days = 0
+        self.cusum = 0.0
+        self.last = math.nan
+
+    def update(self, value: float, std_floor: float, alpha: float = ALPHA, k: float = CUSUM_K,
+               h: float = CUSUM_H, spike_z: float = SPIKE_Z, warmup_days: int = WARMUP_DAYS) -> tuple:
+        """Scores one day's value against the baseline, then folds it in.
+
+        Args:
+            value (float): The day's value.
+            std_floor (float): Lower bound of the standard deviation.
+            alpha (float): EWMA weight of the new value.
+            k (float): CUSUM slack, in standard deviations.
+            h (float): CUSUM decision threshold.
+            spike_z (float): Standardized excess that is a surge on its own.
+            warmup_days (int): Days before events can be raised.
+
+        Returns:
+            tuple: (kind, expected, z) when the value is a surge ('spike' or 'cusum'), else None.
+        """
+        event = None
+        if self.days >= warmup_days:
+            z = (value - self.mean) / max(math.sqrt(self.var), std_floor)
+            self.cusum = max(0.0, self.cusum + z - k)
+            if z >= spike_z or self.cusum >= h:
+                event = ('spike' if z >= spike_z else 'cusum', self.mean, z)
+                self.cusum = 0.0
+
+        if self.days == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.var = (1 - alpha) * (self.var + diff * increment)
+        self.days += 1
+        self.last = value
+        return event
+
+class SurgeDetector:
+    """Streaming per-segment surge detection over daily report counts, abnormal rate and CRP."""
+
+    def __init__(self, alpha: float = ALPHA, k: float = CUSUM_K, h: float = CUSUM_H, spike_z: float = SPIKE_Z,
+                 warmup_days: int = WARMUP_DAYS, max_events: int = 1000):
+        """Initializes an empty detector.
+
+        Args:
+            alpha (float): EWMA weight of the newest day.
+            k (float): CUSUM slack, in standard deviations.
+            h (float): CUSUM decision threshold.
+            spike_z (float): Standardized excess that is a surge on its own.
+            warmup_days (int): Days a series is observed before it can raise events.
+            max_events (int): Number of recent events kept in `events`.
+        """
+        self.params = {'alpha': alpha, 'k': k, 'h': h, 'spike_z': spike_z, 'warmup_days': warmup_days}
+        self.day = None
+        self.reports = 0
+        self.late_reports = 0
+        self.events = deque(maxlen=max_events)
+        # Segment (gender, group) to the open day's [reports, CRP sum, CRP count, abnormal]
+        self._open = {}
+        # (segment, metric) to its EwmaCusum
+        self._series = {}
+        self._segments_of = {}
+
+    def _segments(self, gender: str, diagnosis: str) -> tuple:
+        """Returns the segments a report of this gender and diagnosis counts in."""
+        key = (gender, diagnosis)
+        if key not in self._segments_of:
+            groups = [diagnosis, ALL] + ([INFECTION] if diagnosis in INFECTION_DIAGNOSES else [])
+            self._segments_of[key] = tuple((g, group) for g in (gender, ALL) for group in groups)
+        return self._segments_of[key]
+
+    def _add(self, day, gender: str, diagnosis: str, reports: int, crp_sum: float, crp_count: int) -> list:
+        """Adds aggregated reports of one day, gender and diagnosis; returns events of closed days."""
+        events = self._advance(day) if self.day is None or day > self.day else []
+        if day < self.day:
+            self.late_reports += reports
+        self.reports += reports
+        abnormal = reports if diagnosis != DEFAULT_DIAGNOSIS else 0
+        for segment in self._segments(gender, diagnosis):
+            counters = self._open.get(segment)
+            if counters is None:
+                counters = self._open[segment] = [0, 0.0, 0, 0]
+            counters[0] += reports
+            counters[1] += crp_sum
+            counters[2] += crp_count
+            counters[3] += abnormal
+        return events
+
+    def _advance(self, day) -> list:
+        """Closes the open day and any empty days before `day`, then opens `day`."""
+        events = []
+        if self.day is not None:
+            while self.day < day:
+                events += self._close_day()
+                self.day += pd.Timedelta(days=1)
+        self.day = day
+        return events
+
+    def _close_day(self) -> list:
+        """Feeds the open day's values of every known segment to its detectors."""
+        events = []
+        for segment, counters in self._open.items():
+            reports, crp_sum, crp_count, abnormal = counters
+            values = {'reports': reports}
+            if crp_count:
+                values['crp_mean'] = crp_sum / crp_count
+            if segment[1] == ALL and reports:
+                values['abnormal_rate'] = abnormal / reports
+            for metric, value in values.items():
+                series = self._series.get((segment, metric))
+                if series is None:
+                    series = self._series[(segment, metric)] = EwmaCusum()
+                surge = series.update(value, STD_FLOORS[metric](series.mean), **self.params)
+                if surge:
+                    kind, expected, z = surge
+                    events.append({'date': self.day, 'gender': segment[0], 'group': segment[1], 'metric': metric,
+                                   'kind': kind, 'value': value, 'expected': expected, 'z': z})
+            counters[:] = [0, 0.0, 0, 0]
+        self.events.extend(events)
+        return events
+
+    def observe(self, date, gender: str, diagnosis: str, crp: float) -> list:
+        """Consumes one report.
+
+        Args:
+            date: The report date (anything `pd.Timestamp` accepts).
+            gender (str): The patient's gender.
+            diagnosis (str): The report's diagnosis.
+            crp (float): The CRP value in mg/L (NaN when missing).
+
+        Returns:
+            list: Surge events of the days closed by this report (usually none).
+        """
+        has_crp = crp == crp
+        return self._add(pd.Timestamp(date).normalize(), gender, diagnosis, 1, crp if has_crp else 0.0, int(has_crp))
+
+    def observe_batch(self, reports: pd.DataFrame) -> list:
+        """Consumes a micro-batch of reports, aggregated by day, gender and diagnosis first.
+
+        Args:
+            reports (pd.DataFrame): Reports with 'Date', 'Gender', 'Diagnosis' and 'CRP_mg_L',
+                in any order within the batch.
+
+        Returns:
+            list: Surge events of the days closed by this batch.
+        """
+        return self.observe_daily(daily_counts(reports))
+
+    def observe_daily(self, daily: pd.DataFrame) -> list:
+        """Consumes reports already aggregated by `daily_counts`.
+
+        Args:
+            daily (pd.DataFrame): 'size', 'sum' and 'count' of CRP per (day, gender, diagnosis).
+
+        Returns:
+            list: Surge events of the days closed.
+        """
+        events = []
+        for (day, gender, diagnosis), reports_count, crp_sum, crp_count in zip(
+                daily.index, daily['size'], daily['sum'], daily['count']):
+            events += self._add(day, gender, diagnosis, int(reports_count), float(crp_sum), int(crp_count))
+        return events
+
+    def flush(self) -> list:
+        """Closes the open day (e.g. at the end of a backtest); later reports start a new day.
+
+        Returns:
+            list: Surge events of the closed day.
+        """
+        if self.day is None:
+            return []
+        events = self._close_day()
+        self.day += pd.Timedelta(days=1)
+        return events
+
+    def state_frame(self) -> pd.DataFrame:
+        """Returns the current state of every series.
+
+        Returns:
+            pd.DataFrame: One row per segment and metric with the last closed value, the
+                baseline mean and standard deviation, the CUSUM, and the days observed.
+        """
+        rows = [{'gender': segment[0], 'group': segment[1], 'metric': metric, 'last': series.last,
+                 'baseline': series.mean, 'std': math.sqrt(series.var), 'cusum': series.cusum, 'days': series.days}
+                for (segment, metric), series in self._series.items()]
+        frame = pd.DataFrame(rows, columns=['gender', 'group', 'metric', 'last', 'baseline', 'std', 'cusum', 'days'])
+        return frame.sort_values(['gender', 'group', 'metric'], ignore_index=True)
+
+    def events_frame(self) -> pd.DataFrame:
+        """Returns the recent surge events, oldest first."""
+        return pd.DataFrame(list(self.events),
+                            columns=['date', 'gender', 'group', 'metric', 'kind', 'value', 'expected', 'z'])
+
+def daily_counts(reports: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates reports by day, gender and diagnosis.
+
+    Args:
+        reports (pd.DataFrame): Reports with 'Date', 'Gender', 'Diagnosis' and 'CRP_mg_L'.
+
+    Returns:
+        pd.DataFrame: The number of reports ('size'), the CRP sum ('sum') and the number
+            of CRP values ('count'), indexed by (day, gender, diagnosis) in day order.
+    """
+    days = pd.to_datetime(reports['Date']).dt.normalize()
+    return reports['CRP_mg_L'].astype('float64').groupby(
+        [days.rename('Day'), reports['Gender'], reports['Diagnosis']],
+        observed=True, sort=True).agg(['size', 'sum', 'count'])
+
+def replay(paths=DATASET_PATH, detector: SurgeDetector = None, chunk_rows: int = CHUNK_ROWS,
+           flush: bool = True) -> SurgeDetector:
+    """Backtests a detector on existing reports, as if they had arrived day by day.
+
+    The files are read in chunks and reduced to daily counts per gender and diagnosis,
+    which are then fed in date order, so the input does not need to be sorted.
+
+    Args:
+        paths (str | list): CSV or Parquet files of reports.
+        detector (SurgeDetector): The detector to feed; a new one by default.
+        chunk_rows (int): Rows read and aggregated at a time.
+        flush (bool): Whether to close the last day at the end.
+
+    Returns:
+        SurgeDetector: The detector, with its events in `events`.
+    """
+    detector = detector or SurgeDetector(max_events=None)
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    parts = [daily_counts(chunk) for unit in split_into_units(paths)
+             for chunk in iter_unit_chunks(unit, DETECTOR_COLUMNS, chunk_rows)]
+    if parts:
+        daily = pd.concat(parts).groupby(level=[0, 1, 2], observed=True, sort=True).sum()
+        detector.observe_daily(daily)
+    if flush:
+        detector.flush()
+    return detector
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest the surge detector on existing reports.")
+    parser.add_argument('inputs', nargs='*', default=[DATASET_PATH], help="CSV or Parquet files of reports")
+    parser.add_argument('--output', default=None, help="Write the events to this CSV file")
+    args = parser.parse_args()
+    detector = replay(args.inputs)
+    events = detector.events_frame()
+    print(events.tail(20).to_string(index=False))
+    if args.output:
+        events.to_csv(args.output, index=False)
+    print(f"✅ Replayed {detector.reports} reports over {detector.state_frame()['days'].max()} days: "
+          f"{len(events)} surge events, {detector.late_reports} late reports")